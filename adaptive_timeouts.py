@@ -0,0 +1,284 @@
+"""
+適応タイムアウトモジュール
+ログインデックスの実行時間履歴からデバイス・コマンドごとの p95/p99 を求め、
+コマンドとシナリオのデッドラインを観測値に合わせて設定する
+"""
+import math
+import os
+import threading
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# ログ管理モジュールのインポート
+from logger_manager import get_log_manager
+
+# 実行時間予測モジュールのインポート
+from duration_predictor import flatten_commands, history_device_name
+
+logger = logging.getLogger(__name__)
+
+# 既定値（環境変数で変更可能）
+ADAPTIVE_TIMEOUTS_ENABLED = os.getenv('ADAPTIVE_TIMEOUTS', '1').lower() not in ('0', 'false', 'no')
+DEFAULT_MULTIPLIER = float(os.getenv('ADAPTIVE_TIMEOUT_MULTIPLIER', '3'))        # p99 に掛ける倍率
+DEFAULT_COMMAND_FLOOR = float(os.getenv('ADAPTIVE_COMMAND_FLOOR', '10'))         # コマンドタイムアウトの下限（秒）
+DEFAULT_COMMAND_CEILING = float(os.getenv('ADAPTIVE_COMMAND_CEILING', '900'))    # コマンドタイムアウトの上限（秒）
+DEFAULT_SCENARIO_FLOOR = float(os.getenv('ADAPTIVE_SCENARIO_FLOOR', '30'))       # シナリオタイムアウトの下限（秒）
+DEFAULT_SCENARIO_CEILING = float(os.getenv('ADAPTIVE_SCENARIO_CEILING', '3600')) # シナリオタイムアウトの上限（秒）
+DEFAULT_MIN_SAMPLES = int(os.getenv('ADAPTIVE_MIN_SAMPLES', '5'))                # 学習に必要な最小サンプル数
+DEFAULT_WINDOW = int(os.getenv('ADAPTIVE_WINDOW', '200'))                        # 直近何件の実行を使うか
+DEFAULT_FALLBACK_AFTER = int(os.getenv('ADAPTIVE_TIMEOUT_FALLBACK', '2'))        # 連続タイムアウトが何回で既定値に戻すか（0で無効）
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """
+    パーセンタイルを計算（最近傍法）
+
+    Args:
+        samples: サンプル値
+        q: 0〜1 のパーセンタイル
+
+    Returns:
+        float: パーセンタイル値
+    """
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(q * len(ordered)))
+    return ordered[rank - 1]
+
+
+class AdaptiveTimeoutModel:
+    """実行履歴に基づくタイムアウト計算クラス"""
+
+    def __init__(self, multiplier: float = DEFAULT_MULTIPLIER,
+                 command_floor: float = DEFAULT_COMMAND_FLOOR,
+                 command_ceiling: float = DEFAULT_COMMAND_CEILING,
+                 scenario_floor: float = DEFAULT_SCENARIO_FLOOR,
+                 scenario_ceiling: float = DEFAULT_SCENARIO_CEILING,
+                 min_samples: int = DEFAULT_MIN_SAMPLES,
+                 window: int = DEFAULT_WINDOW,
+                 fallback_after: int = DEFAULT_FALLBACK_AFTER,
+                 enabled: bool = ADAPTIVE_TIMEOUTS_ENABLED):
+        """
+        タイムアウトモデルを初期化
+
+        Args:
+            multiplier: p99 に掛ける倍率
+            command_floor: コマンドタイムアウトの下限（秒）
+            command_ceiling: コマンドタイムアウトの上限（秒）
+            scenario_floor: シナリオタイムアウトの下限（秒）
+            scenario_ceiling: シナリオタイムアウトの上限（秒）
+            min_samples: 学習に必要な最小サンプル数（未満は既定値を使う）
+            window: 直近何件の成功実行を使うか
+            fallback_after: 連続タイムアウトが何回で既定値に戻すか（0で無効）
+            enabled: 適応タイムアウトを使うか
+        """
+        self.multiplier = multiplier
+        self.command_floor = command_floor
+        self.command_ceiling = command_ceiling
+        self.scenario_floor = scenario_floor
+        self.scenario_ceiling = scenario_ceiling
+        self.min_samples = min_samples
+        self.window = window
+        self.fallback_after = fallback_after
+        self.enabled = enabled
+        self.log_manager = get_log_manager()
+        # 成功履歴はタイムアウトした実行を含まないため、連続タイムアウト回数を別に数える
+        self._timeout_streaks: Dict[Tuple[str, str], int] = {}
+        self.lock = threading.Lock()
+
+    def get_samples(self, device_name: str, command: str) -> List[float]:
+        """
+        デバイス・コマンドの直近の成功実行時間を取得
+
+        タイムアウトや失敗した実行は打ち切られた値のため除外する。
+
+        Args:
+            device_name: デバイス名
+            command: コマンド
+
+        Returns:
+            List[float]: 実行時間（秒）
+        """
+        history = self.log_manager.get_command_history(
+            device_name, command, limit=self.window, successful_only=True
+        )
+        return [
+            float(entry['execution_time'])
+            for entry in history
+            if entry.get('execution_time') is not None
+        ]
+
+    def get_latency_profile(self, device_name: str, command: str) -> Dict[str, Any]:
+        """
+        デバイス・コマンドのレイテンシ統計を取得
+
+        Args:
+            device_name: デバイス名
+            command: コマンド
+
+        Returns:
+            Dict: {'samples', 'p95', 'p99'}（サンプル不足時の p95/p99 は None）
+        """
+        samples = self.get_samples(device_name, command)
+        if len(samples) < self.min_samples:
+            return {'samples': len(samples), 'p95': None, 'p99': None}
+        return {
+            'samples': len(samples),
+            'p95': percentile(samples, 0.95),
+            'p99': percentile(samples, 0.99)
+        }
+
+    def record_timeout(self, device_name: str, command: str):
+        """
+        コマンドのタイムアウトを記録
+
+        Args:
+            device_name: デバイス名
+            command: コマンド
+        """
+        key = (device_name, command)
+        with self.lock:
+            self._timeout_streaks[key] = self._timeout_streaks.get(key, 0) + 1
+
+    def record_success(self, device_name: str, command: str):
+        """
+        コマンドの成功を記録（連続タイムアウト回数をリセット）
+
+        Args:
+            device_name: デバイス名
+            command: コマンド
+        """
+        with self.lock:
+            self._timeout_streaks.pop((device_name, command), None)
+
+    def is_falling_back(self, device_name: str, command: str) -> bool:
+        """
+        連続タイムアウトにより既定値へ戻しているか判定
+
+        Args:
+            device_name: デバイス名
+            command: コマンド
+
+        Returns:
+            bool: 既定値へ戻している場合True
+        """
+        if self.fallback_after <= 0:
+            return False
+        with self.lock:
+            return self._timeout_streaks.get((device_name, command), 0) >= self.fallback_after
+
+    def command_timeout(self, device_name: str, command: str, default: float) -> float:
+        """
+        コマンドタイムアウトを計算
+
+        連続してタイムアウトしている場合は、学習値が既定値より短ければ既定値を使う。
+
+        Args:
+            device_name: デバイス名
+            command: コマンド
+            default: 履歴が不足している場合のタイムアウト
+
+        Returns:
+            float: タイムアウト（秒）
+        """
+        p99 = self.get_latency_profile(device_name, command)['p99']
+        if p99 is None:
+            return default
+        timeout = min(self.command_ceiling, max(self.command_floor, p99 * self.multiplier))
+        if self.is_falling_back(device_name, command):
+            return max(default, timeout)
+        return timeout
+
+    def scenario_timeout(self, device_name: str, commands: Iterable[str],
+                         default: float) -> float:
+        """
+        シナリオタイムアウトを計算（全コマンドの p99 の合計に倍率を掛ける）
+
+        連続してタイムアウトしているコマンドを含む場合は、学習値が既定値より短ければ既定値を使う。
+
+        Args:
+            device_name: デバイス名
+            commands: シナリオで実行する全コマンド
+            default: 履歴が不足しているコマンドがある場合のタイムアウト
+
+        Returns:
+            float: タイムアウト（秒）
+        """
+        total = 0.0
+        falling_back = False
+        for command in commands:
+            p99 = self.get_latency_profile(device_name, command)['p99']
+            if p99 is None:
+                return default
+            total += p99
+            falling_back = falling_back or self.is_falling_back(device_name, command)
+        if total <= 0:
+            return default
+        timeout = min(self.scenario_ceiling, max(self.scenario_floor, total * self.multiplier))
+        if falling_back:
+            return max(default, timeout)
+        return timeout
+
+    def is_enabled_for(self, device_config: Dict[str, Any], kind: str) -> bool:
+        """
+        デバイスに適応タイムアウトを使うか判定
+
+        devices.yaml の adaptive_timeouts で無効化でき、timeouts に明示された種別は
+        設定値を優先する。
+
+        Args:
+            device_config: デバイス設定辞書
+            kind: タイムアウト種別（'command' / 'scenario'）
+
+        Returns:
+            bool: 適応タイムアウトを使う場合True
+        """
+        if not self.enabled or not device_config.get('adaptive_timeouts', True):
+            return False
+        return kind not in (device_config.get('timeouts') or {})
+
+    def device_command_timeout(self, device_config: Dict[str, Any], command: str,
+                               default: float) -> float:
+        """
+        デバイス設定を考慮したコマンドタイムアウトを取得
+
+        Args:
+            device_config: デバイス設定辞書
+            command: コマンド
+            default: 設定上のコマンドタイムアウト
+
+        Returns:
+            float: タイムアウト（秒）
+        """
+        if not self.is_enabled_for(device_config, 'command'):
+            return default
+        return self.command_timeout(history_device_name(device_config), command, default)
+
+    def device_scenario_timeout(self, device_config: Dict[str, Any], command_items: List[Any],
+                                command_groups: Dict[str, Any], default: float) -> float:
+        """
+        デバイス設定を考慮したシナリオタイムアウトを取得
+
+        Args:
+            device_config: デバイス設定辞書
+            command_items: シナリオの commands（コマンドグループ名を含む）
+            command_groups: コマンドグループ設定
+            default: 設定上のシナリオタイムアウト
+
+        Returns:
+            float: タイムアウト（秒）
+        """
+        if not self.is_enabled_for(device_config, 'scenario'):
+            return default
+        return self.scenario_timeout(
+            history_device_name(device_config),
+            flatten_commands(command_items, command_groups),
+            default
+        )
+
+
+# グローバルインスタンス
+adaptive_timeout_model = AdaptiveTimeoutModel()
+
+def get_adaptive_timeout_model() -> AdaptiveTimeoutModel:
+    """適応タイムアウトモデルを取得"""
+    return adaptive_timeout_model
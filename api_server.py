@@ -18,6 +18,18 @@ import time
 from concurrent.futures import ThreadPoolExecutor
 import uuid
 
+# 到達性事前チェックモジュールのインポート
+from reachability import probe_device_names
+
+# ネットワーク実行モジュールのインポート
+from network_executor import execute_commands_cached
+
+# コマンド分類モジュールのインポート
+from command_classifier import has_control_characters, is_read_only
+
+# 出力キャプチャモジュールのインポート
+from output_capture import resolve_outputs
+
 # ロギング設定
 logging.basicConfig(
     level=logging.INFO,
@@ -401,6 +413,65 @@ def get_devices():
         logger.error(f"デバイス一覧取得エラー: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/v1/probe', methods=['POST'])
+def probe_devices():
+    """デバイスの到達性（SSH/Telnetポート）を一斉に確認"""
+    try:
+        config = api_server.load_config()
+        devices = config.get('devices', {})
+        
+        # リクエストデータを取得（devices省略時は全デバイス）
+        data = request.get_json(silent=True) or {}
+        device_names = data.get('devices') or list(devices.keys())
+        
+        results = probe_device_names(device_names, devices, data.get('timeout'))
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'unreachable': [name for name, r in results.items() if not r['reachable']]
+        })
+    except Exception as e:
+        logger.error(f"到達性チェックエラー: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/v1/devices/<device_name>/commands', methods=['POST'])
+def execute_device_commands(device_name):
+    """
+    デバイスで参照系コマンドを実行（max_age秒以内のshowコマンド結果はキャッシュから返す）
+
+    このAPIは認証を持たないため、設定変更系のコマンドと制御文字を含むコマンドは受け付けない。
+    """
+    try:
+        config = api_server.load_config()
+        devices = config.get('devices', {})
+        if device_name not in devices:
+            return jsonify({'error': 'Device not found'}), 404
+        
+        # リクエストデータを取得
+        data = request.get_json(silent=True) or {}
+        commands = data.get('commands') or []
+        if not commands:
+            return jsonify({'error': 'No commands specified'}), 400
+        # 改行などを含むコマンドは複数コマンドとして送信されるため拒否する
+        rejected = [
+            command for command in commands
+            if not isinstance(command, str) or has_control_characters(command) or not is_read_only(command)
+        ]
+        if rejected:
+            return jsonify({'error': 'Only read-only commands are allowed', 'rejected': rejected}), 403
+        
+        max_age = data.get('max_age')
+        result = execute_commands_cached(
+            devices[device_name],
+            commands,
+            float(max_age) if max_age is not None else None
+        )
+        result['device_name'] = device_name
+        return jsonify(resolve_outputs(result))
+    except Exception as e:
+        logger.error(f"コマンド実行エラー: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/v1/logs', methods=['GET'])
 def get_logs():
     """システムログを取得"""
@@ -1,15 +1,16 @@
 
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash
+from flask import Flask, render_template, request, redirect, url_for, send_file, flash, jsonify
 from network_executor import NetworkDeviceExecutor
 import yaml
 import os
 import subprocess
 import threading
+import time
 import json
 from datetime import datetime
 
 import io
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from security import ConfigEncryptor, initialize_encryption
 
 # 暗号化初期化
@@ -54,11 +55,38 @@ def save_yaml(file_path: str, data: Dict[str, Any], encrypt: bool = True):
 from config_manager import config_manager, get_devices, get_command_groups, get_scenarios
 
 # ネットワーク実行モジュールのインポート
-from network_executor import NetworkDeviceExecutor, execute_scenario_on_device, test_device_connection
+from network_executor import NetworkDeviceExecutor, test_device_connection
 
 # ログ管理モジュールのインポート
 from logger_manager import get_log_manager
 
+# 接続管理モジュールのインポート（統計API用）
+from connection_governor import get_connection_governor
+from connection_pool import get_connection_pool
+from timeout_manager import get_timeout_manager
+from health_cache import get_host_health_cache
+
+# 到達性事前チェックモジュールのインポート
+from reachability import PRECHECK_ENABLED, probe_device_names
+
+# 結果キャッシュモジュールのインポート
+from result_cache import get_result_cache
+
+# 出力キャプチャモジュールのインポート
+from output_capture import resolve_outputs
+
+# 同一実行の合流モジュールのインポート
+from single_flight import get_single_flight
+
+# 実行時間予測モジュールのインポート
+from duration_predictor import simulate_makespan
+
+# シナリオ実行のディスパッチモジュールのインポート
+from scenario_dispatcher import (
+    DEFAULT_LIST_CONCURRENCY, build_work_items, dispatch_work_items,
+    get_list_concurrency, get_scenario_concurrency
+)
+
 def validate_all_configs():
     """すべての設定ファイルをバリデーション"""
     results = {
@@ -92,7 +120,7 @@ def validate_all_configs():
     
     return results
 
-def execute_scenario_on_device(device_name: str, scenario_name: str):
+def execute_named_scenario_on_device(device_name: str, scenario_name: str):
     """
     デバイスでシナリオを実行
     
@@ -119,6 +147,93 @@ def execute_scenario_on_device(device_name: str, scenario_name: str):
     executor = NetworkDeviceExecutor(device_config)
     return executor.execute_scenario(scenario_config, command_groups)
 
+def _precheck_requested() -> bool:
+    """リクエストで到達性チェックの省略が指定されていないか確認（リクエスト処理中に呼ぶ）"""
+    return PRECHECK_ENABLED and not request.values.get('skip_precheck')
+
+def _precheck_reachability(device_names, devices: Dict[str, Any],
+                           enabled: bool = True) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    実行前に対象デバイスの到達性を一斉に確認
+    
+    Args:
+        device_names: 対象デバイス名
+        devices: デバイス設定
+        enabled: Falseの場合は確認しない
+        
+    Returns:
+        デバイス名をキーとする確認結果（確認しない場合None）
+    """
+    if not enabled:
+        return None
+    try:
+        return probe_device_names(device_names, devices)
+    except Exception as e:
+        print(f"到達性チェックエラー: {e}")
+        return None
+
+def _count_device_results(device_results: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """デバイス結果の (成功数, 失敗数)"""
+    successful_devices = sum(1 for r in device_results if r['success'])
+    return successful_devices, len(device_results) - successful_devices
+
+def _run_scenario_on_devices(scenario: Dict[str, Any], devices: Dict[str, Any],
+                             command_groups: Dict[str, Any],
+                             reachability: Optional[Dict[str, Dict[str, Any]]] = None):
+    """
+    シナリオ対象デバイスを共有ワーカープールで並列実行
+    
+    Args:
+        scenario: シナリオ設定（name にシナリオ名）
+        devices: デバイス設定
+        command_groups: コマンドグループ設定
+        reachability: 到達性チェックの結果（省略時はチェックしない）
+        
+    Returns:
+        (デバイス結果リスト, 成功デバイス数, 失敗デバイス数)
+    """
+    item_results = dispatch_work_items(
+        [([scenario], device_name) for device_name in scenario['devices']],
+        devices, command_groups, reachability,
+        get_scenario_concurrency(scenario)
+    )
+    scenario_results = [device_results[0] for device_results in item_results]
+    successful_devices, failed_devices = _count_device_results(scenario_results)
+    return scenario_results, successful_devices, failed_devices
+
+def _makespan_summary(scenario: Dict[str, Any], scenario_results, elapsed: float) -> Dict[str, Any]:
+    """予測メイクスパン（LPT順・同時実行数で計算）と実績の所要時間"""
+    predicted = sorted(
+        (r['predicted_time'] for r in scenario_results if r.get('predicted_time') is not None),
+        reverse=True
+    )
+    return {
+        'predicted_makespan': simulate_makespan(predicted, get_scenario_concurrency(scenario)),
+        'actual_makespan': elapsed
+    }
+
+def _build_scenario_result(scenario: Dict[str, Any], scenario_results: List[Dict[str, Any]],
+                           elapsed: float) -> Dict[str, Any]:
+    """デバイス結果からシナリオ全体の結果を作成"""
+    successful_devices, failed_devices = _count_device_results(scenario_results)
+    total_devices = len(scenario['devices'])
+    overall_success = failed_devices == 0
+    result = {
+        'scenario_name': scenario['name'],
+        'devices': scenario['devices'],
+        'commands': scenario['commands'],
+        'success': overall_success,
+        'status': 'success' if overall_success else 'partial_success',
+        'total_devices': total_devices,
+        'successful_devices': successful_devices,
+        'failed_devices': failed_devices,
+        'device_results': scenario_results,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'execution_summary': f'{successful_devices}/{total_devices} デバイスで成功'
+    }
+    result.update(_makespan_summary(scenario, scenario_results, elapsed))
+    return result
+
 def get_config_summary():
     """設定のサマリーを取得"""
     devices = get_devices()
@@ -249,6 +364,7 @@ def create_sample_data():
             'group': 'monitoring',
             'delay': 2,
             'timeout': 30,
+            'concurrency': 20,
             'save_config': False
         },
         'interface-configuration': {
@@ -530,6 +646,8 @@ def edit_scenario(scenario_name):
                 'description': request.form.get('description', ''),
                 'group': request.form.get('group', 'default')
             }
+            if request.form.get('concurrency'):
+                scenarios[scenario_name]['concurrency'] = int(request.form['concurrency'])
             config_manager.save_config('scenarios', scenarios)
             flash('シナリオを更新しました', 'success')
         else:
@@ -641,12 +759,13 @@ def execute():
 def _execute_scenario_logic(scenario_name):
     """シナリオ実行のロジック（Flaskルートではない）"""
     scenarios = get_scenarios()
+    precheck = _precheck_requested()
     
     if scenario_name not in scenarios:
         flash('シナリオが見つかりません', 'danger')
         return redirect(url_for('execute'))
     
-    scenario = scenarios[scenario_name]
+    scenario = dict(scenarios[scenario_name], name=scenario_name)
     
     # 非同期で実行
     def execute_scenario():
@@ -659,63 +778,21 @@ def _execute_scenario_logic(scenario_name):
             result_dir = os.path.join('results', datetime.now().strftime('%Y%m%d'))
             os.makedirs(result_dir, exist_ok=True)
             
-            # 各デバイスでシナリオを実行
-            scenario_results = []
+            # 到達性を事前に確認し、各デバイスでシナリオを並列実行
             total_devices = len(scenario['devices'])
-            successful_devices = 0
-            failed_devices = 0
-            
-            for device_name in scenario['devices']:
-                if device_name in devices:
-                    device_config = devices[device_name]
-                    
-                    # シナリオを実行
-                    device_result = execute_scenario_on_device(
-                        device_config, 
-                        command_groups, 
-                        scenario
-                    )
-                    
-                    scenario_results.append(device_result)
-                    
-                    if device_result['success']:
-                        successful_devices += 1
-                    else:
-                        failed_devices += 1
-                else:
-                    # デバイスが存在しない場合
-                    scenario_results.append({
-                        'device_name': device_name,
-                        'device_host': 'unknown',
-                        'success': False,
-                        'start_time': datetime.now().isoformat(),
-                        'end_time': datetime.now().isoformat(),
-                        'total_commands': 0,
-                        'successful_commands': 0,
-                        'failed_commands': 0,
-                        'error_message': f'Device {device_name} not found'
-                    })
-                    failed_devices += 1
+            reachability = _precheck_reachability(scenario['devices'], devices, precheck)
+            started = time.time()
+            scenario_results, successful_devices, failed_devices = _run_scenario_on_devices(
+                scenario, devices, command_groups, reachability
+            )
             
             # 全体の結果を作成
-            overall_success = failed_devices == 0
-            result = {
-                'scenario_name': scenario_name,
-                'devices': scenario['devices'],
-                'commands': scenario['commands'],
-                'status': 'success' if overall_success else 'partial_success',
-                'total_devices': total_devices,
-                'successful_devices': successful_devices,
-                'failed_devices': failed_devices,
-                'device_results': scenario_results,
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'execution_summary': f'{successful_devices}/{total_devices} デバイスで成功'
-            }
+            result = _build_scenario_result(scenario, scenario_results, time.time() - started)
             
             # 結果を保存
             result_file = os.path.join(result_dir, f'{scenario_name}_{datetime.now().strftime("%H%M%S")}.yaml')
             with open(result_file, 'w', encoding='utf-8') as f:
-                yaml.dump(result, f, default_flow_style=False, allow_unicode=True)
+                yaml.dump(resolve_outputs(result), f, default_flow_style=False, allow_unicode=True)
                 
             # 実行ログを保存
             log_file = os.path.join(result_dir, f'{scenario_name}_{datetime.now().strftime("%H%M%S")}.log')
@@ -724,11 +801,14 @@ def _execute_scenario_logic(scenario_name):
                 f.write(f"実行時刻: {result['timestamp']}\n")
                 f.write(f"全体の状態: {result['status']}\n")
                 f.write(f"デバイス結果: {successful_devices}/{total_devices} 成功\n")
+                f.write(f"所要時間: 予測 {result['predicted_makespan']:.1f}秒 / 実績 {result['actual_makespan']:.1f}秒\n")
                 f.write("=" * 50 + "\n\n")
                 
                 for device_result in scenario_results:
                     f.write(f"デバイス: {device_result['device_name']} ({device_result['device_host']})\n")
                     f.write(f"状態: {'成功' if device_result['success'] else '失敗'}\n")
+                    if device_result.get('predicted_time') is not None:
+                        f.write(f"実行時間: 予測 {device_result['predicted_time']:.1f}秒 / 実績 {device_result.get('actual_time') or 0:.1f}秒\n")
                     f.write(f"実行コマンド数: {device_result['total_commands']}\n")
                     f.write(f"成功コマンド数: {device_result['successful_commands']}\n")
                     f.write(f"失敗コマンド数: {device_result['failed_commands']}\n")
@@ -784,52 +864,37 @@ def execute_scenario_post():
                 if scenario_list_data and 'scenarios' in scenario_list_data:
                     # シナリオリスト内のすべてのシナリオを実行
                     scenarios_to_run = scenario_list_data['scenarios']
+                    list_concurrency = get_list_concurrency(scenario_list_data)
+                    precheck = _precheck_requested()
                     
                     # 非同期で実行
                     def execute_scenario_list():
                         try:
-                            # 並列でシナリオを実行
-                            from concurrent.futures import ThreadPoolExecutor, as_completed
+                            # リスト内の全シナリオの対象デバイスを一度だけ到達性チェック
+                            all_scenarios = get_scenarios()
+                            reachability = _precheck_reachability(
+                                [device_name
+                                 for name in scenarios_to_run if name in all_scenarios
+                                 for device_name in all_scenarios[name].get('devices', [])],
+                                get_devices(),
+                                precheck
+                            )
                             
                             # 結果を保存するディレクトリを作成
                             result_dir = os.path.join('results', datetime.now().strftime('%Y%m%d'))
                             os.makedirs(result_dir, exist_ok=True)
                             
-                            # 各シナリオの実行結果を保存
-                            list_results = []
                             total_scenarios = len(scenarios_to_run)
                             successful_scenarios = 0
                             failed_scenarios = 0
                             
-                            # ThreadPoolExecutorで並列実行
-                            with ThreadPoolExecutor(max_workers=min(5, total_scenarios)) as executor:
-                                # 各シナリオの実行をサミット
-                                future_to_scenario = {}
-                                for scenario_name in scenarios_to_run:
-                                    future = executor.submit(_execute_single_scenario_for_list, scenario_name)
-                                    future_to_scenario[future] = scenario_name
-                                
-                                # 実行結果を収集
-                                for future in as_completed(future_to_scenario):
-                                    scenario_name = future_to_scenario[future]
-                                    try:
-                                        scenario_result = future.result()
-                                        list_results.append(scenario_result)
-                                        
-                                        if scenario_result['success']:
-                                            successful_scenarios += 1
-                                        else:
-                                            failed_scenarios += 1
-                                            
-                                    except Exception as e:
-                                        # シナリオ実行が失敗した場合
-                                        list_results.append({
-                                            'scenario_name': scenario_name,
-                                            'success': False,
-                                            'error_message': str(e),
-                                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                                        })
-                                        failed_scenarios += 1
+                            # 全シナリオをデバイス単位の作業にまとめ、共有キューに投入して実行
+                            list_results = _execute_scenarios_for_list(scenarios_to_run, reachability, list_concurrency)
+                            for scenario_result in list_results:
+                                if scenario_result['success']:
+                                    successful_scenarios += 1
+                                else:
+                                    failed_scenarios += 1
                             
                             # シナリオリスト全体の結果を作成
                             overall_success = failed_scenarios == 0
@@ -848,7 +913,7 @@ def execute_scenario_post():
                             # 結果を保存
                             result_file = os.path.join(result_dir, f'scenario_list_{scenario_name}_{datetime.now().strftime("%H%M%S")}.yaml')
                             with open(result_file, 'w', encoding='utf-8') as f:
-                                yaml.dump(list_result, f, default_flow_style=False, allow_unicode=True)
+                                yaml.dump(resolve_outputs(list_result), f, default_flow_style=False, allow_unicode=True)
                             
                             # 実行ログを保存
                             log_file = os.path.join(result_dir, f'scenario_list_{scenario_name}_{datetime.now().strftime("%H%M%S")}.log')
@@ -892,97 +957,72 @@ def execute_scenario_post():
     # シナリオリストが存在しない場合は通常のシナリオ実行
     return _execute_scenario_logic(scenario_name)
 
-def _execute_single_scenario_for_list(scenario_name):
-    """シナリオリスト用の単一シナリオ実行（並列実行用）"""
+def _execute_scenarios_for_list(scenario_names: List[str],
+                                reachability: Optional[Dict[str, Dict[str, Any]]] = None,
+                                concurrency: int = DEFAULT_LIST_CONCURRENCY) -> List[Dict[str, Any]]:
+    """
+    シナリオリストの全シナリオをデバイス単位の作業に展開して並列実行
+    
+    複数のシナリオに含まれるデバイスは宣言順に1セッションで実行し（ログインは1回）、
+    全作業を1つのキューにまとめて共有ワーカープールで実行した後、
+    結果をシナリオごとにまとめ直して保存する。
+    
+    Args:
+        scenario_names: シナリオ名のリスト
+        reachability: 到達性チェックの結果（省略時はチェックしない）
+        concurrency: シナリオリスト全体の同時実行デバイス数
+        
+    Returns:
+        シナリオごとの実行結果（scenario_namesの順）
+    """
     scenarios = get_scenarios()
+    devices = get_devices()
+    command_groups = get_command_groups()
     
-    if scenario_name not in scenarios:
-        return {
-            'scenario_name': scenario_name,
-            'success': False,
-            'error_message': f'Scenario {scenario_name} not found',
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+    # 実行結果を保存するディレクトリを作成
+    result_dir = os.path.join('results', datetime.now().strftime('%Y%m%d'))
+    os.makedirs(result_dir, exist_ok=True)
     
-    scenario = scenarios[scenario_name]
+    # 同じデバイスを対象とするシナリオは1つの作業単位（1セッション）にまとめる
+    work_items, planned = build_work_items(scenario_names, scenarios)
     
-    try:
-        # デバイスとコマンドグループを取得
-        devices = get_devices()
-        command_groups = get_command_groups()
-        
-        # 実行結果を保存するディレクトリを作成
-        result_dir = os.path.join('results', datetime.now().strftime('%Y%m%d'))
-        os.makedirs(result_dir, exist_ok=True)
-        
-        # 各デバイスでシナリオを実行
-        scenario_results = []
-        total_devices = len(scenario['devices'])
-        successful_devices = 0
-        failed_devices = 0
-        
-        for device_name in scenario['devices']:
-            if device_name in devices:
-                device_config = devices[device_name]
-                
-                # シナリオを実行
-                device_result = execute_scenario_on_device(
-                    device_config, 
-                    command_groups, 
-                    scenario
-                )
-                
-                scenario_results.append(device_result)
-                
-                if device_result['success']:
-                    successful_devices += 1
-                else:
-                    failed_devices += 1
-            else:
-                # デバイスが存在しない場合
-                scenario_results.append({
-                    'device_name': device_name,
-                    'device_host': 'unknown',
-                    'success': False,
-                    'start_time': datetime.now().isoformat(),
-                    'end_time': datetime.now().isoformat(),
-                    'total_commands': 0,
-                    'successful_commands': 0,
-                    'failed_commands': 0,
-                    'error_message': f'Device {device_name} not found'
-                })
-                failed_devices += 1
-        
-        # 全体の結果を作成
-        overall_success = failed_devices == 0
-        result = {
-            'scenario_name': scenario_name,
-            'devices': scenario['devices'],
-            'commands': scenario['commands'],
-            'success': overall_success,
-            'status': 'success' if overall_success else 'partial_success',
-            'total_devices': total_devices,
-            'successful_devices': successful_devices,
-            'failed_devices': failed_devices,
-            'device_results': scenario_results,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'execution_summary': f'{successful_devices}/{total_devices} デバイスで成功'
-        }
+    started = time.time()
+    finished_at = {}
+    item_results = dispatch_work_items(
+        work_items, devices, command_groups, reachability, concurrency, finished_at
+    )
+    
+    # シナリオごとに結果をまとめ直す
+    list_results = []
+    for scenario_name, scenario, placements in planned:
+        if scenario is None:
+            list_results.append({
+                'scenario_name': scenario_name,
+                'success': False,
+                'error_message': f'Scenario {scenario_name} not found',
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
+            continue
         
-        # 結果を保存
-        result_file = os.path.join(result_dir, f'{scenario_name}_{datetime.now().strftime("%H%M%S")}.yaml')
-        with open(result_file, 'w', encoding='utf-8') as f:
-            yaml.dump(result, f, default_flow_style=False, allow_unicode=True)
+        try:
+            scenario_results = [item_results[i][k] for i, k in placements]
+            finished = max((finished_at[i] for i, _ in placements if i in finished_at), default=started)
+            result = _build_scenario_result(scenario, scenario_results, finished - started)
             
-        return result
-        
-    except Exception as e:
-        return {
-            'scenario_name': scenario_name,
-            'success': False,
-            'error_message': str(e),
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+            # 結果を保存
+            result_file = os.path.join(result_dir, f'{scenario_name}_{datetime.now().strftime("%H%M%S")}.yaml')
+            with open(result_file, 'w', encoding='utf-8') as f:
+                yaml.dump(resolve_outputs(result), f, default_flow_style=False, allow_unicode=True)
+        except Exception as e:
+            result = {
+                'scenario_name': scenario_name,
+                'success': False,
+                'error_message': str(e),
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+        list_results.append(result)
+    
+    return list_results
 
 @app.route('/execute_scenario_list', methods=['GET', 'POST'])
 def execute_scenario_list():
@@ -990,7 +1030,11 @@ def execute_scenario_list():
     if request.method == 'POST':
         scenario_list_name = request.form.get('scenario_list')
         if scenario_list_name:
-            return redirect(url_for('execute_scenario_post', scenario_name=scenario_list_name))
+            return redirect(url_for(
+                'execute_scenario_post',
+                scenario_name=scenario_list_name,
+                skip_precheck=request.form.get('skip_precheck')
+            ))
     
     scenarios = get_scenarios()
     return render_template('scenario_lists.html', scenarios=scenarios)
@@ -1216,6 +1260,68 @@ def api_logs_summary():
             'error': str(e)
         })
 
+@app.route('/api/probe', methods=['POST'])
+def api_probe():
+    """
+    到達性チェックAPI
+    
+    リクエストJSONの devices（デバイス名リスト）、scenario、scenario_list の
+    いずれかで対象を指定する。省略時は全デバイス。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        devices = get_devices()
+        scenarios = get_scenarios()
+        
+        if data.get('devices'):
+            device_names = data['devices']
+        elif data.get('scenario'):
+            device_names = scenarios.get(data['scenario'], {}).get('devices', [])
+        elif data.get('scenario_list'):
+            with open(f"scenario_lists/{data['scenario_list']}.yaml", 'r', encoding='utf-8') as f:
+                list_data = yaml.safe_load(f) or {}
+            device_names = [
+                device_name
+                for name in list_data.get('scenarios', []) if name in scenarios
+                for device_name in scenarios[name].get('devices', [])
+            ]
+        else:
+            device_names = list(devices.keys())
+        
+        results = probe_device_names(device_names, devices, data.get('timeout'))
+        return jsonify({
+            'success': True,
+            'results': results,
+            'reachable': sum(1 for r in results.values() if r['reachable']),
+            'unreachable': sum(1 for r in results.values() if not r['reachable'])
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/api/connection_stats')
+def api_connection_stats():
+    """接続統計API（ガバナーの待ち行列・接続プール・タイムアウト・サーキットブレーカー）"""
+    try:
+        return jsonify({
+            'success': True,
+            'governor': get_connection_governor().get_stats(),
+            'connection_pool': get_connection_pool().get_stats(),
+            'timeouts': get_timeout_manager().get_stats(),
+            'circuit_breaker': get_host_health_cache().get_stats(),
+            'result_cache': get_result_cache().get_stats(),
+            'single_flight': get_single_flight().get_stats()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
 @app.route('/api/logs/device/<device_name>')
 def api_device_logs(device_name):
     """デバイス別ログAPI"""
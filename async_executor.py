@@ -0,0 +1,574 @@
+"""
+非同期ネットワークデバイスコマンド実行モジュール
+asyncioベースで多数のデバイスを少数のスレッドから同時に操作する。
+
+Telnetはtelnetlib3のコルーチンを共有イベントループ（async_loop）上で実行し、
+呼び出し元のループからはスレッドを使わずに待つ。接続は同期実装と同じ
+接続プール・ガバナー・サーキットブレーカーを通す。
+paramikoは同期APIのためSSHはコルーチン化せず、同期実装を共有スレッドプール上で
+実行する。SSHの同時実行数は ASYNC_SSH_WORKERS スレッドが上限となり、
+それを超えるデバイスはスレッドの空き待ちになる（スレッド数はデバイス数に比例しない）。
+"""
+import asyncio
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# ネットワーク実行モジュールのインポート
+from network_executor import (
+    NetworkDeviceExecutor,
+    execute_telnet_command_async,
+    open_telnet_connection
+)
+
+# 共有イベントループモジュールのインポート
+from async_loop import get_telnet_event_loop
+
+# 接続管理モジュールのインポート
+from connection_governor import get_connection_governor
+from connection_pool import ConnectionPool, get_connection_pool
+
+# ログ管理モジュールのインポート
+from logger_manager import get_log_manager
+
+# 到達性キャッシュモジュールのインポート
+from health_cache import HostHealthCache, get_host_health_cache, is_transport_error
+
+# 適応タイムアウトモジュールのインポート
+from adaptive_timeouts import get_adaptive_timeout_model
+
+# コマンド分類モジュールのインポート
+from command_classifier import is_read_only
+
+# 結果キャッシュモジュールのインポート
+from result_cache import get_result_cache
+
+logger = logging.getLogger(__name__)
+
+# paramikoは同期APIのため、SSHのI/Oはこの共有スレッドプール上で実行する
+# （同時に実行できるSSHデバイス数の上限になる。環境変数で変更可能）
+SSH_IO_WORKERS = int(os.getenv('ASYNC_SSH_WORKERS', '256'))
+ssh_io_pool = ThreadPoolExecutor(
+    max_workers=SSH_IO_WORKERS,
+    thread_name_prefix='ssh-io'
+)
+
+# バッチ実行時の既定同時実行デバイス数
+DEFAULT_BATCH_CONCURRENCY = 500
+
+
+class AsyncNetworkDeviceExecutor:
+    """
+    非同期ネットワークデバイスコマンド実行クラス
+
+    NetworkDeviceExecutorと同じ結果形式を返す。Telnetはtelnetlib3で
+    ネイティブに非同期実行し（I/Oは共有イベントループ上、タイムアウトは asyncio.wait_for）、
+    SSHは同期実装の execute_commands / execute_scenario を共有スレッドプール上で呼び出す
+    （メモ・結果キャッシュ・パイプライン/並列実行・デッドライン監視は同期実装のものが適用される）。
+    Telnetのセッションは接続プールから取得し、execute_scenario の終了時にプールへ返却する。
+    """
+
+    DEFAULT_TIMEOUTS = NetworkDeviceExecutor.DEFAULT_TIMEOUTS
+
+    def __init__(self, device_config: Dict[str, Any]):
+        """
+        デバイス設定で初期化
+
+        Args:
+            device_config: デバイス設定辞書
+        """
+        self.device_config = device_config
+        # タイムアウト設定の初期化
+        self.timeouts = self.DEFAULT_TIMEOUTS.copy()
+        if 'timeouts' in device_config:
+            self.timeouts.update(device_config['timeouts'])
+        self.connection_type = device_config.get('connection_type', 'ssh').lower()
+        self.device_name = device_config.get('hostname', device_config.get('host', 'unknown'))
+        self.connection = None
+        # 直近の接続失敗の種別 ('connection' または 'circuit_open')
+        self.connect_error_type = 'connection'
+
+        # 到達不能デバイスのサーキットブレーカー（SSHは同期実装側で判定）
+        self.health_cache = get_host_health_cache()
+        self.health_key = HostHealthCache.make_key(device_config)
+
+        # 接続プールとガバナー（SSHは同期実装側で利用）
+        self.pool = get_connection_pool()
+        self.pool_key = ConnectionPool.make_key(device_config)
+        self.session = None
+        self.governor = get_connection_governor()
+        self._governor_ticket = None
+
+        # ログ管理インスタンスの取得
+        self.log_manager = get_log_manager()
+        # 実行履歴に基づく適応タイムアウト
+        self.timeout_model = get_adaptive_timeout_model()
+        # 設定変更系コマンドの実行時に破棄する結果キャッシュ
+        self.result_cache = get_result_cache()
+
+        # SSHは同期実装（接続プール・シェルモード含む）を利用
+        self._sync_executor = None
+        if self.connection_type == 'ssh':
+            self._sync_executor = NetworkDeviceExecutor(device_config)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
+
+    async def _run_blocking(self, func, *args):
+        """同期関数を共有スレッドプール上で実行"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(ssh_io_pool, func, *args)
+
+    @staticmethod
+    async def _on_telnet_loop(coro):
+        """コルーチンを共有イベントループ上で実行し、スレッドを使わずに待つ"""
+        return await asyncio.wrap_future(get_telnet_event_loop().submit(coro))
+
+    async def _acquire_governor_ticket(self, new_login: bool) -> bool:
+        """
+        ガバナーのセッション枠を取得
+
+        ガバナーの待ちはブロッキングのため共有スレッドプール上で行う。
+        待っている間に呼び出し元がキャンセルされた場合、後から取得できた枠は返却する。
+        """
+        loop = asyncio.get_running_loop()
+        acquiring = loop.run_in_executor(
+            ssh_io_pool, self.governor.acquire, self.device_config, new_login, self.timeouts['connect']
+        )
+        try:
+            self._governor_ticket = await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            acquiring.add_done_callback(
+                lambda future: future.cancelled() or future.exception() or self.governor.release(future.result())
+            )
+            raise
+        return self._governor_ticket is not None
+
+    def _release_governor_ticket(self):
+        """ガバナーのセッション枠を返却"""
+        ticket, self._governor_ticket = self._governor_ticket, None
+        self.governor.release(ticket)
+
+    async def connect(self) -> bool:
+        """
+        デバイスに接続
+
+        Returns:
+            bool: 接続成功時True、失敗時False
+        """
+        self.connect_error_type = 'connection'
+        try:
+            if self.connection_type == 'ssh':
+                connected = await self._run_blocking(self._sync_executor.connect)
+                self.connection = self._sync_executor.connection if connected else None
+                self.connect_error_type = self._sync_executor.connect_error_type
+                if connected:
+                    await self._run_blocking(
+                        self._sync_executor._apply_session_preamble, 'ssh'
+                    )
+                return connected
+            elif self.connection_type == 'telnet':
+                return await self._connect_telnet()
+            else:
+                logger.error(f"Unsupported connection type: {self.connection_type}")
+                return False
+
+        except Exception as e:
+            logger.error(f"Connection error for {self.device_name}: {e}")
+            return False
+
+    async def _connect_telnet(self) -> bool:
+        """Telnetセッションを接続プールから取得するか、共有イベントループ上で新規に確立"""
+        # 到達不能として遮断中のホストは即座に失敗させる
+        if self.health_cache.check(self.health_key) is not None:
+            self.connect_error_type = 'circuit_open'
+            return False
+
+        # プール内の生存セッションを再利用し、ガバナーでセッション枠を取得
+        session = self.pool.acquire(self.pool_key)
+        try:
+            acquired = await self._acquire_governor_ticket(new_login=session is None)
+        except BaseException:
+            if session:
+                self.pool.release(session)
+            raise
+        if not acquired:
+            if session:
+                self.pool.release(session)
+            self.health_cache.cancel_probe(self.health_key)
+            return False
+
+        if session:
+            self.session = session
+            self.connection = session.connection
+            self.health_cache.record_success(self.health_key)
+            logger.debug(f"Reusing pooled session for {self.pool_key[0]}")
+        else:
+            try:
+                self.connection = await self._on_telnet_loop(open_telnet_connection(self.device_config))
+            except BaseException as e:
+                # タイムアウト（キャンセル）・接続拒否などの到達性の失敗だけをブレーカーへ記録
+                if is_transport_error(e):
+                    self.health_cache.record_failure(self.health_key, str(e) or 'Connection timed out')
+                else:
+                    self.health_cache.cancel_probe(self.health_key)
+                self._release_governor_ticket()
+                raise
+            if self.connection is None:
+                # ログインに失敗してもホストには到達できているため遮断しない
+                self.connect_error_type = 'authentication'
+                self.health_cache.cancel_probe(self.health_key)
+                self._release_governor_ticket()
+                return False
+            self.health_cache.record_success(self.health_key)
+            self.session = self.pool.register(
+                self.pool_key, self.connection, NetworkDeviceExecutor._close_connection
+            )
+            logger.info(f"Telnet connection established to {self.device_config.get('host')}")
+
+        await self._apply_session_preamble()
+        return True
+
+    async def _apply_session_preamble(self):
+        """セッションプリアンブル（ページング無効化など）を送信（セッションごとに一度だけ）"""
+        if self.session.attributes.get('preamble_applied'):
+            return
+        wait_string = self.device_config.get('wait_string', '#')
+        for command in NetworkDeviceExecutor.get_session_preamble(self.device_config):
+            try:
+                await asyncio.wait_for(
+                    self._on_telnet_loop(execute_telnet_command_async(self.connection, command, wait_string)),
+                    timeout=self.timeouts['command']
+                )
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Session preamble timed out: {command}")
+            except Exception as e:
+                logger.warning(f"Session preamble command failed: {command}: {e}")
+        self.session.attributes['preamble_applied'] = True
+
+    async def disconnect(self, reusable: bool = True):
+        """
+        接続を切断
+
+        Args:
+            reusable: SSHセッションを接続プールへ返却する場合True
+        """
+        try:
+            if self._sync_executor:
+                if reusable:
+                    await self._run_blocking(self._sync_executor.release)
+                else:
+                    await self._run_blocking(self._sync_executor.disconnect)
+            elif self.session:
+                if reusable:
+                    self.pool.release(self.session)
+                else:
+                    self.pool.discard(self.session)
+                    logger.info("Connection closed")
+            elif self.connection:
+                self.connection.close()
+                logger.info("Connection closed")
+        except Exception as e:
+            logger.error(f"Error while disconnecting: {e}")
+        finally:
+            self.connection = None
+            self.session = None
+            self._release_governor_ticket()
+
+    async def execute_commands(self, commands: List[str]) -> Dict[str, Any]:
+        """
+        コマンドを実行し、結果を返す（接続は維持する）
+
+        Args:
+            commands: 実行するコマンドリスト
+
+        Returns:
+            Dict: 実行結果（NetworkDeviceExecutor.execute_commandsと同形式）
+        """
+        if self.connection_type == 'ssh':
+            # 同期実装がセッションをプールから取得し、実行後に返却する
+            return await self._run_blocking(self._sync_executor.execute_commands, commands)
+
+        result = {
+            'success': True,
+            'output': '',
+            'error_output': '',
+            'command_results': [],
+            'timeout_occurred': False
+        }
+
+        try:
+            # 接続の確立（タイムアウト付き）
+            if not self.connection:
+                try:
+                    connected = await asyncio.wait_for(
+                        self.connect(), timeout=self.timeouts['connect']
+                    )
+                except asyncio.TimeoutError:
+                    connected = False
+                if not connected:
+                    circuit_open = self.connect_error_type == 'circuit_open'
+                    return {
+                        'success': False,
+                        'error': 'Device unreachable (circuit open)' if circuit_open else 'Connection failed',
+                        'error_type': self.connect_error_type,
+                        'output': '',
+                        'error_output': ''
+                    }
+
+            for command in commands:
+                command_timeout = self.timeout_model.device_command_timeout(
+                    self.device_config, command, self.timeouts['command']
+                )
+                try:
+                    command_result = await asyncio.wait_for(
+                        self._execute_single_command(command),
+                        timeout=command_timeout
+                    )
+                    result['command_results'].append(command_result)
+
+                    if not command_result['success']:
+                        result['success'] = False
+                        result['error_output'] += command_result['error_output'] + "\n"
+                    else:
+                        self.timeout_model.record_success(self.device_name, command)
+
+                    # コマンド実行結果をログに記録（成功時の実行時間は適応タイムアウトの履歴になる）
+                    self.log_manager.log_command_execution(
+                        self.device_name,
+                        command,
+                        command_result
+                    )
+
+                except asyncio.TimeoutError:
+                    self.timeout_model.record_timeout(self.device_name, command)
+                    timeout_result = {
+                        'command': command,
+                        'success': False,
+                        'output': '',
+                        'error_output': f"Command timed out after {command_timeout:g} seconds",
+                        'error_type': 'timeout',
+                        'execution_time': command_timeout
+                    }
+                    result['command_results'].append(timeout_result)
+                    result['success'] = False
+                    result['error_output'] += timeout_result['error_output'] + "\n"
+                    result['timeout_occurred'] = True
+                    self.log_manager.log_command_execution(
+                        self.device_name,
+                        command,
+                        timeout_result
+                    )
+                    # タイムアウト後のセッションは状態不明のため破棄する
+                    await self.disconnect(reusable=False)
+                    break
+                finally:
+                    # 設定変更系コマンドは同じデバイスのキャッシュ・他の実行のメモを古くする
+                    if not is_read_only(command):
+                        self.result_cache.invalidate_device(self.pool_key)
+
+        except Exception as e:
+            error_msg = f"Command execution error: {e}"
+            logger.error(error_msg)
+            result.update({
+                'success': False,
+                'error_output': error_msg + "\n",
+                'error_type': 'exception'
+            })
+
+        # 出力は最後に一度だけ連結する（大きな出力はファイルハンドルのみ保持）
+        command_results = result['command_results']
+        result['output'] = ''.join(
+            r['output'] + "\n" for r in command_results if r['success']
+        )
+        result['output_files'] = [
+            r['output_file'] for r in command_results if r.get('output_file')
+        ]
+        return result
+
+    async def _execute_single_command(self, command: str) -> Dict[str, Any]:
+        """
+        単一のコマンドを実行
+
+        Args:
+            command: 実行するコマンド
+
+        Returns:
+            Dict: コマンド実行結果
+        """
+        result = {
+            'command': command,
+            'success': True,
+            'output': '',
+            'error_output': '',
+            'execution_time': 0
+        }
+
+        start_time = time.time()
+
+        try:
+            wait_string = self.device_config.get('wait_string', '#')
+            result['output'] = await self._on_telnet_loop(
+                execute_telnet_command_async(self.connection, command, wait_string)
+            )
+        except Exception as e:
+            result['success'] = False
+            result['error_output'] = str(e)
+        finally:
+            result['execution_time'] = time.time() - start_time
+
+        return result
+
+    async def execute_scenario(self, scenario_config: Dict[str, Any],
+                               command_groups: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        シナリオを実行（タイムアウト処理付き）
+
+        Args:
+            scenario_config: シナリオ設定
+            command_groups: コマンドグループ設定
+
+        Returns:
+            実行結果（NetworkDeviceExecutor.execute_scenarioと同形式）
+        """
+        if self.connection_type == 'ssh':
+            return await self._run_blocking(
+                self._sync_executor.execute_scenario, scenario_config, command_groups
+            )
+
+        scenario_result = {
+            'success': True,
+            'results': [],
+            'output': '',
+            'error_output': '',
+            'total_commands': 0,
+            'successful_commands': 0,
+            'failed_commands': 0,
+            'timeout_occurred': False,
+            'total_time': 0.0
+        }
+
+        scenario_name = scenario_config.get('name', 'unknown_scenario')
+        commands = scenario_config.get('commands', [])
+        scenario_result['total_commands'] = len(commands)
+
+        start_time = time.time()
+        scenario_timeout = self.timeout_model.device_scenario_timeout(
+            self.device_config, commands, command_groups, self.timeouts['scenario']
+        )
+
+        try:
+            results = await asyncio.wait_for(
+                self._execute_scenario_commands(commands, command_groups),
+                timeout=scenario_timeout
+            )
+
+            scenario_result['results'] = results
+            scenario_result['success'] = all(r.get('success', False) for r in results)
+            scenario_result['output'] = '\n'.join(r.get('output', '') for r in results)
+            scenario_result['error_output'] = '\n'.join(r.get('error_output', '') for r in results)
+            scenario_result['successful_commands'] = sum(1 for r in results if r.get('success', False))
+            scenario_result['failed_commands'] = sum(1 for r in results if not r.get('success', False))
+            scenario_result['timeout_occurred'] = any(r.get('timeout_occurred', False) for r in results)
+
+        except asyncio.TimeoutError:
+            scenario_result.update({
+                'success': False,
+                'error_output': f"Scenario timed out after {scenario_timeout:g} seconds",
+                'timeout_occurred': True,
+                'error_type': 'scenario_timeout'
+            })
+            await self.disconnect(reusable=False)
+        except Exception as e:
+            scenario_result.update({
+                'success': False,
+                'error_output': f"Scenario execution error: {str(e)}",
+                'error_type': 'exception'
+            })
+        finally:
+            await self.disconnect()
+            scenario_result['total_time'] = time.time() - start_time
+            self.log_manager.log_scenario_execution(
+                self.device_name,
+                scenario_name,
+                scenario_result
+            )
+
+        return scenario_result
+
+    async def _execute_scenario_commands(self, commands: List[str],
+                                         command_groups: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """シナリオ内のコマンドを1つの接続で順に実行（内部メソッド）"""
+        results = []
+        for command_item in commands:
+            if isinstance(command_item, str) and command_item in command_groups:
+                group_commands = command_groups[command_item].get('commands', [])
+                result = await self.execute_commands(group_commands)
+            else:
+                result = await self.execute_commands([command_item])
+            results.append(result)
+        return results
+
+
+async def execute_scenario_batch(device_configs: Dict[str, Dict[str, Any]],
+                                 scenario_config: Dict[str, Any],
+                                 command_groups: Dict[str, Any],
+                                 concurrency: int = DEFAULT_BATCH_CONCURRENCY) -> Dict[str, Dict[str, Any]]:
+    """
+    複数デバイスでシナリオを同時実行
+
+    SSHデバイスは ssh_io_pool のスレッド数（ASYNC_SSH_WORKERS）までが同時に実行される。
+    Telnetデバイスはスレッドを使わず、concurrency とガバナーの上限まで同時に実行される。
+
+    Args:
+        device_configs: デバイス名をキーとするデバイス設定
+        scenario_config: シナリオ設定
+        command_groups: コマンドグループ設定
+        concurrency: 同時実行デバイス数の上限
+
+    Returns:
+        Dict: デバイス名をキーとするシナリオ実行結果
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _run(device_name: str, device_config: Dict[str, Any]):
+        async with semaphore:
+            try:
+                executor = AsyncNetworkDeviceExecutor(device_config)
+                return device_name, await executor.execute_scenario(
+                    scenario_config, command_groups
+                )
+            except Exception as e:
+                logger.error(f"Scenario execution error on {device_name}: {e}")
+                return device_name, {
+                    'success': False,
+                    'results': [],
+                    'output': '',
+                    'error_output': f"Scenario execution error: {str(e)}",
+                    'error_type': 'exception',
+                    'timestamp': datetime.now().isoformat()
+                }
+
+    pairs = await asyncio.gather(
+        *(_run(name, config) for name, config in device_configs.items())
+    )
+    return dict(pairs)
+
+
+def run_scenario_batch(device_configs: Dict[str, Dict[str, Any]],
+                       scenario_config: Dict[str, Any],
+                       command_groups: Dict[str, Any],
+                       concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """execute_scenario_batchを同期コンテキストから実行する便利関数"""
+    return asyncio.run(execute_scenario_batch(
+        device_configs,
+        scenario_config,
+        command_groups,
+        concurrency or DEFAULT_BATCH_CONCURRENCY
+    ))
@@ -0,0 +1,125 @@
+"""
+バックグラウンドイベントループ管理モジュール
+専用スレッド上の単一asyncioイベントループで非同期I/O（telnetlib3接続など）を一括管理する
+"""
+import asyncio
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Coroutine, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundEventLoop:
+    """専用スレッドで動作する共有イベントループクラス"""
+
+    def __init__(self, name: str = 'background-event-loop'):
+        """
+        イベントループを初期化（スレッドは初回利用時に起動）
+
+        Args:
+            name: ループスレッド名
+        """
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """ループスレッドを起動（起動済みなら何もしない）"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(ready,), name=self.name, daemon=True
+            )
+            self._thread.start()
+            ready.wait()
+            logger.info(f"Background event loop started: {self.name}")
+
+    def _run(self, ready: threading.Event):
+        """ループスレッド本体"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def submit(self, coro: Coroutine) -> Future:
+        """
+        コルーチンをループへ投入
+
+        Args:
+            coro: 実行するコルーチン
+
+        Returns:
+            concurrent.futures.Future
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        コルーチンをループ上で実行し、結果を同期的に待つ
+
+        Args:
+            coro: 実行するコルーチン
+            timeout: 待機タイムアウト（秒）。超過時はタスクをキャンセルする
+
+        Returns:
+            コルーチンの戻り値
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def call_soon(self, callback: Callable, *args):
+        """ループスレッド上でコールバックを実行"""
+        self.start()
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self, timeout: float = 5.0):
+        """ループを停止してスレッドを終了"""
+        with self._lock:
+            if not self._thread or not self._thread.is_alive():
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+            logger.info(f"Background event loop stopped: {self.name}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ループの稼働状況を取得"""
+        running = bool(self._thread and self._thread.is_alive())
+        pending = 0
+        if running:
+            future = asyncio.run_coroutine_threadsafe(
+                self._count_tasks(), self.loop
+            )
+            pending = future.result(timeout=5)
+        return {
+            'name': self.name,
+            'running': running,
+            'pending_tasks': pending
+        }
+
+    @staticmethod
+    async def _count_tasks() -> int:
+        """実行中のタスク数（自身を除く）"""
+        return len(asyncio.all_tasks()) - 1
+
+
+# グローバルインスタンス（telnetlib3接続はすべてこのループが所有する）
+telnet_event_loop = BackgroundEventLoop('telnet-event-loop')
+
+def get_telnet_event_loop() -> BackgroundEventLoop:
+    """Telnet用の共有イベントループを取得"""
+    return telnet_event_loop
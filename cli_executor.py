@@ -9,15 +9,32 @@ import sys
 import json
 from pathlib import Path
 
+import yaml
+
 # 設定管理モジュールのインポート
 from config_manager import get_devices, get_command_groups, get_scenarios
 
 # ネットワーク実行モジュールのインポート
-from network_executor import NetworkDeviceExecutor, test_device_connection
+from network_executor import NetworkDeviceExecutor, execute_commands_cached, test_device_connection
+
+# 非同期実行モジュールのインポート
+from async_executor import run_scenario_batch
 
 # ログ管理モジュールのインポート
 from logger_manager import get_log_manager
 
+# 出力キャプチャモジュールのインポート
+from output_capture import resolve_outputs
+
+# ログストレージモジュールのインポート
+from log_storage import migrate_jsonl_to_sqlite
+
+# 到達性事前チェックモジュールのインポート
+from reachability import probe_device_names
+
+# シナリオ実行のディスパッチモジュールのインポート
+from scenario_dispatcher import DEFAULT_LIST_CONCURRENCY, get_list_concurrency, plan_scenario_list
+
 def list_devices():
     """デバイス一覧を表示"""
     devices = get_devices()
@@ -81,22 +98,87 @@ def test_connection(device_name):
         print("❌ 接続失敗")
         print(f"エラーメッセージ: {result['message']}")
 
-def execute_commands(device_name, commands):
-    """デバイスでコマンドを実行"""
+def probe_devices(device_names=None, scenario_name=None, timeout=None):
+    """デバイスの到達性（SSH/Telnetポート）を一斉に確認"""
+    devices = get_devices()
+    if scenario_name:
+        scenarios = get_scenarios()
+        if scenario_name not in scenarios:
+            print(f"シナリオ '{scenario_name}' が見つかりません")
+            return
+        device_names = scenarios[scenario_name].get('devices', [])
+    elif not device_names:
+        device_names = list(devices.keys())
+    
+    missing = [name for name in device_names if name not in devices]
+    for device_name in missing:
+        print(f"デバイス '{device_name}' が見つかりません")
+    
+    results = probe_device_names(device_names, devices, timeout)
+    
+    print("=== 到達性チェック結果 ===")
+    for device_name, result in results.items():
+        if result['reachable']:
+            print(f"✅ {device_name} ({result['host']}:{result['port']}) {result['latency'] * 1000:.1f}ms")
+        else:
+            print(f"❌ {device_name} ({result['host']}:{result['port']}) {result['error']}")
+    
+    reachable = sum(1 for r in results.values() if r['reachable'])
+    print(f"\n到達可能: {reachable}/{len(results)}")
+
+def dry_run(scenario_names=None, list_name=None, concurrency=None):
+    """シナリオ（リスト）の予測実行時間とメイクスパンを表示（デバイスには接続しない）"""
+    list_concurrency = DEFAULT_LIST_CONCURRENCY
+    if list_name:
+        list_path = Path('scenario_lists') / f'{list_name}.yaml'
+        if not list_path.exists():
+            print(f"シナリオリスト '{list_name}' が見つかりません")
+            return
+        with open(list_path, 'r', encoding='utf-8') as f:
+            list_data = yaml.safe_load(f) or {}
+        scenario_names = list_data.get('scenarios', [])
+        list_concurrency = get_list_concurrency(list_data)
+    if not scenario_names:
+        print("シナリオが指定されていません")
+        return
+    
+    scenarios = get_scenarios()
+    for scenario_name in scenario_names:
+        if scenario_name not in scenarios:
+            print(f"シナリオ '{scenario_name}' が見つかりません")
+    
+    concurrency = concurrency or list_concurrency
+    plan = plan_scenario_list(scenario_names, scenarios, get_devices(), get_command_groups(), concurrency)
+    
+    print(f"=== 実行計画（同時実行数: {concurrency}） ===")
+    for scenario_name, scenario_concurrency in plan['scenario_concurrency'].items():
+        print(f"- {scenario_name}: シナリオごとの同時実行数 {scenario_concurrency}")
+    for job in plan['jobs']:
+        print(f"- {job['device_name']} ({', '.join(job['scenario_names'])}): "
+              f"{job['predicted_time']:.1f}秒 ({job['source']})")
+    
+    print(f"\nジョブ数: {len(plan['jobs'])}")
+    print(f"合計作業時間: {plan['total_work']:.1f}秒")
+    print(f"予測メイクスパン（長い順）: {plan['predicted_makespan']:.1f}秒")
+    print(f"予測メイクスパン（設定順）: {plan['unordered_makespan']:.1f}秒")
+
+def execute_commands(device_name, commands, max_age=None):
+    """デバイスでコマンドを実行（max_age秒以内のshowコマンド結果はキャッシュから返す）"""
     devices = get_devices()
     if device_name not in devices:
         print(f"デバイス '{device_name}' が見つかりません")
         return
     
     device_config = devices[device_name]
-    executor = NetworkDeviceExecutor(device_config)
     
     print(f"デバイス '{device_name}' でコマンドを実行...")
     for i, command in enumerate(commands, 1):
         print(f"{i}. {command}")
     
-    result = executor.execute_commands(commands)
+    result = resolve_outputs(execute_commands_cached(device_config, commands, max_age))
     
+    if result.get('cache_hits'):
+        print(f"キャッシュから取得: {result['cache_hits']}件")
     if result['success']:
         print("✅ コマンド実行成功")
         print(f"実行結果:\n{result['output']}")
@@ -125,7 +207,7 @@ def execute_command_group(device_name, group_name):
     print(f"デバイス '{device_name}' でコマンドグループ '{group_name}' を実行...")
     print(f"実行コマンド: {group_config.get('commands', [])}")
     
-    result = executor.execute_command_group(group_name, command_groups)
+    result = resolve_outputs(executor.execute_command_group(group_name, command_groups))
     
     if result['success']:
         print("✅ コマンドグループ実行成功")
@@ -156,7 +238,7 @@ def execute_scenario(device_name, scenario_name):
     print(f"デバイス '{device_name}' でシナリオ '{scenario_name}' を実行...")
     print(f"実行コマンド: {scenario_config.get('commands', [])}")
     
-    result = executor.execute_scenario(scenario_config, command_groups)
+    result = resolve_outputs(executor.execute_scenario(scenario_config, command_groups))
     
     if result['success']:
         print("✅ シナリオ実行成功")
@@ -172,6 +254,41 @@ def execute_scenario(device_name, scenario_name):
                 print(f"コマンド: {cmd_result.get('command', 'N/A')}")
                 print(f"エラー: {cmd_result.get('error_output', 'N/A')}")
 
+def execute_scenario_batch(scenario_name, device_names=None, concurrency=None):
+    """シナリオを複数デバイスで同時に実行（asyncioのバッチ実行）"""
+    devices = get_devices()
+    scenarios = get_scenarios()
+    command_groups = get_command_groups()
+    
+    if scenario_name not in scenarios:
+        print(f"シナリオ '{scenario_name}' が見つかりません")
+        return
+    
+    scenario_config = dict(scenarios[scenario_name], name=scenario_name)
+    targets = device_names or scenario_config.get('devices', [])
+    missing = [name for name in targets if name not in devices]
+    if missing:
+        print(f"デバイスが見つかりません: {', '.join(missing)}")
+        return
+    
+    print(f"シナリオ '{scenario_name}' を {len(targets)} 台で同時実行...")
+    results = run_scenario_batch(
+        {name: devices[name] for name in targets},
+        scenario_config,
+        command_groups,
+        concurrency
+    )
+    
+    successful = 0
+    for device_name, result in results.items():
+        resolve_outputs(result)
+        if result['success']:
+            successful += 1
+            print(f"✅ {device_name} ({result.get('total_time', 0):.2f}s)")
+        else:
+            print(f"❌ {device_name}: {result.get('error_output', '').strip()}")
+    print(f"結果: {successful}/{len(results)} 台で成功")
+
 def show_logs(device=None, command=None, start_date=None, end_date=None, limit=50):
     """ログを表示"""
     log_manager = get_log_manager()
@@ -225,6 +342,13 @@ def clear_logs(device=None, older_than_days=None):
     log_manager.clear_logs(device, older_than_days)
     print("ログをクリアしました")
 
+def migrate_logs(db_path=None):
+    """既存のJSONLログをSQLiteへ取り込む"""
+    log_manager = get_log_manager()
+    print(f"ログを取り込み中: {log_manager.log_dir}")
+    imported = migrate_jsonl_to_sqlite(log_manager.log_dir, Path(db_path) if db_path else None)
+    print(f"{imported} 件のログを取り込みました（LOG_STORAGE=sqlite で使用）")
+
 def main():
     """メイン関数"""
     parser = argparse.ArgumentParser(description='ネットワークデバイス操作CLIツール')
@@ -243,10 +367,23 @@ def main():
     test_parser = subparsers.add_parser('test', help='デバイス接続をテスト')
     test_parser.add_argument('device', help='テストするデバイス名')
     
+    # 到達性チェック
+    probe_parser = subparsers.add_parser('probe', help='デバイスの到達性（SSH/Telnetポート）を確認')
+    probe_parser.add_argument('devices', nargs='*', help='確認するデバイス名（省略時は全デバイス）')
+    probe_parser.add_argument('--scenario', help='シナリオの対象デバイスを確認')
+    probe_parser.add_argument('--timeout', type=float, help='1台あたりの接続待ち時間（秒）')
+    
+    # ドライラン（予測メイクスパン）
+    dry_run_parser = subparsers.add_parser('dry-run', help='シナリオ（リスト）の予測実行時間を表示')
+    dry_run_parser.add_argument('scenarios', nargs='*', help='シナリオ名')
+    dry_run_parser.add_argument('--list', dest='list_name', help='シナリオリスト名（scenario_lists/<名前>.yaml）')
+    dry_run_parser.add_argument('--concurrency', type=int, help='全体の同時実行デバイス数（既定: シナリオリストのconcurrency）')
+    
     # コマンド実行
     cmd_parser = subparsers.add_parser('exec', help='コマンドを実行')
     cmd_parser.add_argument('device', help='実行対象デバイス名')
     cmd_parser.add_argument('commands', nargs='+', help='実行するコマンド')
+    cmd_parser.add_argument('--max-age', type=float, help='この秒数以内に取得したshowコマンドの結果はキャッシュから返す')
     
     # コマンドグループ実行
     group_parser = subparsers.add_parser('exec-group', help='コマンドグループを実行')
@@ -258,6 +395,12 @@ def main():
     scenario_parser.add_argument('device', help='実行対象デバイス名')
     scenario_parser.add_argument('scenario', help='実行するシナリオ名')
     
+    # シナリオの一括実行
+    batch_parser = subparsers.add_parser('exec-batch', help='シナリオを複数デバイスで同時実行')
+    batch_parser.add_argument('scenario', help='実行するシナリオ名')
+    batch_parser.add_argument('devices', nargs='*', help='実行対象デバイス名（省略時はシナリオの対象デバイス）')
+    batch_parser.add_argument('--concurrency', type=int, help='同時実行デバイス数')
+    
     # ログ関連コマンド
     log_parser = subparsers.add_parser('logs', help='ログを表示')
     log_parser.add_argument('--device', help='デバイス名でフィルタ')
@@ -272,6 +415,10 @@ def main():
     clear_parser.add_argument('--device', help='デバイス名でフィルタ')
     clear_parser.add_argument('--older-than-days', type=int, help='指定日数より古いログをクリア')
     
+    # ログ移行コマンド
+    migrate_parser = subparsers.add_parser('migrate-logs', help='既存のJSONLログをSQLiteへ取り込む')
+    migrate_parser.add_argument('--db', help='取り込み先のデータベース（省略時は logs/logs.db）')
+    
     args = parser.parse_args()
     
     if not args.command:
@@ -287,12 +434,18 @@ def main():
             list_scenarios()
         elif args.command == 'test':
             test_connection(args.device)
+        elif args.command == 'probe':
+            probe_devices(args.devices, args.scenario, args.timeout)
+        elif args.command == 'dry-run':
+            dry_run(args.scenarios, args.list_name, args.concurrency)
         elif args.command == 'exec':
-            execute_commands(args.device, args.commands)
+            execute_commands(args.device, args.commands, args.max_age)
         elif args.command == 'exec-group':
             execute_command_group(args.device, args.group)
         elif args.command == 'exec-scenario':
             execute_scenario(args.device, args.scenario)
+        elif args.command == 'exec-batch':
+            execute_scenario_batch(args.scenario, args.devices, args.concurrency)
         elif args.command == 'logs':
             if args.summary:
                 show_log_summary()
@@ -300,6 +453,8 @@ def main():
                 show_logs(args.device, args.command, args.start_date, args.end_date, args.limit)
         elif args.command == 'clear-logs':
             clear_logs(args.device, args.older_than_days)
+        elif args.command == 'migrate-logs':
+            migrate_logs(args.db)
     except Exception as e:
         print(f"エラーが発生しました: {e}")
         sys.exit(1)
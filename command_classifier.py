@@ -0,0 +1,139 @@
+"""
+コマンド分類モジュール
+コマンドを参照系（show など）と設定変更系に分類し、
+並列実行してよい区間を判定する
+"""
+from typing import List, Tuple
+
+# 先頭語によるコマンドタイプ判定（省略形を含む）
+COMMAND_TYPE_KEYWORDS = {
+    'show': ('show', 'sho', 'sh', 'more', 'dir'),
+    'configure': ('configure', 'config', 'conf'),
+    'ping': ('ping',),
+    'traceroute': ('traceroute', 'tracert', 'trace')
+}
+
+# デバイスの状態を変更しないコマンドタイプ
+READ_ONLY_COMMAND_TYPES = ('show', 'ping', 'traceroute')
+
+# 設定モードを抜けるコマンド
+CONFIG_MODE_EXIT_COMMANDS = ('end', '\x1a')
+
+# 出力をセッション内で再利用してよいコマンドタイプ（ping などは実行時点の測定のため除外）
+MEMOIZABLE_COMMAND_TYPES = ('show',)
+
+# show の省略形（正規化時に show へ展開する）
+SHOW_ABBREVIATIONS = ('show', 'sho', 'sh')
+
+
+def classify_command(command: str) -> str:
+    """
+    コマンドタイプを判定
+
+    Args:
+        command: コマンド文字列
+
+    Returns:
+        str: 'show', 'configure', 'ping', 'traceroute', 'other' のいずれか
+    """
+    words = command.strip().lower().split()
+    if not words:
+        return 'other'
+    for command_type, keywords in COMMAND_TYPE_KEYWORDS.items():
+        if words[0] in keywords:
+            return command_type
+    return 'other'
+
+
+def has_control_characters(command: str) -> bool:
+    """
+    改行などの制御文字を含むか判定
+
+    コマンドはそのまま送信されるため、改行を含むと複数のコマンドとして実行される。
+
+    Args:
+        command: コマンド文字列
+
+    Returns:
+        bool: 制御文字（タブを除く）を含む場合True
+    """
+    return any((ord(char) < 32 and char != '\t') or ord(char) == 127 for char in command)
+
+
+def is_read_only(command: str) -> bool:
+    """
+    参照系コマンドか判定
+
+    Args:
+        command: コマンド文字列
+
+    Returns:
+        bool: デバイスの状態を変更しない場合True（制御文字を含む場合はFalse）
+    """
+    if has_control_characters(command):
+        return False
+    return classify_command(command) in READ_ONLY_COMMAND_TYPES
+
+
+def is_memoizable(command: str) -> bool:
+    """
+    出力をセッション内で再利用してよいコマンドか判定
+
+    Args:
+        command: コマンド文字列
+
+    Returns:
+        bool: 再利用してよい場合True
+    """
+    if has_control_characters(command):
+        return False
+    return classify_command(command) in MEMOIZABLE_COMMAND_TYPES
+
+
+def normalize_command(command: str) -> str:
+    """
+    メモ化のキーにするためコマンド文字列を正規化
+
+    空白を1つにまとめ、先頭の show の省略形を展開する。
+    引数は大文字小文字を区別するためそのまま残す。
+
+    Args:
+        command: コマンド文字列
+
+    Returns:
+        str: 正規化したコマンド
+    """
+    words = command.split()
+    if words and words[0].lower() in SHOW_ABBREVIATIONS:
+        words[0] = 'show'
+    return ' '.join(words)
+
+
+def split_read_only_runs(commands: List[str]) -> List[Tuple[bool, List[str]]]:
+    """
+    コマンドリストを参照系の連続区間とそれ以外の区間に分割
+
+    configure から end までの設定モードブロック内のコマンドは
+    参照系であっても順次実行の区間に含める。
+
+    Args:
+        commands: コマンドリスト
+
+    Returns:
+        List[Tuple[bool, List[str]]]: (参照系区間か, コマンドリスト) のリスト
+    """
+    runs: List[Tuple[bool, List[str]]] = []
+    in_config_mode = False
+    for command in commands:
+        command_type = classify_command(command)
+        if command_type == 'configure':
+            in_config_mode = True
+        read_only = not in_config_mode and is_read_only(command)
+        if in_config_mode and command.strip().lower() in CONFIG_MODE_EXIT_COMMANDS:
+            in_config_mode = False
+
+        if runs and runs[-1][0] == read_only:
+            runs[-1][1].append(command)
+        else:
+            runs.append((read_only, [command]))
+    return runs
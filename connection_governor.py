@@ -0,0 +1,242 @@
+"""
+接続ガバナーモジュール
+グループ・サイト・全体の同時セッション数と新規ログインのレートを制限し、
+AAAサーバーや拠点回線への同時ログイン集中を防ぐ
+"""
+import os
+import threading
+import time
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_limits(value: str) -> Dict[str, int]:
+    """'routers=20,firewalls=5' 形式の上限設定を辞書に変換"""
+    limits = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        name, limit = item.split('=', 1)
+        limits[name.strip()] = int(limit)
+    return limits
+
+
+# 既定の上限（環境変数で変更可能）
+DEFAULT_FLEET_LIMIT = int(os.getenv('GOVERNOR_FLEET_LIMIT', '200'))         # 全体の同時セッション数
+DEFAULT_GROUP_LIMIT = int(os.getenv('GOVERNOR_GROUP_LIMIT', '50'))          # グループごとの同時セッション数
+DEFAULT_SITE_LIMIT = int(os.getenv('GOVERNOR_SITE_LIMIT', '20'))            # サイトごとの同時セッション数
+DEFAULT_LOGIN_RATE = float(os.getenv('GOVERNOR_LOGIN_RATE', '10'))          # 新規ログイン数/秒
+DEFAULT_LOGIN_BURST = int(os.getenv('GOVERNOR_LOGIN_BURST', '20'))          # 新規ログインのバースト許容数
+DEFAULT_GROUP_LIMITS = _parse_limits(os.getenv('GOVERNOR_GROUP_LIMITS', ''))  # グループ別の上限
+DEFAULT_SITE_LIMITS = _parse_limits(os.getenv('GOVERNOR_SITE_LIMITS', ''))    # サイト別の上限
+
+
+class GovernorTicket:
+    """ガバナーから払い出されたセッション枠"""
+
+    def __init__(self, group: Optional[str], site: Optional[str], wait_time: float):
+        self.group = group
+        self.site = site
+        self.wait_time = wait_time
+        self.released = False
+
+
+class ConnectionGovernor:
+    """接続スケジューリングのガバナークラス"""
+
+    def __init__(self, fleet_limit: int = DEFAULT_FLEET_LIMIT,
+                 group_limit: int = DEFAULT_GROUP_LIMIT,
+                 site_limit: int = DEFAULT_SITE_LIMIT,
+                 login_rate: float = DEFAULT_LOGIN_RATE,
+                 login_burst: int = DEFAULT_LOGIN_BURST,
+                 group_limits: Optional[Dict[str, int]] = None,
+                 site_limits: Optional[Dict[str, int]] = None):
+        """
+        ガバナーを初期化
+
+        Args:
+            fleet_limit: 全体の同時セッション数の上限
+            group_limit: グループごとの同時セッション数の既定上限
+            site_limit: サイトごとの同時セッション数の既定上限
+            login_rate: 新規ログインの補充レート（回/秒、0以下で無制限）
+            login_burst: 新規ログインのバースト許容数
+            group_limits: グループ別の上限
+            site_limits: サイト別の上限
+        """
+        self.fleet_limit = fleet_limit
+        self.group_limit = group_limit
+        self.site_limit = site_limit
+        self.login_rate = login_rate
+        self.login_burst = max(1, login_burst)
+        self.group_limits = dict(DEFAULT_GROUP_LIMITS if group_limits is None else group_limits)
+        self.site_limits = dict(DEFAULT_SITE_LIMITS if site_limits is None else site_limits)
+
+        self._condition = threading.Condition()
+        self._active = 0
+        self._active_groups: Dict[str, int] = {}
+        self._active_sites: Dict[str, int] = {}
+        self._tokens = float(self.login_burst)
+        self._last_refill = time.monotonic()
+        self._waiting = 0
+
+        # 統計カウンター
+        self.stats = {
+            'acquired': 0,
+            'logins': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'total_wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'max_queue_depth': 0
+        }
+
+    @staticmethod
+    def get_group(device_config: Dict[str, Any]) -> Optional[str]:
+        """デバイスのグループ（group または device_group）"""
+        return device_config.get('group') or device_config.get('device_group')
+
+    @staticmethod
+    def get_site(device_config: Dict[str, Any]) -> Optional[str]:
+        """デバイスのサイトラベル"""
+        return device_config.get('site')
+
+    def acquire(self, device_config: Dict[str, Any], new_login: bool = True,
+                timeout: Optional[float] = None) -> Optional[GovernorTicket]:
+        """
+        セッション枠を取得（空きが出るまで待つ）
+
+        Args:
+            device_config: デバイス設定辞書
+            new_login: 新規ログインの場合True（ログインレート制限の対象）
+            timeout: 最大待ち時間（秒、Noneで無制限）
+
+        Returns:
+            GovernorTicket。タイムアウトした場合None
+        """
+        group = self.get_group(device_config)
+        site = self.get_site(device_config)
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+
+        with self._condition:
+            waited = False
+            while True:
+                wait = self._wait_needed(group, site, new_login)
+                if wait == 0.0:
+                    break
+                if not waited:
+                    waited = True
+                    self._waiting += 1
+                    self.stats['waits'] += 1
+                    self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self._waiting)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._waiting -= 1
+                        self.stats['timeouts'] += 1
+                        logger.warning(
+                            f"Governor wait timed out for {device_config.get('host', 'unknown')} "
+                            f"(group={group}, site={site})"
+                        )
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._condition.wait(timeout=wait)
+
+            if waited:
+                self._waiting -= 1
+            self._active += 1
+            if group:
+                self._active_groups[group] = self._active_groups.get(group, 0) + 1
+            if site:
+                self._active_sites[site] = self._active_sites.get(site, 0) + 1
+            if new_login and self.login_rate > 0:
+                self._tokens -= 1
+                self.stats['logins'] += 1
+
+            wait_time = time.monotonic() - start
+            self.stats['acquired'] += 1
+            self.stats['total_wait_time'] += wait_time
+            self.stats['max_wait_time'] = max(self.stats['max_wait_time'], wait_time)
+
+        return GovernorTicket(group, site, wait_time)
+
+    def release(self, ticket: Optional[GovernorTicket]):
+        """
+        セッション枠を返却
+
+        Args:
+            ticket: acquireで取得した枠
+        """
+        if ticket is None:
+            return
+        with self._condition:
+            if ticket.released:
+                return
+            ticket.released = True
+            self._active -= 1
+            if ticket.group:
+                self._active_groups[ticket.group] -= 1
+                if not self._active_groups[ticket.group]:
+                    del self._active_groups[ticket.group]
+            if ticket.site:
+                self._active_sites[ticket.site] -= 1
+                if not self._active_sites[ticket.site]:
+                    del self._active_sites[ticket.site]
+            self._condition.notify_all()
+
+    def _wait_needed(self, group: Optional[str], site: Optional[str],
+                     new_login: bool) -> Optional[float]:
+        """
+        枠の取得に必要な待ち時間を計算（ロック取得済み前提）
+
+        Returns:
+            0.0: すぐ取得可能 / None: 枠の返却待ち / 正の値: トークン補充までの秒数
+        """
+        if self._active >= self.fleet_limit:
+            return None
+        if group and self._active_groups.get(group, 0) >= self.group_limits.get(group, self.group_limit):
+            return None
+        if site and self._active_sites.get(site, 0) >= self.site_limits.get(site, self.site_limit):
+            return None
+        if not new_login or self.login_rate <= 0:
+            return 0.0
+
+        # トークンバケットの補充
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.login_burst),
+            self._tokens + (now - self._last_refill) * self.login_rate
+        )
+        self._last_refill = now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.login_rate
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ガバナー統計を取得"""
+        with self._condition:
+            stats = dict(self.stats)
+            stats.update({
+                'queue_depth': self._waiting,
+                'active_sessions': self._active,
+                'active_groups': dict(self._active_groups),
+                'active_sites': dict(self._active_sites),
+                'average_wait_time': (
+                    stats['total_wait_time'] / stats['acquired'] if stats['acquired'] else 0.0
+                ),
+                'fleet_limit': self.fleet_limit,
+                'group_limit': self.group_limit,
+                'site_limit': self.site_limit,
+                'login_rate': self.login_rate
+            })
+        return stats
+
+
+# グローバルインスタンス
+connection_governor = ConnectionGovernor()
+
+def get_connection_governor() -> ConnectionGovernor:
+    """接続ガバナーインスタンスを取得"""
+    return connection_governor
@@ -0,0 +1,329 @@
+"""
+接続プール管理モジュール
+デバイスごとのSSH/Telnetセッションをプロセス全体で共有し、再ログインを削減する
+"""
+import atexit
+import hashlib
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PooledSession:
+    """プールに格納される1本のセッション"""
+
+    def __init__(self, key: Tuple, connection: Any,
+                 closer: Callable[[Any], None]):
+        """
+        セッションを初期化
+
+        Args:
+            key: プールキー (host, port, username, connection_type, 認証情報のダイジェスト)
+            connection: 接続オブジェクト（paramiko.SSHClient または telnet接続）
+            closer: 接続を閉じるためのコールバック
+        """
+        self.key = key
+        self.connection = connection
+        self.closer = closer
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.in_use = True
+        self.pooled = True
+        # セッション単位の付帯情報（プリアンブル適用済みフラグなど）
+        self.attributes: Dict[str, Any] = {}
+
+    def is_alive(self) -> bool:
+        """セッションが生存しているか確認"""
+        connection = self.connection
+        if connection is None:
+            return False
+        try:
+            # paramiko.SSHClient
+            if hasattr(connection, 'get_transport'):
+                transport = connection.get_transport()
+                return transport is not None and transport.is_active()
+            # telnetlib3 (writer / reader)
+            if hasattr(connection, 'is_closing'):
+                return not connection.is_closing()
+            if hasattr(connection, 'at_eof'):
+                return not connection.at_eof()
+        except Exception:
+            return False
+        return True
+
+    def close(self):
+        """下位の接続を閉じる"""
+        try:
+            self.closer(self.connection)
+        except Exception as e:
+            logger.error(f"Error while closing pooled session {self.key}: {e}")
+        finally:
+            self.connection = None
+
+
+class ConnectionPool:
+    """デバイス接続プールクラス"""
+
+    DEFAULT_IDLE_TIMEOUT = 300   # アイドルセッションの保持時間（秒）
+    DEFAULT_MAX_SESSIONS = 100   # プール全体の最大セッション数
+    DEFAULT_REAP_INTERVAL = 30   # アイドルセッションを破棄する監視スレッドの実行間隔（秒）
+
+    def __init__(self, idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 reap_interval: float = DEFAULT_REAP_INTERVAL):
+        """
+        接続プールを初期化
+
+        Args:
+            idle_timeout: アイドル状態のセッションを破棄するまでの秒数
+            max_sessions: プールに保持する最大セッション数
+            reap_interval: アイドルセッションを破棄する監視スレッドの実行間隔（秒、0で起動しない）
+        """
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.reap_interval = reap_interval
+        self._sessions: Dict[Tuple, List[PooledSession]] = {}
+        self.lock = threading.Lock()
+        # 監視スレッドは最初のセッション登録時に起動する
+        self._reaper: Optional[threading.Thread] = None
+        self._reaper_stop = threading.Event()
+
+        # 統計カウンター
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'health_check_failures': 0,
+            'overflow': 0
+        }
+
+    @staticmethod
+    def make_key(device_config: Dict[str, Any]) -> Tuple:
+        """
+        デバイス設定からプールキーを生成
+
+        Args:
+            device_config: デバイス設定辞書
+
+        Returns:
+            (host, port, username, connection_type, 認証情報のダイジェスト) のタプル
+            （パスワード・enable secret が変わると別のセッションになる）
+        """
+        connection_type = device_config.get('connection_type', 'ssh').lower()
+        default_port = 23 if connection_type == 'telnet' else 22
+        credentials = '\0'.join([
+            str(device_config.get('password', '')),
+            str(device_config.get('secret', ''))
+        ])
+        return (
+            device_config.get('host'),
+            int(device_config.get('port', default_port)),
+            device_config.get('username'),
+            connection_type,
+            hashlib.sha256(credentials.encode('utf-8')).hexdigest()[:16]
+        )
+
+    def acquire(self, key: Tuple) -> Optional[PooledSession]:
+        """
+        アイドル状態のセッションを取り出す
+
+        Args:
+            key: プールキー
+
+        Returns:
+            生存確認済みのセッション。存在しない場合None
+        """
+        session = None
+        with self.lock:
+            stale = self._collect_idle_locked()
+            for expired in stale:
+                self._remove_locked(expired)
+
+            for candidate in list(self._sessions.get(key, [])):
+                if candidate.in_use:
+                    continue
+                if not candidate.is_alive():
+                    self.stats['health_check_failures'] += 1
+                    self._remove_locked(candidate)
+                    stale.append(candidate)
+                    continue
+                candidate.in_use = True
+                candidate.last_used = time.time()
+                session = candidate
+                break
+
+            if session:
+                self.stats['hits'] += 1
+            else:
+                self.stats['misses'] += 1
+
+        self._close_sessions(stale)
+        return session
+
+    def register(self, key: Tuple, connection: Any,
+                 closer: Callable[[Any], None]) -> PooledSession:
+        """
+        新規接続をチェックアウト状態でプールに登録
+
+        Args:
+            key: プールキー
+            connection: 確立済みの接続オブジェクト
+            closer: 接続を閉じるコールバック
+
+        Returns:
+            登録したセッション
+        """
+        session = PooledSession(key, connection, closer)
+        evicted = []
+        with self.lock:
+            if self._count_locked() >= self.max_sessions:
+                evicted.extend(self._evict_oldest_idle_locked())
+
+            if self._count_locked() >= self.max_sessions:
+                # 上限超過分はプールせず、返却時に閉じる
+                session.pooled = False
+                self.stats['overflow'] += 1
+            else:
+                self._sessions.setdefault(key, []).append(session)
+            self._start_reaper_locked()
+
+        self._close_sessions(evicted)
+        return session
+
+    def release(self, session: PooledSession):
+        """
+        セッションをプールへ返却
+
+        Args:
+            session: 返却するセッション
+        """
+        if not session.pooled:
+            session.close()
+            return
+
+        with self.lock:
+            session.in_use = False
+            session.last_used = time.time()
+
+    def discard(self, session: PooledSession):
+        """
+        セッションを閉じてプールから取り除く
+
+        Args:
+            session: 破棄するセッション
+        """
+        with self.lock:
+            self._remove_locked(session)
+        session.close()
+
+    def evict_idle(self) -> int:
+        """
+        アイドルタイムアウトを超えたセッションを破棄
+
+        Returns:
+            破棄したセッション数
+        """
+        with self.lock:
+            expired = self._collect_idle_locked()
+            for session in expired:
+                self._remove_locked(session)
+        self._close_sessions(expired)
+        return len(expired)
+
+    def _start_reaper_locked(self):
+        """アイドルセッションの監視スレッドを起動（ロック取得済み前提）"""
+        if self.reap_interval <= 0 or (self._reaper and self._reaper.is_alive()):
+            return
+        self._reaper_stop.clear()
+        self._reaper = threading.Thread(target=self._reap_loop, name='connection-pool-reaper', daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+        """一定間隔でアイドルタイムアウトを超えたセッションを閉じる"""
+        while not self._reaper_stop.wait(self.reap_interval):
+            try:
+                evicted = self.evict_idle()
+                if evicted:
+                    logger.debug(f"Closed {evicted} idle pooled sessions")
+            except Exception as e:
+                logger.error(f"Error while evicting idle sessions: {e}")
+
+    def close_all(self):
+        """プール内の全セッションを閉じ、監視スレッドを止める"""
+        self._reaper_stop.set()
+        with self.lock:
+            sessions = [s for group in self._sessions.values() for s in group]
+            self._sessions.clear()
+        self._close_sessions(sessions)
+        logger.info(f"Connection pool closed ({len(sessions)} sessions)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """プールの統計情報を取得"""
+        with self.lock:
+            total = self._count_locked()
+            in_use = sum(
+                1 for group in self._sessions.values()
+                for s in group if s.in_use
+            )
+            stats = dict(self.stats)
+        stats.update({
+            'total_sessions': total,
+            'in_use_sessions': in_use,
+            'idle_sessions': total - in_use,
+            'max_sessions': self.max_sessions,
+            'idle_timeout': self.idle_timeout
+        })
+        return stats
+
+    def _count_locked(self) -> int:
+        """保持セッション数を数える（ロック取得済み前提）"""
+        return sum(len(group) for group in self._sessions.values())
+
+    def _collect_idle_locked(self) -> List[PooledSession]:
+        """期限切れのアイドルセッションを列挙（ロック取得済み前提）"""
+        now = time.time()
+        expired = [
+            s for group in self._sessions.values() for s in group
+            if not s.in_use and now - s.last_used > self.idle_timeout
+        ]
+        self.stats['evictions'] += len(expired)
+        return expired
+
+    def _evict_oldest_idle_locked(self) -> List[PooledSession]:
+        """最も古いアイドルセッションを1本取り除く（ロック取得済み前提）"""
+        idle = [
+            s for group in self._sessions.values() for s in group
+            if not s.in_use
+        ]
+        if not idle:
+            return []
+        oldest = min(idle, key=lambda s: s.last_used)
+        self._remove_locked(oldest)
+        self.stats['evictions'] += 1
+        return [oldest]
+
+    def _remove_locked(self, session: PooledSession):
+        """セッションをプールから外す（ロック取得済み前提）"""
+        group = self._sessions.get(session.key)
+        if group and session in group:
+            group.remove(session)
+            if not group:
+                del self._sessions[session.key]
+
+    @staticmethod
+    def _close_sessions(sessions: List[PooledSession]):
+        """ロック外でセッションを閉じる"""
+        for session in sessions:
+            session.close()
+
+
+# グローバルインスタンス（プロセス終了時にデバイス側のセッションも閉じる）
+connection_pool = ConnectionPool()
+atexit.register(connection_pool.close_all)
+
+def get_connection_pool() -> ConnectionPool:
+    """接続プールインスタンスを取得"""
+    return connection_pool
@@ -0,0 +1,141 @@
+"""
+実行時間予測モジュール
+ログ履歴からデバイスごとのシナリオ実行時間を予測し、長いものから先に
+実行する順序（LPT）と、指定した同時実行数でのメイクスパンを算出する
+"""
+import heapq
+import os
+import statistics
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+# ログ管理モジュールのインポート
+from logger_manager import get_log_manager
+
+logger = logging.getLogger(__name__)
+
+# 履歴がないデバイスの予測時間（秒）
+DEFAULT_PREDICTED_DURATION = float(os.getenv('DEFAULT_PREDICTED_DURATION', '10'))
+
+# 予測に使う直近の実行数
+PREDICTION_WINDOW = 20
+
+
+def history_device_name(device_config: Dict[str, Any]) -> str:
+    """
+    ログ履歴に記録されるデバイス名を取得（NetworkDeviceExecutorと同じ規則）
+
+    Args:
+        device_config: デバイス設定辞書
+
+    Returns:
+        str: デバイス名
+    """
+    return device_config.get('hostname', device_config.get('host', 'unknown'))
+
+
+def flatten_commands(command_items: List[Any], command_groups: Dict[str, Any]) -> List[str]:
+    """
+    シナリオのコマンド項目をコマンドグループ展開済みのコマンドリストにする
+
+    Args:
+        command_items: シナリオの commands
+        command_groups: コマンドグループ設定
+
+    Returns:
+        List[str]: コマンドリスト
+    """
+    commands = []
+    for command_item in command_items:
+        if isinstance(command_item, str) and command_item in command_groups:
+            group = command_groups[command_item]
+            commands.extend(group.get('commands', []) if isinstance(group, dict) else group)
+        else:
+            commands.append(command_item)
+    return commands
+
+
+def simulate_makespan(durations: List[float], concurrency: int) -> float:
+    """
+    与えた順序で空いたワーカーへ割り当てた場合の総所要時間を計算
+
+    Args:
+        durations: ジョブの所要時間（投入順）
+        concurrency: 同時実行数
+
+    Returns:
+        float: メイクスパン（秒）
+    """
+    workers = [0.0] * max(1, min(concurrency, len(durations) or 1))
+    for duration in durations:
+        start = heapq.heappop(workers)
+        heapq.heappush(workers, start + duration)
+    return max(workers)
+
+
+class DurationPredictor:
+    """ログ履歴に基づく実行時間予測クラス"""
+
+    def __init__(self, default_duration: float = DEFAULT_PREDICTED_DURATION,
+                 window: int = PREDICTION_WINDOW):
+        """
+        予測を初期化
+
+        Args:
+            default_duration: 履歴がない場合の予測時間（秒）
+            window: 予測に使う直近の実行数
+        """
+        self.default_duration = default_duration
+        self.window = window
+        self.log_manager = get_log_manager()
+
+    def _command_time(self, device_name: str, command: str) -> Optional[float]:
+        """コマンド単位の履歴から実行時間の中央値を取得"""
+        history = self.log_manager.get_command_history(device_name, command, limit=self.window)
+        times = [
+            float(entry['execution_time'])
+            for entry in history
+            if entry.get('success') and entry.get('execution_time') is not None
+        ]
+        return statistics.median(times) if times else None
+
+    def predict(self, device_config: Dict[str, Any], scenario_name: str,
+                commands: Optional[List[str]] = None) -> Tuple[float, str]:
+        """
+        デバイスでのシナリオ実行時間を予測
+
+        シナリオの実行履歴があればその中央値、なければコマンドごとの
+        履歴の合計、どちらもなければ既定値を使う。
+
+        Args:
+            device_config: デバイス設定辞書
+            scenario_name: シナリオ名
+            commands: コマンドグループ展開済みのコマンドリスト
+
+        Returns:
+            Tuple[float, str]: (予測時間（秒）, 根拠 'scenario' / 'commands' / 'default')
+        """
+        device_name = history_device_name(device_config)
+        times = self.log_manager.get_scenario_history(device_name, scenario_name, limit=self.window)
+        if times:
+            return statistics.median(times), 'scenario'
+
+        if commands:
+            command_times = [self._command_time(device_name, command) for command in commands]
+            if all(t is not None for t in command_times):
+                return sum(command_times), 'commands'
+
+        return self.default_duration, 'default'
+
+    def order_longest_first(self, jobs: List[Any], predictions: Dict[Any, float]) -> List[Any]:
+        """
+        ジョブを予測時間の長い順に並べる（LPT）
+
+        Args:
+            jobs: ジョブ（predictions のキー）
+            predictions: ジョブごとの予測時間
+
+        Returns:
+            List: 並べ替えたジョブ
+        """
+        return sorted(jobs, key=lambda job: predictions.get(job, self.default_duration), reverse=True)
@@ -0,0 +1,210 @@
+"""
+デバイス到達性キャッシュモジュール
+接続失敗をホストごとに記録し、指数バックオフの間は接続を即座に失敗させる
+（サーキットブレーカー）
+"""
+import asyncio
+import os
+import threading
+import time
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 既定値（環境変数で変更可能）
+DEFAULT_BASE_BACKOFF = float(os.getenv('CIRCUIT_BASE_BACKOFF', '30'))         # 最初の遮断時間（秒）
+DEFAULT_MAX_BACKOFF = float(os.getenv('CIRCUIT_MAX_BACKOFF', '600'))          # 遮断時間の上限（秒）
+DEFAULT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '3'))  # 遮断するまでの連続失敗数
+DEFAULT_FAILURE_TTL = float(os.getenv('CIRCUIT_FAILURE_TTL', '3600'))         # 失敗記録の保持時間（秒）
+
+
+def is_transport_error(error: Optional[BaseException]) -> bool:
+    """
+    到達性の失敗（タイムアウト・接続拒否・ソケットエラー）か判定
+
+    認証失敗などホストに到達できている失敗はブレーカーの対象にしない。
+
+    Args:
+        error: 接続時に発生した例外
+
+    Returns:
+        bool: 到達性の失敗の場合True
+    """
+    return isinstance(error, (OSError, TimeoutError, asyncio.TimeoutError, asyncio.CancelledError))
+
+
+class HostHealth:
+    """1ホストの接続失敗記録"""
+
+    def __init__(self):
+        self.failures = 0
+        self.last_failure = 0.0
+        self.open_until = 0.0
+        self.probing = False
+        self.last_error = ''
+
+    @property
+    def state(self) -> str:
+        """ブレーカーの状態 ('closed', 'open', 'half_open')"""
+        if self.probing:
+            return 'half_open'
+        if self.open_until > time.monotonic():
+            return 'open'
+        return 'closed'
+
+
+class HostHealthCache:
+    """ホスト単位のサーキットブレーカー"""
+
+    def __init__(self, base_backoff: float = DEFAULT_BASE_BACKOFF,
+                 max_backoff: float = DEFAULT_MAX_BACKOFF,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 failure_ttl: float = DEFAULT_FAILURE_TTL):
+        """
+        到達性キャッシュを初期化
+
+        Args:
+            base_backoff: 最初の遮断時間（秒）。以降は失敗ごとに倍になる
+            max_backoff: 遮断時間の上限（秒）
+            failure_threshold: 遮断するまでの連続失敗数
+            failure_ttl: 最後の失敗からこの秒数が経過した記録は破棄する
+        """
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = max(1, failure_threshold)
+        self.failure_ttl = failure_ttl
+        self._hosts: Dict[Tuple, HostHealth] = {}
+        self.lock = threading.Lock()
+
+        # 統計カウンター
+        self.stats = {
+            'fast_failures': 0,
+            'circuits_opened': 0,
+            'probes': 0,
+            'recoveries': 0
+        }
+
+    @staticmethod
+    def make_key(device_config: Dict[str, Any]) -> Tuple:
+        """
+        デバイス設定からキーを作成
+
+        Args:
+            device_config: デバイス設定辞書
+
+        Returns:
+            Tuple: (host, port)
+        """
+        connection_type = device_config.get('connection_type', 'ssh').lower()
+        default_port = 22 if connection_type == 'ssh' else 23
+        return (device_config.get('host'), int(device_config.get('port', default_port)))
+
+    def check(self, key: Tuple) -> Optional[float]:
+        """
+        接続を試みてよいか確認
+
+        遮断期間が過ぎたホストは1件だけ試行（ハーフオープン）を許可し、
+        結果が出るまで他の接続は遮断したままにする。
+
+        Args:
+            key: make_keyで作成したキー
+
+        Returns:
+            None: 接続可 / float: 遮断中（再試行までの秒数）
+        """
+        with self.lock:
+            health = self._hosts.get(key)
+            if health is None:
+                return None
+
+            now = time.monotonic()
+            if now - health.last_failure > self.failure_ttl:
+                del self._hosts[key]
+                return None
+            if health.failures < self.failure_threshold:
+                return None
+
+            if health.probing or health.open_until > now:
+                self.stats['fast_failures'] += 1
+                return max(0.0, health.open_until - now)
+
+            # ハーフオープン: この呼び出し元だけ接続を試みる
+            health.probing = True
+            self.stats['probes'] += 1
+            logger.info(f"Circuit half-open for {key[0]}, probing")
+            return None
+
+    def record_success(self, key: Tuple):
+        """
+        接続成功を記録（ブレーカーを閉じる）
+
+        Args:
+            key: make_keyで作成したキー
+        """
+        with self.lock:
+            health = self._hosts.pop(key, None)
+            if health and health.failures >= self.failure_threshold:
+                self.stats['recoveries'] += 1
+                logger.info(f"Circuit closed for {key[0]}")
+
+    def record_failure(self, key: Tuple, error: str = ''):
+        """
+        接続失敗を記録（閾値を超えたらブレーカーを開く）
+
+        Args:
+            key: make_keyで作成したキー
+            error: 失敗理由
+        """
+        with self.lock:
+            health = self._hosts.get(key)
+            now = time.monotonic()
+            if health is None or now - health.last_failure > self.failure_ttl:
+                health = self._hosts[key] = HostHealth()
+            health.failures += 1
+            health.last_failure = now
+            health.last_error = error
+            health.probing = False
+
+            if health.failures >= self.failure_threshold:
+                exponent = health.failures - self.failure_threshold
+                backoff = min(self.max_backoff, self.base_backoff * (2 ** min(exponent, 32)))
+                health.open_until = now + backoff
+                self.stats['circuits_opened'] += 1
+                logger.warning(f"Circuit open for {key[0]} for {backoff:g} seconds after {health.failures} failures")
+
+    def cancel_probe(self, key: Tuple):
+        """
+        接続を試みなかった場合にハーフオープンの試行権を返す
+
+        Args:
+            key: make_keyで作成したキー
+        """
+        with self.lock:
+            health = self._hosts.get(key)
+            if health:
+                health.probing = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ブレーカー統計を取得"""
+        with self.lock:
+            stats = dict(self.stats)
+            now = time.monotonic()
+            stats['hosts'] = {
+                f"{key[0]}:{key[1]}": {
+                    'state': health.state,
+                    'failures': health.failures,
+                    'retry_in': max(0.0, health.open_until - now),
+                    'last_error': health.last_error
+                }
+                for key, health in self._hosts.items()
+            }
+        return stats
+
+
+# グローバルインスタンス
+host_health_cache = HostHealthCache()
+
+def get_host_health_cache() -> HostHealthCache:
+    """到達性キャッシュインスタンスを取得"""
+    return host_health_cache
@@ -0,0 +1,559 @@
+"""
+ログストレージモジュール
+コマンド・シナリオの実行ログの保存先を切り替え可能にする。
+既定は日別のJSONLファイル、LOG_STORAGE=sqlite でインデックス付きのSQLiteに保存する
+"""
+import os
+import re
+import heapq
+import json
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 既定値（環境変数で変更可能）
+LOG_STORAGE = os.getenv('LOG_STORAGE', 'jsonl').lower()                       # 'jsonl' / 'sqlite'
+LOG_MAX_OPEN_FILES = int(os.getenv('LOG_MAX_OPEN_FILES', '32'))                 # 開いたままにする日別ログファイル数
+LOG_DB_FILE = os.getenv('LOG_DB_FILE', 'logs.db')                             # ログディレクトリからの相対パス
+LOG_DB_BATCH_SIZE = int(os.getenv('LOG_DB_BATCH_SIZE', '200'))                # まとめて挿入する件数
+LOG_READ_BLOCK_SIZE = int(os.getenv('LOG_READ_BLOCK_SIZE', str(64 * 1024)))      # ログファイルを末尾から読む単位（バイト）
+LOG_DB_FLUSH_INTERVAL = float(os.getenv('LOG_DB_FLUSH_INTERVAL', '1'))        # 挿入待ちがこの時間（秒）を過ぎたら次の書き込みで挿入
+
+
+def log_file_name(log_entry: Dict[str, Any]) -> str:
+    """
+    ログエントリーを保存する日別ファイル名（{device}_{YYYYMMDD}.log / scenario_{YYYYMMDD}.log）
+
+    Args:
+        log_entry: ログエントリー
+
+    Returns:
+        str: ファイル名
+    """
+    date = log_entry.get('timestamp', '')[:10].replace('-', '') or datetime.now().strftime('%Y%m%d')
+    if 'scenario_name' in log_entry:
+        return f"scenario_{date}.log"
+    return f"{log_entry['device_name']}_{date}.log"
+
+
+# 日別ログファイル名（{device}_{YYYYMMDD}.log / scenario_{YYYYMMDD}.log）
+LOG_FILE_PATTERN = re.compile(r'^(?P<prefix>.+)_(?P<date>\d{8})\.log$')
+
+
+def read_lines_reversed(path: Path, block_size: int = LOG_READ_BLOCK_SIZE) -> Iterator[bytes]:
+    """
+    ファイルを末尾からブロック単位で読み、行を後ろから順に返す
+
+    Args:
+        path: ファイルのパス
+        block_size: 1回に読むバイト数
+
+    Returns:
+        Iterator[bytes]: 空行を除く行（改行なし）
+    """
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        remainder = b''
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b'\n')
+            # 先頭の断片は前のブロックと合わせて1行になる
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if remainder.strip():
+            yield remainder
+
+
+def _end_of_day(end_date: str) -> str:
+    """終了日（YYYY-MM-DD、当日を含む）の翌日0時のタイムスタンプ"""
+    return (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+class LogStorage:
+    """ログストレージの基底クラス"""
+
+    def append(self, log_entry: Dict[str, Any]):
+        """ログエントリーを1件保存"""
+        self.append_many([log_entry])
+
+    def append_many(self, log_entries: Iterable[Dict[str, Any]]):
+        """ログエントリーをまとめて保存"""
+        raise NotImplementedError
+
+    def flush(self):
+        """未保存のログを書き出す"""
+
+    def query(self, device_name: Optional[str] = None,
+              command: Optional[str] = None,
+              scenario_name: Optional[str] = None,
+              start_date: Optional[str] = None,
+              end_date: Optional[str] = None,
+              limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """
+        条件に一致するログを新しい順に取得
+
+        Args:
+            device_name: デバイス名（フィルタ）
+            command: コマンド（フィルタ）
+            scenario_name: シナリオ名（フィルタ）
+            start_date: 開始日（YYYY-MM-DD）
+            end_date: 終了日（YYYY-MM-DD、当日を含む）
+            limit: 取得件数制限（Noneで無制限）
+
+        Returns:
+            List[Dict]: ログエントリー
+        """
+        raise NotImplementedError
+
+    def summary(self) -> Optional[Dict[str, int]]:
+        """
+        セッション数・デバイス数などの集計を取得
+
+        Returns:
+            Dict: 集計（ログインデックスから集計する場合None）
+        """
+        return None
+
+    def delete_before(self, cutoff: datetime):
+        """指定日時より古いログを削除"""
+        raise NotImplementedError
+
+    def close(self):
+        """ストレージを閉じる"""
+        self.flush()
+
+
+class JsonlLogStorage(LogStorage):
+    """日別のJSONLファイルにログを保存するストレージ"""
+
+    def __init__(self, log_dir: Path):
+        """
+        JSONLストレージを初期化
+
+        Args:
+            log_dir: ログファイルを保存するディレクトリ
+        """
+        self.log_dir = Path(log_dir)
+        self.lock = threading.Lock()
+        # 日別ログファイルの追記用ハンドル（最近使った LOG_MAX_OPEN_FILES 個を開いたままにする）
+        self._handles: 'OrderedDict[Path, Any]' = OrderedDict()
+
+    def _handle(self, log_file: Path):
+        """追記用ハンドルを取得（ロック取得済み前提）"""
+        handle = self._handles.get(log_file)
+        if handle is not None:
+            self._handles.move_to_end(log_file)
+            return handle
+
+        handle = self._handles[log_file] = open(log_file, 'a', encoding='utf-8')
+        while len(self._handles) > max(1, LOG_MAX_OPEN_FILES):
+            _, evicted = self._handles.popitem(last=False)
+            evicted.close()
+        return handle
+
+    def append_many(self, log_entries: Iterable[Dict[str, Any]]):
+        """ログファイルへ追記（書き出しは flush で行う）"""
+        lines: Dict[Path, List[str]] = {}
+        for log_entry in log_entries:
+            log_file = self.log_dir / log_file_name(log_entry)
+            lines.setdefault(log_file, []).append(json.dumps(log_entry, ensure_ascii=False) + '\n')
+
+        with self.lock:
+            for log_file, file_lines in lines.items():
+                self._handle(log_file).writelines(file_lines)
+
+    def flush(self):
+        """開いているログファイルのバッファを書き出す"""
+        with self.lock:
+            for handle in self._handles.values():
+                handle.flush()
+
+    def _close_handles(self):
+        """開いているログファイルをすべて閉じる（ロック取得済み前提）"""
+        for handle in self._handles.values():
+            handle.close()
+        self._handles.clear()
+
+    def close(self):
+        """開いているログファイルを閉じる"""
+        with self.lock:
+            self._close_handles()
+
+    def iter_entries(self) -> Iterable[Dict[str, Any]]:
+        """全ログファイルのエントリーを順に返す（壊れた行は読み飛ばす）"""
+        for log_file in sorted(self.log_dir.glob("*.log")):
+            try:
+                with open(log_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            yield json.loads(line.strip())
+                        except json.JSONDecodeError:
+                            continue
+            except Exception as e:
+                logger.error(f"Failed to read log file {log_file}: {e}")
+
+    def _candidate_files(self, device_name: Optional[str], command: Optional[str],
+                         scenario_name: Optional[str], start_date: Optional[str],
+                         end_date: Optional[str]) -> List[Tuple[str, Path]]:
+        """
+        ファイル名のデバイス名と日付から、条件に一致し得るログファイルを選ぶ
+
+        Returns:
+            List[Tuple[str, Path]]: (YYYYMMDD, パス) の新しい日付順
+        """
+        start = start_date.replace('-', '') if start_date else None
+        end = end_date.replace('-', '') if end_date else None
+        candidates = []
+        for log_file in self.log_dir.glob("*_*.log"):
+            match = LOG_FILE_PATTERN.match(log_file.name)
+            if not match:
+                continue
+            date = match.group('date')
+            if (start and date < start) or (end and date > end):
+                continue
+
+            if match.group('prefix') == 'scenario':
+                # シナリオログはコマンドを持たない
+                if command:
+                    continue
+            else:
+                if scenario_name:
+                    continue
+                if device_name and match.group('prefix') != device_name:
+                    continue
+            candidates.append((date, match.group('prefix') != 'scenario', log_file))
+
+        # 同じ日はデバイスのファイルを先に読み、シナリオログは末尾の確認だけで済ませる
+        candidates.sort(reverse=True)
+        return [(date, log_file) for date, _, log_file in candidates]
+
+    def query(self, device_name: Optional[str] = None,
+              command: Optional[str] = None,
+              scenario_name: Optional[str] = None,
+              start_date: Optional[str] = None,
+              end_date: Optional[str] = None,
+              limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """
+        条件に一致するログを新しい順に取得
+
+        ファイル名でデバイス・日付を絞り込んだうえで新しい日のファイルから
+        末尾へ向かって読み、limit 件の上位を最小ヒープで保持する。各ファイルは
+        追記順（時刻順）に並んでいるため、ヒープが埋まった後はヒープの最古より
+        古い行に達した時点でそのファイルを、より古い日に進んだ時点で全体を打ち切る。
+        """
+        if limit is not None and limit <= 0:
+            return []
+
+        # (timestamp, -読んだ順, エントリー) の最小ヒープ（同じ時刻では先に読んだ新しい行を残す）
+        top: List[Tuple[str, int, Dict[str, Any]]] = []
+        counter = 0
+        for date, log_file in self._candidate_files(device_name, command, scenario_name,
+                                                    start_date, end_date):
+            if limit is not None and len(top) >= limit and top[0][0][:10].replace('-', '') > date:
+                break
+
+            try:
+                for line in read_lines_reversed(log_file):
+                    try:
+                        log_entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    timestamp = log_entry.get('timestamp', '')
+                    if limit is not None and len(top) >= limit and timestamp < top[0][0]:
+                        break
+
+                    # フィルタリング
+                    if device_name and log_entry.get('device_name') != device_name:
+                        continue
+                    if command and log_entry.get('command') != command:
+                        continue
+                    if scenario_name and log_entry.get('scenario_name') != scenario_name:
+                        continue
+                    log_date = timestamp.split('T')[0]
+                    if start_date and log_date < start_date:
+                        continue
+                    if end_date and log_date > end_date:
+                        continue
+
+                    counter += 1
+                    item = (timestamp, -counter, log_entry)
+                    if limit is None or len(top) < limit:
+                        heapq.heappush(top, item)
+                    else:
+                        heapq.heappushpop(top, item)
+            except Exception as e:
+                logger.error(f"Failed to read log file {log_file}: {e}")
+
+        # 新しい順
+        top.sort(key=lambda item: item[:2], reverse=True)
+        return [log_entry for _, _, log_entry in top]
+
+    def delete_before(self, cutoff: datetime):
+        """更新日時が指定日時より古いログファイルを削除"""
+        with self.lock:
+            self._close_handles()
+        for log_file in self.log_dir.glob("*.log"):
+            if log_file.stat().st_mtime < cutoff.timestamp():
+                try:
+                    log_file.unlink()
+                    logger.info(f"Deleted old log file: {log_file}")
+                except Exception as e:
+                    logger.error(f"Failed to delete log file {log_file}: {e}")
+
+
+class SqliteLogStorage(LogStorage):
+    """インデックス付きのSQLite（WALモード）にログを保存するストレージ"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY,
+            session_id TEXT,
+            timestamp TEXT NOT NULL,
+            device_name TEXT,
+            command TEXT,
+            scenario_name TEXT,
+            success INTEGER,
+            execution_time REAL,
+            entry TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_logs_device_time ON logs (device_name, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_logs_command_time ON logs (command, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_logs_scenario_time ON logs (scenario_name, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_logs_time ON logs (timestamp);
+    """
+
+    def __init__(self, db_path: Path, batch_size: int = LOG_DB_BATCH_SIZE,
+                 flush_interval: float = LOG_DB_FLUSH_INTERVAL):
+        """
+        SQLiteストレージを初期化
+
+        Args:
+            db_path: データベースファイルのパス
+            batch_size: まとめて挿入する件数
+            flush_interval: 挿入待ちがこの時間（秒）を過ぎたら次の書き込みで挿入
+        """
+        self.db_path = Path(db_path)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._pending_since = 0.0
+
+        # 接続はスレッド間で共有し、ロックで直列化する
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def _row(log_entry: Dict[str, Any]) -> tuple:
+        """ログエントリーをテーブルの行に変換"""
+        return (
+            log_entry.get('session_id'),
+            log_entry.get('timestamp', ''),
+            log_entry.get('device_name'),
+            log_entry.get('command'),
+            log_entry.get('scenario_name'),
+            1 if log_entry.get('success') else 0,
+            log_entry.get('execution_time', log_entry.get('total_time')),
+            json.dumps(log_entry, ensure_ascii=False)
+        )
+
+    def append_many(self, log_entries: Iterable[Dict[str, Any]]):
+        """
+        ログエントリーを挿入待ちに加え、件数か経過時間が上限に達したらまとめて挿入
+
+        挿入待ちのログは検索・集計の前とプロセス終了時（close）にも書き出す。
+        """
+        rows = [self._row(log_entry) for log_entry in log_entries]
+        with self.lock:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.extend(rows)
+            if (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._pending_since >= self.flush_interval):
+                self._flush_locked()
+
+    def _flush_locked(self):
+        """挿入待ちのログを1トランザクションで挿入（ロック取得済み前提）"""
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT INTO logs (session_id, timestamp, device_name, command, scenario_name,'
+                    ' success, execution_time, entry) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to insert {len(rows)} log entries: {e}")
+
+    def flush(self):
+        """挿入待ちのログを書き出す"""
+        with self.lock:
+            self._flush_locked()
+
+    def query(self, device_name: Optional[str] = None,
+              command: Optional[str] = None,
+              scenario_name: Optional[str] = None,
+              start_date: Optional[str] = None,
+              end_date: Optional[str] = None,
+              limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """条件と件数制限をSQLで適用してログを新しい順に取得"""
+        conditions = []
+        params: List[Any] = []
+        if device_name:
+            conditions.append('device_name = ?')
+            params.append(device_name)
+        if command:
+            conditions.append('command = ?')
+            params.append(command)
+        if scenario_name:
+            conditions.append('scenario_name = ?')
+            params.append(scenario_name)
+        if start_date:
+            conditions.append('timestamp >= ?')
+            params.append(start_date)
+        if end_date:
+            conditions.append('timestamp < ?')
+            params.append(_end_of_day(end_date))
+
+        sql = 'SELECT entry FROM logs'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY timestamp DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        with self.lock:
+            self._flush_locked()
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def summary(self) -> Optional[Dict[str, int]]:
+        """セッション数・デバイス数・（デバイス, コマンド）数をSQLで集計"""
+        with self.lock:
+            self._flush_locked()
+            # ログインデックスと同じく、セッションの成否は最初のログで判定する
+            total_sessions, successful_sessions = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(success), 0) FROM logs'
+                ' WHERE id IN (SELECT MIN(id) FROM logs GROUP BY session_id)'
+            ).fetchone()
+            device_count = self._conn.execute(
+                'SELECT COUNT(DISTINCT device_name) FROM logs'
+            ).fetchone()[0]
+            command_count = self._conn.execute(
+                'SELECT COUNT(*) FROM (SELECT DISTINCT device_name, command FROM logs'
+                ' WHERE command IS NOT NULL)'
+            ).fetchone()[0]
+        return {
+            'total_sessions': total_sessions,
+            'successful_sessions': successful_sessions,
+            'failed_sessions': total_sessions - successful_sessions,
+            'device_count': device_count,
+            'command_count': command_count
+        }
+
+    @staticmethod
+    def entry_key(log_entry: Dict[str, Any]) -> Tuple[Optional[str], str, Optional[str]]:
+        """重複判定に使うログエントリーのキー（セッションID, タイムスタンプ, コマンド）"""
+        return (log_entry.get('session_id'), log_entry.get('timestamp', ''), log_entry.get('command'))
+
+    def existing_keys(self) -> Set[Tuple[Optional[str], str, Optional[str]]]:
+        """
+        保存済みのログのキーを取得（挿入待ちのログも含む）
+
+        Returns:
+            Set: entry_key と同じ形式のキーの集合
+        """
+        with self.lock:
+            self._flush_locked()
+            return {
+                tuple(row) for row in self._conn.execute(
+                    'SELECT session_id, timestamp, command FROM logs'
+                )
+            }
+
+    def delete_before(self, cutoff: datetime):
+        """タイムスタンプが指定日時より古いログを削除"""
+        with self.lock:
+            self._flush_locked()
+            with self._conn:
+                deleted = self._conn.execute(
+                    'DELETE FROM logs WHERE timestamp < ?', (cutoff.isoformat(),)
+                ).rowcount
+        logger.info(f"Deleted {deleted} log entries older than {cutoff.date()}")
+
+    def close(self):
+        """挿入待ちのログを書き出して接続を閉じる"""
+        with self.lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+def create_log_storage(log_dir: Path, backend: str = LOG_STORAGE) -> LogStorage:
+    """
+    設定に応じたログストレージを作成
+
+    Args:
+        log_dir: ログディレクトリ
+        backend: 'jsonl' または 'sqlite'
+
+    Returns:
+        LogStorage: ログストレージ
+    """
+    if backend == 'sqlite':
+        return SqliteLogStorage(Path(log_dir) / LOG_DB_FILE)
+    if backend != 'jsonl':
+        logger.warning(f"Unknown log storage '{backend}', falling back to jsonl")
+    return JsonlLogStorage(Path(log_dir))
+
+
+def migrate_jsonl_to_sqlite(log_dir: Path, db_path: Optional[Path] = None,
+                            batch_size: int = 1000) -> int:
+    """
+    既存のJSONLログをSQLiteへ取り込む
+
+    既に取り込み済みのエントリー（セッションID・タイムスタンプ・コマンドが一致）は
+    読み飛ばすため、繰り返し実行してもよい。
+
+    Args:
+        log_dir: JSONLログのディレクトリ
+        db_path: 取り込み先のデータベース（省略時は log_dir/LOG_DB_FILE）
+        batch_size: 1トランザクションで挿入する件数
+
+    Returns:
+        int: 取り込んだ件数
+    """
+    log_dir = Path(log_dir)
+    storage = SqliteLogStorage(db_path or log_dir / LOG_DB_FILE, batch_size=batch_size,
+                               flush_interval=float('inf'))
+    existing = storage.existing_keys()
+
+    imported = 0
+    try:
+        for log_entry in JsonlLogStorage(log_dir).iter_entries():
+            key = storage.entry_key(log_entry)
+            if key in existing:
+                continue
+            existing.add(key)
+            storage.append(log_entry)
+            imported += 1
+    finally:
+        storage.close()
+    logger.info(f"Imported {imported} log entries into {storage.db_path}")
+    return imported
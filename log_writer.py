@@ -0,0 +1,207 @@
+"""
+バックグラウンドログ書き込みモジュール
+実行スレッドはログエントリーを有限長のキューに積むだけにし、書き込みスレッドが
+件数または経過時間ごとにまとめてファイル・インデックスへ書き出す
+"""
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 既定値（環境変数で変更可能）
+LOG_ASYNC_ENABLED = os.getenv('LOG_ASYNC', '1').lower() not in ('0', 'false', 'no')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))                      # キューに積めるエントリー数
+LOG_WRITE_BATCH_SIZE = int(os.getenv('LOG_WRITE_BATCH_SIZE', '500'))            # まとめて書き出す件数
+LOG_WRITE_FLUSH_INTERVAL = float(os.getenv('LOG_WRITE_FLUSH_INTERVAL', '0.2'))  # 最初のエントリーから書き出すまでの最大時間（秒）
+LOG_QUEUE_PUT_TIMEOUT = float(os.getenv('LOG_QUEUE_PUT_TIMEOUT', '5'))          # キューが満杯の場合に待つ最大時間（秒）
+
+# 書き込みスレッドを止めるための番兵
+_STOP = object()
+
+
+class LogWriter:
+    """有限長キューと書き込みスレッドによる非同期ログ書き込みクラス"""
+
+    def __init__(self, write_batch: Callable[[List[Dict[str, Any]]], None],
+                 max_queue: int = LOG_QUEUE_SIZE,
+                 batch_size: int = LOG_WRITE_BATCH_SIZE,
+                 flush_interval: float = LOG_WRITE_FLUSH_INTERVAL,
+                 put_timeout: float = LOG_QUEUE_PUT_TIMEOUT):
+        """
+        ログ書き込みスレッドを初期化して起動
+
+        Args:
+            write_batch: エントリーのリストを書き出す処理（書き込みスレッドで呼ばれる）
+            max_queue: キューに積めるエントリー数（満杯の間は submit が待つ）
+            batch_size: まとめて書き出す件数
+            flush_interval: 最初のエントリーから書き出すまでの最大時間（秒）
+            put_timeout: キューが満杯の場合に待つ最大時間（秒、過ぎたら呼び出し元で書き出す）
+        """
+        self.write_batch = write_batch
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_queue))
+        self._closed = False
+        self._close_lock = threading.Lock()
+        # キューの空きを待っている submit の数（停止処理はこれが0になってから残りを書き出す）
+        self._waiting_puts = 0
+        self._puts_done = threading.Condition(self._close_lock)
+        self.lock = threading.Lock()
+
+        # 統計カウンター
+        self.stats = {
+            'submitted': 0,
+            'written': 0,
+            'batches': 0,
+            'backpressure_waits': 0,
+            'inline_writes': 0,
+            'errors': 0
+        }
+
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, log_entry: Dict[str, Any]):
+        """
+        ログエントリーをキューに積む
+
+        キューが満杯の場合は書き込みスレッドが追いつくまで最大 put_timeout 秒待ち
+        （バックプレッシャー）、それでも積めない場合と停止後は呼び出し元のスレッドで書き出す。
+        _close_lock の中では停止済みの確認と待たずに積む処理だけを行い、空き待ちはロックの
+        外で行う（待っている submit が他の submit を止めない）。停止処理は空き待ちの submit が
+        終わってから残りを書き出すため、停止後のキューに積まれたまま失われるエントリーは作らない。
+
+        Args:
+            log_entry: ログエントリー
+        """
+        waiting = False
+        with self._close_lock:
+            queued = not self._closed and self._put_nowait(log_entry)
+            if not queued and not self._closed:
+                waiting = True
+                self._waiting_puts += 1
+
+        if waiting:
+            try:
+                queued = self._put_waiting(log_entry)
+            finally:
+                with self._close_lock:
+                    self._waiting_puts -= 1
+                    self._puts_done.notify_all()
+
+        if not queued:
+            with self.lock:
+                self.stats['inline_writes'] += 1
+            self._write([log_entry])
+
+    def _put_nowait(self, log_entry: Dict[str, Any]) -> bool:
+        """待たずにキューへ積む（_close_lock 取得済み前提、満杯ならFalse）"""
+        with self.lock:
+            self.stats['submitted'] += 1
+        try:
+            self._queue.put_nowait(log_entry)
+            return True
+        except queue.Full:
+            return False
+
+    def _put_waiting(self, log_entry: Dict[str, Any]) -> bool:
+        """キューの空きを最大 put_timeout 秒待って積む（積めなければFalse）"""
+        with self.lock:
+            self.stats['backpressure_waits'] += 1
+        logger.warning("Log queue is full, waiting for the writer")
+        try:
+            self._queue.put(log_entry, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            logger.warning(f"Log queue stayed full for {self.put_timeout:g} seconds, writing inline")
+            return False
+
+    def _run(self):
+        """書き込みスレッド本体（件数か経過時間で区切ってまとめて書き出す）"""
+        batch: List[Dict[str, Any]] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            stopping = item is _STOP
+            if item is not None and not stopping:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+
+            if batch and (item is None or stopping or len(batch) >= self.batch_size
+                          or time.monotonic() >= deadline):
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+
+            if stopping:
+                self._queue.task_done()
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        """1バッチを書き出す（失敗しても書き込みスレッドは止めない）"""
+        try:
+            self.write_batch(batch)
+            with self.lock:
+                self.stats['written'] += len(batch)
+                self.stats['batches'] += 1
+        except Exception as e:
+            with self.lock:
+                self.stats['errors'] += 1
+            logger.error(f"Failed to write {len(batch)} log entries: {e}")
+
+    def flush(self):
+        """キューに積まれたエントリーがすべて書き出されるまで待つ"""
+        if not self._closed:
+            self._queue.join()
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        キューに残ったエントリーを書き出してから書き込みスレッドを止める
+
+        Args:
+            timeout: 書き込みスレッドの終了を待つ最大時間（秒、Noneで無制限）
+        """
+        with self._close_lock:
+            if self._closed:
+                return
+            # 以降の submit は呼び出し元で書き出す
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+        # 空き待ちの submit が積み終えるか諦めるまで待つ
+        with self._close_lock:
+            while self._waiting_puts:
+                self._puts_done.wait()
+
+        # 書き込みスレッドの停止後に積まれたエントリーや、時間内に終わらなかった場合に
+        # 残ったエントリーはこのスレッドで書き出す
+        remaining = []
+        while True:
+            try:
+                remaining.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        remaining = [item for item in remaining if item is not _STOP]
+        if remaining:
+            self._write(remaining)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """書き込みの統計を取得"""
+        with self.lock:
+            stats = dict(self.stats)
+        stats['queued'] = self._queue.qsize()
+        stats['running'] = self._thread.is_alive()
+        return stats
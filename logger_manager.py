@@ -6,23 +6,46 @@
 """
 import os
 import json
+import atexit
 import logging
 import yaml
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import threading
+from collections import OrderedDict, deque
+from itertools import islice
 from logging.handlers import RotatingFileHandler
 
+# コマンド分類モジュールのインポート
+from command_classifier import classify_command
+# ログストレージモジュールのインポート
+from log_storage import LogStorage, create_log_storage
+# ログ書き込みモジュールのインポート
+from log_writer import LOG_ASYNC_ENABLED, LogWriter
+
+# ジャーナルをスナップショットへ統合する最小レコード数（環境変数で変更可能）
+# ジャーナルがこの値とスナップショットのレコード数の大きい方を超えたら統合する
+LOG_INDEX_COMPACT_MIN = int(os.getenv('LOG_INDEX_COMPACT_MIN', '1000'))
+
+# インデックスに保持するデバイス・コマンドごとの履歴件数（0で無制限、件数の合計は command_stats に残る）
+LOG_INDEX_HISTORY = int(os.getenv('LOG_INDEX_HISTORY', '1000'))
+
+# インデックスに保持するセッション数（0で無制限、超えたら古いものから削除）
+LOG_INDEX_MAX_SESSIONS = int(os.getenv('LOG_INDEX_MAX_SESSIONS', '10000'))
+
 class LogManager:
     """ログ管理クラス"""
     
-    def __init__(self, log_dir: str = "logs"):
+    def __init__(self, log_dir: str = "logs", storage: Optional[LogStorage] = None,
+                 async_write: bool = LOG_ASYNC_ENABLED):
         """
         ログ管理クラスを初期化
         
         Args:
             log_dir: ログファイルを保存するディレクトリ
+            storage: ログの保存先（省略時は環境変数 LOG_STORAGE に従う）
+            async_write: ログの書き込みを書き込みスレッドで行う場合True
         """
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
@@ -30,12 +53,32 @@ class LogManager:
         # ログ設定
         self.setup_logging()
         
-        # ログインデックス
+        # ログインデックス（スナップショット + 追記専用ジャーナル）
+        # メモリ上は sessions をセッションID -> レコードの辞書（直近 LOG_INDEX_MAX_SESSIONS 件）、
+        # devices と commands を直近の履歴の deque、command_stats をコマンドごとの集計として保持する
         self.log_index_file = self.log_dir / "log_index.json"
+        self.journal_file = self.log_dir / "log_index.journal"
+        self._journal_seq = 0          # 最後に適用したジャーナルレコードの通番
+        self._journal_records = 0      # スナップショット以降にジャーナルへ追記したレコード数
+        self._snapshot_records = 0     # 直近のスナップショットに含まれるレコード数
+        self._scenario_history: Dict[Tuple[str, str], deque] = {}
         self.log_index = self.load_log_index()
+        self._journal = open(self.journal_file, 'a', encoding='utf-8')
         
-        # ログロック
+        # インデックス用ロック（メモリ上の更新とジャーナル1行の追記のみ保持する）
         self.lock = threading.Lock()
+        
+        # ログの保存先（JSONLファイル / SQLite）
+        self.storage = storage or create_log_storage(self.log_dir)
+        
+        # 実行スレッドはキューに積むだけにし、書き込みスレッドでまとめて書き出す
+        self.writer = LogWriter(self._write_entries) if async_write else None
+        atexit.register(self.close)
+        
+        # 再生したジャーナル（途中で切れた行を含む）は起動時にスナップショットへ統合する
+        if self.journal_file.stat().st_size:
+            with self.lock:
+                self.save_log_index()
     
     def setup_logging(self):
         """ログ設定を初期化"""
@@ -63,29 +106,160 @@ class LogManager:
         self.logger.addHandler(file_handler)
         self.logger.addHandler(console_handler)
     
+    @staticmethod
+    def _empty_index() -> Dict[str, Any]:
+        """空のログインデックス"""
+        return {
+            'sessions': OrderedDict(),
+            'devices': {},
+            'commands': {},
+            'command_stats': {},
+            'session_counts': {}
+        }
+    
+    @staticmethod
+    def _new_history(items=()) -> deque:
+        """直近 LOG_INDEX_HISTORY 件を保持する履歴"""
+        return deque(items, maxlen=LOG_INDEX_HISTORY or None)
+    
     def load_log_index(self) -> Dict[str, Any]:
-        """ログインデックスを読み込む"""
+        """
+        ログインデックスを読み込む
+        
+        スナップショット（log_index.json）を読み込んだ後、ジャーナルのうち
+        スナップショットより新しいレコードを再生する。書き込み途中で
+        中断された末尾の行は読み飛ばす。
+        """
+        data = {}
         if self.log_index_file.exists():
             try:
                 with open(self.log_index_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    data = json.load(f)
             except Exception as e:
                 self.logger.error(f"ログインデックスの読み込みに失敗: {e}")
         
+        log_index = self._build_index(data)
+        self._journal_seq = data.get('journal_seq', 0)
+        self._snapshot_records = len(log_index['sessions']) + sum(
+            len(history) for history in log_index['commands'].values()
+        )
+        
+        replayed = 0
+        if self.journal_file.exists():
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # クラッシュで途中まで書かれた行
+                        continue
+                    if record.get('seq', 0) <= self._journal_seq:
+                        # スナップショットに統合済み
+                        continue
+                    self._apply_index_record(log_index, record)
+                    self._journal_seq = record['seq']
+                    replayed += 1
+        self._journal_records = replayed
+        if replayed:
+            self.logger.info(f"ログインデックスのジャーナルを再生: {replayed}件")
+        
+        return log_index
+    
+    def _build_index(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        スナップショットのリスト形式からメモリ上のインデックスを構築
+        
+        command_stats がない旧形式のスナップショットは履歴から集計する。
+        
+        Args:
+            data: log_index.json の内容
+            
+        Returns:
+            Dict: メモリ上のインデックス
+        """
+        log_index = self._empty_index()
+        self._scenario_history = {}
+        for session in data.get('sessions', []):
+            self._add_session(log_index, session)
+        for device_name, history in data.get('devices', {}).items():
+            log_index['devices'][device_name] = self._new_history(history)
+        for command_key, history in data.get('commands', {}).items():
+            log_index['commands'][command_key] = self._new_history(history)
+        
+        command_stats = data.get('command_stats')
+        if command_stats is None:
+            command_stats = {}
+            for command_key, history in data.get('commands', {}).items():
+                stats = command_stats[command_key] = self._new_command_stats()
+                for entry in history:
+                    self._add_command_stats(stats, entry)
+        log_index['command_stats'] = command_stats
+        
+        session_counts = data.get('session_counts')
+        if session_counts is None:
+            session_counts = {}
+            for session in data.get('sessions', []):
+                self._count_session(session_counts, session)
+        log_index['session_counts'] = session_counts
+        return log_index
+    
+    def _snapshot(self) -> Dict[str, Any]:
+        """メモリ上のインデックスをスナップショットのリスト形式に変換（ロック取得済み前提）"""
         return {
-            'sessions': [],
-            'devices': {},
-            'commands': {}
+            'sessions': list(self.log_index['sessions'].values()),
+            'devices': {name: list(history) for name, history in self.log_index['devices'].items()},
+            'commands': {key: list(history) for key, history in self.log_index['commands'].items()},
+            'command_stats': self.log_index['command_stats'],
+            'session_counts': self.log_index['session_counts'],
+            'journal_seq': self._journal_seq
         }
     
     def save_log_index(self):
-        """ログインデックスを保存"""
+        """ログインデックスのスナップショットを保存し、ジャーナルを空にする（ロック取得済み前提）"""
         try:
-            with open(self.log_index_file, 'w', encoding='utf-8') as f:
-                json.dump(self.log_index, f, ensure_ascii=False, indent=2)
+            # 一時ファイルに書いてから置き換える（途中で中断しても旧スナップショットが残る）
+            temp_file = self.log_index_file.with_suffix('.json.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._snapshot(), f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.log_index_file)
+            
+            # スナップショットに含まれたジャーナルを破棄（残っても通番で読み飛ばされる）
+            self._journal.close()
+            self._journal = open(self.journal_file, 'w', encoding='utf-8')
+            self._snapshot_records += self._journal_records
+            self._journal_records = 0
         except Exception as e:
             self.logger.error(f"ログインデックスの保存に失敗: {e}")
     
+    def _append_index_records(self, records: List[Dict[str, Any]]):
+        """
+        インデックスへレコードを適用し、ジャーナルへまとめて追記する
+        
+        ジャーナルがスナップショットより大きくなったら統合するため、
+        統合のコストはレコードあたり定数に償却される。
+        
+        Args:
+            records: {'type': 'command' / 'scenario', 'entry': インデックスのエントリー} のリスト
+        """
+        with self.lock:
+            lines = []
+            for record in records:
+                self._journal_seq += 1
+                record['seq'] = self._journal_seq
+                self._apply_index_record(self.log_index, record)
+                lines.append(json.dumps(record, ensure_ascii=False) + '\n')
+            try:
+                self._journal.writelines(lines)
+                self._journal.flush()
+            except Exception as e:
+                self.logger.error(f"ログインデックスのジャーナル書き込みに失敗: {e}")
+            self._journal_records += len(records)
+            
+            if self._journal_records >= max(LOG_INDEX_COMPACT_MIN, self._snapshot_records):
+                self.save_log_index()
+    
     def log_command_execution(self, device_name: str, command: str, result: Dict[str, Any]):
         """
         コマンド実行をログに記録
@@ -95,40 +269,26 @@ class LogManager:
             command: 実行したコマンド
             result: 実行結果
         """
-        with self.lock:
-            # セッションID生成
-            session_id = f"{device_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
-            # ログエントリー作成
-            log_entry = {
-                'session_id': session_id,
-                'timestamp': datetime.now().isoformat(),
-                'device_name': device_name,
-                'command': command,
-                'success': result.get('success', False),
-                'execution_time': result.get('execution_time', 0),
-                'output': result.get('output', ''),
-                'error_output': result.get('error_output', ''),
-                'command_type': self._get_command_type(command)
-            }
-            
-            # ログファイルに保存
-            log_file = self.log_dir / f"{device_name}_{datetime.now().strftime('%Y%m%d')}.log"
-            try:
-                with open(log_file, 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
-            except Exception as e:
-                self.logger.error(f"ログファイルの書き込みに失敗: {e}")
-            
-            # インデックス更新
-            self._update_log_index(log_entry)
-            
-            # ログ出力
-            if result.get('success'):
-                self.logger.info(f"Command executed successfully: {device_name} > {command}")
-            else:
-                self.logger.error(f"Command execution failed: {device_name} > {command}")
-                self.logger.error(f"Error: {result.get('error_output', 'Unknown error')}")
+        # セッションID生成
+        session_id = f"{device_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        
+        # ログエントリー作成
+        log_entry = {
+            'session_id': session_id,
+            'timestamp': datetime.now().isoformat(),
+            'device_name': device_name,
+            'command': command,
+            'success': result.get('success', False),
+            'execution_time': result.get('execution_time', 0),
+            'output': result.get('output', ''),
+            'error_output': result.get('error_output', ''),
+            'command_type': self._get_command_type(command)
+        }
+        # 大きな出力はファイルへ退避されているためハンドルを記録
+        if result.get('output_file'):
+            log_entry['output_file'] = result['output_file']
+        
+        self._submit(log_entry)
     
     def log_scenario_execution(self, device_name: str, scenario_name: str, result: Dict[str, Any]):
         """
@@ -139,128 +299,296 @@ class LogManager:
             scenario_name: シナリオ名
             result: 実行結果
         """
-        with self.lock:
-            session_id = f"scenario_{device_name}_{scenario_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
-            log_entry = {
-                'session_id': session_id,
-                'timestamp': datetime.now().isoformat(),
-                'device_name': device_name,
-                'scenario_name': scenario_name,
-                'success': result.get('success', False),
-                'total_commands': result.get('total_commands', 0),
-                'successful_commands': result.get('successful_commands', 0),
-                'failed_commands': result.get('failed_commands', 0),
-                'output': result.get('output', ''),
-                'error_output': result.get('error_output', ''),
-                'command_results': result.get('command_results', [])
-            }
-            
-            # ログファイルに保存
-            log_file = self.log_dir / f"scenario_{datetime.now().strftime('%Y%m%d')}.log"
-            try:
-                with open(log_file, 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
-            except Exception as e:
-                self.logger.error(f"シナリオログの書き込みに失敗: {e}")
-            
-            # インデックス更新
-            self._update_scenario_index(log_entry)
-            
-            # ログ出力
-            if result.get('success'):
-                self.logger.info(f"Scenario executed successfully: {device_name} > {scenario_name}")
-            else:
-                self.logger.error(f"Scenario execution failed: {device_name} > {scenario_name}")
+        session_id = f"scenario_{device_name}_{scenario_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        
+        log_entry = {
+            'session_id': session_id,
+            'timestamp': datetime.now().isoformat(),
+            'device_name': device_name,
+            'scenario_name': scenario_name,
+            'success': result.get('success', False),
+            'total_commands': result.get('total_commands', 0),
+            'successful_commands': result.get('successful_commands', 0),
+            'failed_commands': result.get('failed_commands', 0),
+            'total_time': result.get('total_time'),
+            'output': result.get('output', ''),
+            'error_output': result.get('error_output', ''),
+            'command_results': result.get('command_results', [])
+        }
+        
+        self._submit(log_entry)
     
     def _get_command_type(self, command: str) -> str:
         """コマンドタイプを判定"""
-        command_lower = command.lower()
-        if 'show' in command_lower:
-            return 'show'
-        elif 'configure' in command_lower or 'conf' in command_lower:
-            return 'configure'
-        elif 'ping' in command_lower:
-            return 'ping'
-        elif 'traceroute' in command_lower or 'tracert' in command_lower:
-            return 'traceroute'
+        return classify_command(command)
+    
+    def _submit(self, log_entry: Dict[str, Any]):
+        """ログエントリーを書き込みスレッドへ渡す（同期書き込み時はその場で書き出す）"""
+        if self.writer:
+            self.writer.submit(log_entry)
         else:
-            return 'other'
+            self._write_entries([log_entry])
     
-    def _update_log_index(self, log_entry: Dict[str, Any]):
-        """ログインデックスを更新"""
-        session_id = log_entry['session_id']
+    def _write_entries(self, log_entries: List[Dict[str, Any]]):
+        """
+        ログエントリーをまとめて保存し、インデックスを更新してログ出力する
         
-        # セッションリストに追加
-        if session_id not in [s['session_id'] for s in self.log_index['sessions']]:
-            self.log_index['sessions'].append({
-                'session_id': session_id,
+        Args:
+            log_entries: コマンド・シナリオのログエントリー
+        """
+        # ログを保存
+        try:
+            self.storage.append_many(log_entries)
+            self.storage.flush()
+        except Exception as e:
+            self.logger.error(f"ログファイルの書き込みに失敗: {e}")
+        
+        # インデックス更新
+        self._append_index_records([
+            self._scenario_index_record(log_entry) if 'scenario_name' in log_entry
+            else self._command_index_record(log_entry)
+            for log_entry in log_entries
+        ])
+        
+        # ログ出力
+        for log_entry in log_entries:
+            device_name = log_entry['device_name']
+            if 'scenario_name' in log_entry:
+                if log_entry['success']:
+                    self.logger.info(f"Scenario executed successfully: {device_name} > {log_entry['scenario_name']}")
+                else:
+                    self.logger.error(f"Scenario execution failed: {device_name} > {log_entry['scenario_name']}")
+            elif log_entry['success']:
+                self.logger.info(f"Command executed successfully: {device_name} > {log_entry['command']}")
+            else:
+                self.logger.error(f"Command execution failed: {device_name} > {log_entry['command']}")
+                self.logger.error(f"Error: {log_entry['error_output'] or 'Unknown error'}")
+    
+    def flush(self):
+        """書き込みスレッドに渡したログがすべて書き出されるまで待つ"""
+        if self.writer:
+            self.writer.flush()
+    
+    def close(self):
+        """書き込みスレッドのキューを書き出して停止し、ログの保存先を閉じる"""
+        if self.writer:
+            self.writer.close()
+        self.storage.close()
+    
+    def get_writer_stats(self) -> Dict[str, Any]:
+        """ログ書き込みの統計を取得"""
+        if not self.writer:
+            return {'async': False}
+        stats = self.writer.get_stats()
+        stats['async'] = True
+        return stats
+    
+    def _command_index_record(self, log_entry: Dict[str, Any]) -> Dict[str, Any]:
+        """コマンドログのインデックスレコードを作成"""
+        return {
+            'type': 'command',
+            'entry': {
+                'session_id': log_entry['session_id'],
                 'timestamp': log_entry['timestamp'],
                 'device_name': log_entry['device_name'],
                 'command': log_entry['command'],
-                'success': log_entry['success']
-            })
-        
-        # デバイスインデックス更新
-        device_name = log_entry['device_name']
-        if device_name not in self.log_index['devices']:
-            self.log_index['devices'][device_name] = []
-        
-        device_session = {
-            'session_id': session_id,
-            'timestamp': log_entry['timestamp'],
-            'command': log_entry['command'],
-            'success': log_entry['success'],
-            'execution_time': log_entry['execution_time']
+                'success': log_entry['success'],
+                'execution_time': log_entry['execution_time']
+            }
         }
+    
+    def _scenario_index_record(self, log_entry: Dict[str, Any]) -> Dict[str, Any]:
+        """シナリオログのインデックスレコードを作成"""
+        return {
+            'type': 'scenario',
+            'entry': {
+                'session_id': log_entry['session_id'],
+                'timestamp': log_entry['timestamp'],
+                'device_name': log_entry['device_name'],
+                'scenario_name': log_entry['scenario_name'],
+                'success': log_entry['success'],
+                'total_commands': log_entry['total_commands'],
+                'successful_commands': log_entry['successful_commands'],
+                'failed_commands': log_entry['failed_commands'],
+                'total_time': log_entry.get('total_time')
+            }
+        }
+    
+    def _apply_index_record(self, log_index: Dict[str, Any], record: Dict[str, Any]):
+        """
+        ジャーナルレコードをインデックスへ適用（ライブ更新と再生で共通）
         
-        # 重複チェック
-        if not any(s['session_id'] == session_id for s in self.log_index['devices'][device_name]):
-            self.log_index['devices'][device_name].append(device_session)
+        Args:
+            log_index: 適用先のインデックス
+            record: ジャーナルレコード
+        """
+        entry = record['entry']
+        session_id = entry['session_id']
         
-        # コマンドインデックス更新
-        command_key = f"{log_entry['device_name']}_{log_entry['command']}"
-        if command_key not in self.log_index['commands']:
-            self.log_index['commands'][command_key] = []
+        if record['type'] == 'scenario':
+            self._add_session(log_index, entry)
+            self._count_session(log_index['session_counts'], entry)
+            return
         
+        # セッション・デバイスインデックスに追加（同じ秒のコマンドは1セッション）
+        if session_id not in log_index['sessions']:
+            self._add_session(log_index, {
+                'session_id': session_id,
+                'timestamp': entry['timestamp'],
+                'device_name': entry['device_name'],
+                'command': entry['command'],
+                'success': entry['success']
+            })
+            self._count_session(log_index['session_counts'], entry)
+            device_history = log_index['devices'].get(entry['device_name'])
+            if device_history is None:
+                device_history = log_index['devices'][entry['device_name']] = self._new_history()
+            device_history.append({
+                'session_id': session_id,
+                'timestamp': entry['timestamp'],
+                'command': entry['command'],
+                'success': entry['success'],
+                'execution_time': entry['execution_time']
+            })
+        
+        # コマンドインデックスと集計を更新
+        command_key = f"{entry['device_name']}_{entry['command']}"
+        command_history = log_index['commands'].get(command_key)
+        if command_history is None:
+            command_history = log_index['commands'][command_key] = self._new_history()
         command_session = {
             'session_id': session_id,
-            'timestamp': log_entry['timestamp'],
-            'success': log_entry['success'],
-            'execution_time': log_entry['execution_time']
+            'timestamp': entry['timestamp'],
+            'success': entry['success'],
+            'execution_time': entry['execution_time']
         }
+        command_history.append(command_session)
+        stats = log_index['command_stats'].get(command_key)
+        if stats is None:
+            stats = log_index['command_stats'][command_key] = self._new_command_stats()
+        self._add_command_stats(stats, command_session)
+    
+    def _add_session(self, log_index: Dict[str, Any], session: Dict[str, Any]):
+        """セッションを追加（同じ秒の同じシナリオはキーをずらして両方残し、上限を超えたら古いものから削除）"""
+        sessions = log_index['sessions']
+        key = session['session_id']
+        suffix = 1
+        while key in sessions:
+            key = f"{session['session_id']}#{suffix}"
+            suffix += 1
+        sessions[key] = session
+        while LOG_INDEX_MAX_SESSIONS and len(sessions) > LOG_INDEX_MAX_SESSIONS:
+            sessions.popitem(last=False)
         
-        self.log_index['commands'][command_key].append(command_session)
-        
-        # インデックス保存
-        self.save_log_index()
+        if session.get('scenario_name') and session.get('total_time') is not None:
+            history_key = (session['device_name'], session['scenario_name'])
+            history = self._scenario_history.get(history_key)
+            if history is None:
+                history = self._scenario_history[history_key] = self._new_history()
+            history.append(float(session['total_time']))
     
-    def _update_scenario_index(self, log_entry: Dict[str, Any]):
-        """シナリオログインデックスを更新"""
-        session_id = log_entry['session_id']
+    @staticmethod
+    def _count_session(session_counts: Dict[str, Dict[str, int]], session: Dict[str, Any]):
+        """
+        日付ごとのセッション数の集計に1件加える
         
-        # セッションリストに追加
-        scenario_session = {
-            'session_id': session_id,
-            'timestamp': log_entry['timestamp'],
-            'device_name': log_entry['device_name'],
-            'scenario_name': log_entry['scenario_name'],
-            'success': log_entry['success'],
-            'total_commands': log_entry['total_commands'],
-            'successful_commands': log_entry['successful_commands'],
-            'failed_commands': log_entry['failed_commands']
+        sessions は直近 LOG_INDEX_MAX_SESSIONS 件に制限されるため、サマリーの
+        セッション数はこの集計から求める（日付単位なので古いログの削除にも追従できる）。
+        """
+        day = session.get('timestamp', '')[:10]
+        counts = session_counts.get(day)
+        if counts is None:
+            counts = session_counts[day] = {'total': 0, 'successful': 0}
+        counts['total'] += 1
+        if session.get('success'):
+            counts['successful'] += 1
+    
+    @staticmethod
+    def _new_command_stats() -> Dict[str, Any]:
+        """コマンドごとの集計の初期値"""
+        return {
+            'count': 0,
+            'success_count': 0,
+            'total_execution_time': 0.0,
+            'last_timestamp': None
         }
+    
+    @staticmethod
+    def _add_command_stats(stats: Dict[str, Any], command_session: Dict[str, Any]):
+        """コマンドごとの集計に1件加える"""
+        stats['count'] += 1
+        if command_session.get('success'):
+            stats['success_count'] += 1
+            stats['total_execution_time'] += command_session.get('execution_time') or 0
+        stats['last_timestamp'] = command_session.get('timestamp')
+    
+    def get_command_history(self, device_name: str, command: str,
+                            limit: Optional[int] = None,
+                            successful_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        デバイス・コマンドの実行履歴を取得
+        
+        Args:
+            device_name: デバイス名
+            command: コマンド
+            limit: 直近何件を返すか（Noneで保持している全件）
+            successful_only: 成功した実行のみ返す場合True
+            
+        Returns:
+            List[Dict]: 実行履歴（古い順）
+        """
+        with self.lock:
+            history = self.log_index['commands'].get(f"{device_name}_{command}")
+            if not history:
+                return []
+            entries = (entry for entry in reversed(history)
+                       if not successful_only or entry.get('success'))
+            recent = list(islice(entries, limit))
+        recent.reverse()
+        return recent
+    
+    def get_command_stats(self, device_name: str, command: str) -> Optional[Dict[str, Any]]:
+        """
+        デバイス・コマンドの実行回数・成功回数・成功時の合計実行時間を取得
         
-        self.log_index['sessions'].append(scenario_session)
+        Args:
+            device_name: デバイス名
+            command: コマンド
+            
+        Returns:
+            Dict: 集計（実行履歴がない場合None）
+        """
+        with self.lock:
+            stats = self.log_index['command_stats'].get(f"{device_name}_{command}")
+            return dict(stats) if stats else None
+    
+    def get_scenario_history(self, device_name: str, scenario_name: str,
+                             limit: Optional[int] = None) -> List[float]:
+        """
+        デバイスでのシナリオ実行時間の履歴を取得
         
-        # インデックス保存
-        self.save_log_index()
+        Args:
+            device_name: デバイス名
+            scenario_name: シナリオ名
+            limit: 直近何件を返すか（Noneで保持している全件）
+            
+        Returns:
+            List[float]: 実行時間（秒、古い順）
+        """
+        with self.lock:
+            history = self._scenario_history.get((device_name, scenario_name))
+            if not history:
+                return []
+            recent = list(islice(reversed(history), limit))
+        recent.reverse()
+        return recent
     
     def get_logs(self, device_name: Optional[str] = None, 
                  command: Optional[str] = None,
                  start_date: Optional[str] = None,
                  end_date: Optional[str] = None,
-                 limit: int = 100) -> List[Dict[str, Any]]:
+                 limit: int = 100,
+                 scenario_name: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         ログを取得
         
@@ -270,50 +598,17 @@ class LogManager:
             start_date: 開始日（YYYY-MM-DD）
             end_date: 終了日（YYYY-MM-DD）
             limit: 取得件数制限
+            scenario_name: シナリオ名（フィルタ）
             
         Returns:
-            ログリスト
+            ログリスト（新しい順）
         """
-        logs = []
-        
-        # ログファイルを検索
-        for log_file in self.log_dir.glob("*.log"):
-            try:
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        try:
-                            log_entry = json.loads(line.strip())
-                            
-                            # フィルタリング
-                            if device_name and log_entry.get('device_name') != device_name:
-                                continue
-                            
-                            if command and log_entry.get('command') != command:
-                                continue
-                            
-                            if start_date:
-                                log_date = log_entry.get('timestamp', '').split('T')[0]
-                                if log_date < start_date:
-                                    continue
-                            
-                            if end_date:
-                                log_date = log_entry.get('timestamp', '').split('T')[0]
-                                if log_date > end_date:
-                                    continue
-                            
-                            logs.append(log_entry)
-                            
-                        except json.JSONDecodeError:
-                            continue
-                            
-            except Exception as e:
-                self.logger.error(f"ログファイルの読み込みに失敗: {log_file} - {e}")
-        
-        # タイムスタンプでソート
-        logs.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-        
-        # 件数制限
-        return logs[:limit]
+        try:
+            return self.storage.query(device_name, command, scenario_name,
+                                      start_date, end_date, limit)
+        except Exception as e:
+            self.logger.error(f"ログの読み込みに失敗: {e}")
+            return []
     
     def get_device_logs(self, device_name: str, limit: int = 50) -> List[Dict[str, Any]]:
         """デバイスのログを取得"""
@@ -325,27 +620,31 @@ class LogManager:
     
     def get_scenario_logs(self, device_name: str, scenario_name: str) -> List[Dict[str, Any]]:
         """シナリオのログを取得"""
-        logs = self.get_logs(device_name=device_name)
-        return [log for log in logs if log.get('scenario_name') == scenario_name]
+        return self.get_logs(device_name=device_name, scenario_name=scenario_name)
     
     def get_log_summary(self) -> Dict[str, Any]:
         """ログサマリーを取得"""
-        total_sessions = len(self.log_index['sessions'])
-        successful_sessions = sum(1 for s in self.log_index['sessions'] if s.get('success'))
-        failed_sessions = total_sessions - successful_sessions
-        
-        device_count = len(self.log_index['devices'])
-        command_count = len(self.log_index['commands'])
+        summary = self.storage.summary()
+        if summary is None:
+            with self.lock:
+                session_counts = self.log_index['session_counts'].values()
+                total_sessions = sum(counts['total'] for counts in session_counts)
+                successful_sessions = sum(counts['successful'] for counts in session_counts)
+                device_count = len(self.log_index['devices'])
+                command_count = len(self.log_index['commands'])
+            summary = {
+                'total_sessions': total_sessions,
+                'successful_sessions': successful_sessions,
+                'failed_sessions': total_sessions - successful_sessions,
+                'device_count': device_count,
+                'command_count': command_count
+            }
         
-        return {
-            'total_sessions': total_sessions,
-            'successful_sessions': successful_sessions,
-            'failed_sessions': failed_sessions,
-            'device_count': device_count,
-            'command_count': command_count,
+        summary.update({
             'log_directory': str(self.log_dir),
             'last_updated': datetime.now().isoformat()
-        }
+        })
+        return summary
     
     def clear_logs(self, device_name: Optional[str] = None, older_than_days: Optional[int] = None):
         """
@@ -355,29 +654,53 @@ class LogManager:
             device_name: デバイス名（指定したデバイスのログのみクリア）
             older_than_days: 指定日数より古いログをクリア
         """
+        # 書き込み待ちのログがクリア後に追記されないよう先に書き出す
+        self.flush()
         with self.lock:
             if older_than_days:
-                # 古いログファイルを削除
+                # 古いログを削除
                 cutoff_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                cutoff_date = cutoff_date.replace(day=cutoff_date.day - older_than_days)
-                
-                for log_file in self.log_dir.glob("*.log"):
-                    if log_file.stat().st_mtime < cutoff_date.timestamp():
-                        try:
-                            log_file.unlink()
-                            self.logger.info(f"古いログファイルを削除: {log_file}")
-                        except Exception as e:
-                            self.logger.error(f"ログファイルの削除に失敗: {log_file} - {e}")
+                cutoff_date -= timedelta(days=older_than_days)
+                self.storage.delete_before(cutoff_date)
             
-            # インデックスを再構築
-            self.log_index = {
-                'sessions': [],
-                'devices': {},
-                'commands': {}
-            }
+            if older_than_days:
+                # 削除したログのエントリーだけをインデックスから除く
+                self._prune_index(cutoff_date.isoformat())
+            else:
+                # インデックスを再構築
+                self.log_index = self._empty_index()
+                self._scenario_history = {}
+            self._snapshot_records = len(self.log_index['sessions']) + sum(
+                len(history) for history in self.log_index['commands'].values()
+            )
+            self._journal_records = 0
             self.save_log_index()
             
             self.logger.info("ログインデックスをクリアしました")
+    
+    def _prune_index(self, cutoff: str):
+        """
+        指定時刻より古いセッション・履歴をインデックスから除く（ロック取得済み前提）
+        
+        Args:
+            cutoff: ISO形式の時刻（これより前のエントリーを除く）
+        """
+        sessions = self.log_index['sessions']
+        for key in [key for key, session in sessions.items() if session.get('timestamp', '') < cutoff]:
+            del sessions[key]
+        session_counts = self.log_index['session_counts']
+        for day in [day for day in session_counts if day < cutoff[:10]]:
+            del session_counts[day]
+        for name in ('devices', 'commands'):
+            histories = self.log_index[name]
+            for key in list(histories):
+                history = self._new_history(
+                    entry for entry in histories[key] if entry.get('timestamp', '') >= cutoff
+                )
+                if history:
+                    histories[key] = history
+                else:
+                    del histories[key]
 
 # グローバルインスタンス
 log_manager = LogManager()
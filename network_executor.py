@@ -3,11 +3,16 @@
 ネットワークデバイスコマンド実行モジュール
 SSHとtelnet接続をサポートし、コマンド実行と結果取得を行う
 """
+import asyncio
+import math
+import os
 import paramiko
 import telnetlib3
 import threading
 import time
+from contextlib import contextmanager
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple, Any
 import logging
 from io import StringIO
@@ -15,8 +20,229 @@ from io import StringIO
 # ログ管理モジュールのインポート
 from logger_manager import get_log_manager
 
+# 接続プールモジュールのインポート
+from connection_pool import ConnectionPool, get_connection_pool
+
+# 共有イベントループモジュールのインポート
+from async_loop import get_telnet_event_loop
+
+# タイムアウト管理モジュールのインポート
+from timeout_manager import get_timeout_manager
+
+# 出力キャプチャモジュールのインポート
+from output_capture import DEFAULT_SPILL_THRESHOLD, OutputBuffer
+
+# プロンプト検出モジュールのインポート
+from prompt_matcher import PromptMatcher, PromptScanner, get_prompt_matcher
+
+# コマンド分類モジュールのインポート
+from command_classifier import is_memoizable, is_read_only, normalize_command, split_read_only_runs
+
+# 接続ガバナーモジュールのインポート
+from connection_governor import get_connection_governor
+
+# 到達性キャッシュモジュールのインポート
+from health_cache import HostHealthCache, get_host_health_cache, is_transport_error
+
+# 適応タイムアウトモジュールのインポート
+from adaptive_timeouts import get_adaptive_timeout_model
+
+# 結果キャッシュモジュールのインポート
+from result_cache import get_result_cache
+
+# 同一実行の合流モジュールのインポート
+from single_flight import get_single_flight
+
+# 実行時間予測モジュールのインポート（コマンドグループの展開）
+from duration_predictor import flatten_commands
+
 logger = logging.getLogger(__name__)
 
+# 参照系コマンドを複数チャネルで並列実行する共有スレッドプール
+# （デバイスごとの同時チャネル数は max_channels で制限する。呼び出し元のスレッドも
+#  1チャネル分を実行するため、プールが埋まっていても各デバイスの実行は進む）
+CHANNEL_WORKERS = int(os.getenv('SSH_CHANNEL_WORKERS', '64'))
+channel_pool = ThreadPoolExecutor(
+    max_workers=CHANNEL_WORKERS,
+    thread_name_prefix='ssh-channel'
+)
+
+
+class TelnetConnection:
+    """
+    telnetlib3の reader/writer を保持するTelnet接続
+    
+    I/O はすべて reader/writer を作成したイベントループ上で実行する
+    （同期実行・非同期実行とも共有イベントループ。接続プールで両者が共有できる）。
+    """
+    
+    READ_SIZE = 65535    # 1回あたりの読み取りサイズ
+    
+    def __init__(self, reader, writer, loop: asyncio.AbstractEventLoop):
+        self.reader = reader
+        self.writer = writer
+        # reader/writer を所有するイベントループ
+        self.loop = loop
+        # ログイン時に学習したプロンプト判定
+        self.prompt_matcher: Optional[PromptMatcher] = None
+    
+    def is_closing(self) -> bool:
+        """接続が閉じているか確認"""
+        transport = getattr(self.writer, 'transport', None)
+        return transport is None or transport.is_closing()
+    
+    async def read_until(self, marker: bytes) -> bytes:
+        """指定バイト列を受信するまで読み取る"""
+        return await self.reader.readuntil(marker)
+    
+    async def read_until_prompt(self, scanner: PromptScanner, count: int = 1):
+        """プロンプトを count 回検出するまで読み取る"""
+        while len(scanner.segments) < count:
+            data = await self.reader.read(self.READ_SIZE)
+            if not data:
+                raise ConnectionError("Telnet connection closed by device")
+            scanner.feed(data)
+    
+    async def write(self, data: bytes):
+        """データを送信"""
+        self.writer.write(data)
+        await self.writer.drain()
+    
+    def close(self):
+        """所有ループのスレッド上でwriterを閉じる"""
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.writer.close)
+
+
+async def open_telnet_connection(device_config: Dict[str, Any]) -> Optional[TelnetConnection]:
+    """
+    Telnetでログインし、接続を返す（呼び出し元のイベントループ上で実行）
+    
+    Args:
+        device_config: デバイス設定辞書
+        
+    Returns:
+        TelnetConnection。ログインプロンプトが見つからない場合None
+    """
+    host = device_config['host']
+    username = device_config['username']
+    password = device_config.get('password', '')
+    
+    reader, writer = await telnetlib3.open_connection(
+        host, device_config.get('port', 23), 
+        encoding=False
+    )
+    tn = TelnetConnection(reader, writer, asyncio.get_running_loop())
+    
+    try:
+        # ログインプロンプト待ち
+        output = await tn.read_until(b"login:")
+        if b"login:" not in output:
+            logger.error(f"Login prompt not found on {host}")
+            tn.close()
+            return None
+        
+        # ユーザー名送信
+        await tn.write(username.encode('ascii') + b"\n")
+        
+        # パスワードプロンプト待ち
+        output = await tn.read_until(b"Password:")
+        if b"Password:" not in output:
+            logger.error(f"Password prompt not found on {host}")
+            tn.close()
+            return None
+        
+        # パスワード送信
+        await tn.write(password.encode('ascii') + b"\n")
+        
+        # プロンプト待ち（プロンプトからホスト名を学習する）
+        scanner = get_prompt_matcher(device_config).scanner()
+        await tn.read_until_prompt(scanner)
+        tn.prompt_matcher = scanner.matcher.learn(scanner.last_prompt)
+    except BaseException:
+        # タイムアウトによるキャンセルを含め、途中失敗時は接続を閉じる
+        writer.close()
+        raise
+    
+    return tn
+
+
+async def execute_telnet_command_async(connection: TelnetConnection, command: str,
+                                       wait_string: str = '#') -> str:
+    """
+    Telnet接続でコマンドを実行し、プロンプトとエコーを除いた出力を返す
+    
+    Args:
+        connection: Telnet接続
+        command: 実行するコマンド
+        wait_string: プロンプト判定文字列（ログイン時に学習したプロンプトがない場合に使用）
+        
+    Returns:
+        str: コマンド出力
+    """
+    matcher = connection.prompt_matcher or get_prompt_matcher({'wait_string': wait_string})
+    scanner = matcher.scanner()
+    
+    # コマンド送信
+    await connection.write(command.encode('ascii') + b"\n")
+    
+    # 次のプロンプトまで読み取る
+    await connection.read_until_prompt(scanner)
+    lines = scanner.segments[0].split('\n')
+    
+    # コマンドのエコー行を除去
+    if lines and lines[0].strip() == command.strip():
+        lines = lines[1:]
+    
+    return '\n'.join(lines).strip()
+
+
+class DeadlineTarget:
+    """デッドライン超過時に閉じる接続（デッドラインの登録時に確定する）"""
+    
+    def __init__(self, connection: Any, close_connection):
+        """
+        クローズ対象を初期化
+        
+        Args:
+            connection: 登録時点の接続（接続確立前はNone）
+            close_connection: 接続を閉じる処理
+        """
+        self.connection = connection
+        self.close_connection = close_connection
+        self.active = True
+        self.lock = threading.Lock()
+    
+    def bind(self, connection: Any):
+        """接続デッドラインの範囲内で確立中の接続をクローズ対象にする"""
+        with self.lock:
+            if self.active and self.connection is None:
+                self.connection = connection
+    
+    def release(self):
+        """デッドラインの範囲を抜けた後は何も閉じない"""
+        with self.lock:
+            self.active = False
+            self.connection = None
+    
+    def abort(self) -> bool:
+        """
+        クローズ対象の接続を閉じる（監視スレッドから呼ばれる）
+        
+        Returns:
+            bool: 接続を閉じた場合True
+        """
+        with self.lock:
+            if not self.active or self.connection is None:
+                return False
+            try:
+                self.close_connection(self.connection)
+            except Exception as e:
+                logger.error(f"Error while aborting timed out connection: {e}")
+            return True
+
+
 class NetworkDeviceExecutor:
     """ネットワークデバイスコマンド実行クラス"""
 
@@ -30,6 +256,28 @@ class NetworkDeviceExecutor:
         'command': 60,    # コマンド実行タイムアウト
         'scenario': 180   # シナリオ全体のタイムアウト
     }
+
+    # セッション開始時に一度だけ送るコマンド（ページング無効化など）
+    # device_type ごとに定義し、devices.yaml の session_preamble で上書き可能
+    SESSION_PREAMBLES = {
+        'cisco_ios': ['terminal length 0', 'terminal width 511'],
+        'cisco_asa': ['terminal pager 0'],
+        'cisco_nxos': ['terminal length 0', 'terminal width 511'],
+        'juniper_junos': ['set cli screen-length 0', 'set cli screen-width 0']
+    }
+
+    # SSHセッションモード
+    #   exec:  コマンドごとにexec_commandでチャネルを開く（従来動作）
+    #   shell: invoke_shellの1チャネルを使い回し、プロンプト検出で読み取る
+    SESSION_MODES = ['exec', 'shell']
+
+    SHELL_READ_SIZE = 65535       # シェルチャネルの1回あたりの読み取りサイズ
+    SHELL_WIDTH = 511             # 出力の折り返しを防ぐ端末幅
+    DEFAULT_PIPELINE_DEPTH = 8    # パイプライン送信する最大コマンド数
+    CAPTURE_CHUNK_SIZE = 32768    # exec_command出力の1回あたりの読み取りサイズ
+    DEFAULT_MAX_CHANNELS = 1      # 1トランスポート上の同時チャネル数（1は並列実行なし）
+    PROBE_COMMAND = 'show clock'  # 接続テストで送信するコマンド（devices.yaml の probe_command で変更可能）
+    DEFAULT_COMMAND_MEMO = False  # セッション内で同じshowコマンドの出力を再利用するか
     
     def __init__(self, device_config: Dict[str, Any]):
         """
@@ -44,37 +292,137 @@ class NetworkDeviceExecutor:
         if 'timeouts' in device_config:
             self.timeouts.update(device_config['timeouts'])
         self.connection = None
+        self.session = None
         self.lock = threading.Lock()
         
+        # デッドライン管理（接続/コマンドは _io_deadline、シナリオは _scenario_deadline）
+        self.timeout_manager = get_timeout_manager()
+        self._io_deadline = None
+        self._scenario_deadline = None
+        # 現在の接続/コマンドデッドラインのクローズ対象
+        self._io_target = None
+        # 実行履歴に基づく適応タイムアウト
+        self.timeout_model = get_adaptive_timeout_model()
+        # セッション内のshowコマンド出力のメモ（正規化したコマンド -> 実行結果）
+        # セッションを保持している間だけ有効で、返却・切断時と他の実行が設定を変更した時に破棄する
+        self._command_memo: Dict[str, Dict[str, Any]] = {}
+        self._memo_generation = 0
+        # プロセス内で共有するshowコマンドの結果キャッシュ
+        self.result_cache = get_result_cache()
+        # 実行結果をキャッシュへ保存するか（max_age を指定した実行では有効にする）
+        self.store_results = self.result_cache.enabled
+        
         # ログ管理インスタンスの取得
         self.log_manager = get_log_manager()
         
+        # 接続プールの取得
+        self.pool = get_connection_pool()
+        self.pool_key = ConnectionPool.make_key(device_config)
+        
+        # 接続ガバナー（グループ・サイト・全体の同時セッション数とログインレート）
+        self.governor = get_connection_governor()
+        self._governor_ticket = None
+        
+        # 到達不能デバイスのサーキットブレーカー
+        self.health_cache = get_host_health_cache()
+        self.health_key = HostHealthCache.make_key(device_config)
+        # 直近の接続失敗の種別 ('connection', 'authentication' または 'circuit_open')
+        self.connect_error_type = 'connection'
+        # 直近の接続確立で発生した例外（到達性の失敗かの判定に使う）
+        self._connect_error = None
+        
         # デバイス設定のバリデーション
         if not self.validate_device_config():
             raise ValueError("Invalid device configuration")
         
-    def connect(self) -> bool:
+    def connect(self, bypass_circuit: bool = False) -> bool:
         """
         デバイスに接続
         
+        Args:
+            bypass_circuit: Trueの場合、遮断中のホストにも接続を試みる（接続テスト用）
+        
         Returns:
             bool: 接続成功時True、失敗時False
         """
+        self.connect_error_type = 'connection'
+        self._connect_error = None
         try:
+            # 到達不能として遮断中のホストは即座に失敗させる
+            if not bypass_circuit:
+                retry_after = self.health_cache.check(self.health_key)
+                if retry_after is not None:
+                    self.connect_error_type = 'circuit_open'
+                    logger.warning(f"Circuit open for {self.health_key[0]}, retry in {retry_after:.0f} seconds")
+                    return False
+            
+            # プール内の生存セッションを再利用
+            session = self.pool.acquire(self.pool_key)
+            
+            # ガバナーでセッション枠を取得（新規ログインはレート制限の対象）
+            self._governor_ticket = self.governor.acquire(
+                self.device_config,
+                new_login=session is None,
+                timeout=self._io_timeout(self.timeouts['connect'])
+            )
+            if self._governor_ticket is None:
+                if session:
+                    self.pool.release(session)
+                self.health_cache.cancel_probe(self.health_key)
+                return False
+            
+            if session:
+                self.session = session
+                self.connection = session.connection
+                self._bind_io_target(self.connection)
+                self.health_cache.record_success(self.health_key)
+                logger.debug(f"Reusing pooled session for {self.pool_key[0]}")
+                return True
+            
             connection_type = self.device_config.get('connection_type', 'ssh').lower()
             
             if connection_type == 'ssh':
-                return self._connect_ssh()
+                connected = self._connect_ssh()
             elif connection_type == 'telnet':
-                return self._connect_telnet()
+                connected = self._connect_telnet()
             else:
                 logger.error(f"Unsupported connection type: {connection_type}")
-                return False
+                connected = False
+            
+            # 新規セッションをプールに登録
+            if connected:
+                self.health_cache.record_success(self.health_key)
+                self.session = self.pool.register(
+                    self.pool_key, self.connection, self._close_connection
+                )
+            else:
+                self._record_connect_failure(self._connect_error)
+                self._release_governor_ticket()
+            return connected
                 
         except Exception as e:
             logger.error(f"Connection error for {self.device_config.get('hostname', self.device_config.get('host', 'unknown'))}: {e}")
+            self._record_connect_failure(e)
+            self._release_governor_ticket()
             return False
     
+    def _record_connect_failure(self, error: Optional[BaseException]):
+        """
+        接続失敗をサーキットブレーカーへ記録
+        
+        タイムアウト・接続拒否などの到達性の失敗だけを記録し、認証失敗など
+        ホストに到達できている失敗では試行権を返すだけにする。
+        
+        Args:
+            error: 接続時に発生した例外（例外なしで失敗した場合None）
+        """
+        timed_out = self._io_deadline is not None and self._io_deadline.expired()
+        if timed_out or is_transport_error(error):
+            self.health_cache.record_failure(self.health_key, str(error or 'Connection timed out'))
+            return
+        self.connect_error_type = 'authentication'
+        self.health_cache.cancel_probe(self.health_key)
+    
     def _connect_ssh(self) -> bool:
         """SSH接続を確立"""
         try:
@@ -86,12 +434,16 @@ class NetworkDeviceExecutor:
             username = self.device_config['username']
             password = self.device_config.get('password', '')
             
-            # 接続
+            # 接続（ソケット・バナー・認証の各待ちに接続デッドラインの残り時間を適用）
+            connect_timeout = self._io_timeout(self.device_config.get('timeout', self.timeouts['connect']))
+            self._bind_io_target(client)
             client.connect(
                 hostname=host,
                 username=username,
                 password=password,
-                timeout=self.device_config.get('timeout', 30),
+                timeout=connect_timeout,
+                banner_timeout=connect_timeout,
+                auth_timeout=connect_timeout,
                 port=self.device_config.get('port', 22)
             )
             
@@ -115,68 +467,29 @@ class NetworkDeviceExecutor:
             
         except Exception as e:
             logger.error(f"SSH connection failed to {host}: {e}")
+            self._connect_error = e
             return False
     
     def _connect_telnet(self) -> bool:
-        """Telnet接続を確立"""
+        """Telnet接続を確立（共有イベントループ上で実行）"""
+        host = self.device_config.get('host', 'unknown')
         try:
-            host = self.device_config['host']
-            username = self.device_config['username']
-            password = self.device_config.get('password', '')
-            
-            # Telnet接続（telnetlib3を使用）
-            import asyncio
-            
-            async def _connect_async():
-                tn = await telnetlib3.open_connection(
-                    host, self.device_config.get('port', 23), 
-                    encoding='ascii'
-                )
-                
-                # ログインプロンプト待ち
-                output = await tn.read_until(b"login:")
-                if b"login:" not in output:
-                    logger.error(f"Login prompt not found on {host}")
-                    tn.close()
-                    return False
-                
-                # ユーザー名送信
-                await tn.write(username.encode('ascii') + b"\n")
-                
-                # パスワードプロンプト待ち
-                output = await tn.read_until(b"Password:")
-                if b"Password:" not in output:
-                    logger.error(f"Password prompt not found on {host}")
-                    tn.close()
-                    return False
-                
-                # パスワード送信
-                await tn.write(password.encode('ascii') + b"\n")
-                
-                # プロンプト待ち
-                wait_string = self.device_config.get('wait_string', '#')
-                output = await tn.read_until(wait_string.encode('ascii'))
-                
-                return tn
-            
-            # 同期処理として実行
-            try:
-                loop = asyncio.get_running_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-            tn = loop.run_until_complete(_connect_async())
+            # 共有ループへ投入し、同期的に結果を待つ
+            tn = get_telnet_event_loop().run(
+                open_telnet_connection(self.device_config),
+                timeout=self._io_timeout(self.timeouts['connect'])
+            )
+            if tn is None:
+                return False
             
             self.connection = tn
+            self._bind_io_target(tn)
             logger.info(f"Telnet connection established to {host}")
             return True
             
         except Exception as e:
             logger.error(f"Telnet connection failed to {host}: {e}")
-            if 'tn' in locals():
-                async def _cleanup():
-                    await tn.close()
-                loop = asyncio.get_event_loop()
-                loop.run_until_complete(_cleanup())
+            self._connect_error = e
             return False
     
 
@@ -199,70 +512,97 @@ class NetworkDeviceExecutor:
             'command_results': [],
             'timeout_occurred': False
         }
+        # タイムアウトや例外後のセッションは状態不明のためプールへ戻さない
+        session_reusable = True
 
         try:
-            # 接続の確立（タイムアウト付き）
+            # 接続の確立（接続デッドライン付き）
             if not self.connection:
-                with ThreadPoolExecutor(max_workers=1) as executor:
-                    future = executor.submit(self.connect)
-                    if not future.result(timeout=self.timeouts['connect']):
-                        return {
-                            'success': False,
-                            'error': 'Connection failed',
-                            'error_type': 'connection',
-                            'output': '',
-                            'error_output': ''
-                        }
+                with self._deadline('connect', self.timeouts['connect']) as deadline:
+                    connected = self.connect()
+                if not connected or deadline.fired:
+                    session_reusable = not deadline.fired
+                    circuit_open = self.connect_error_type == 'circuit_open'
+                    return {
+                        'success': False,
+                        'error': 'Device unreachable (circuit open)' if circuit_open else 'Connection failed',
+                        'error_type': 'timeout' if deadline.fired else self.connect_error_type,
+                        'output': '',
+                        'error_output': ''
+                    }
 
             connection_type = self.device_config.get('connection_type', 'ssh').lower()
             device_name = self.device_config.get('hostname', self.device_config.get('host', 'unknown'))
             
-            for command in commands:
-                with ThreadPoolExecutor(max_workers=1) as executor:
-                    future = executor.submit(
-                        self._execute_single_command, 
-                        command, 
-                        connection_type
+            # セッション初回のみプリアンブルを送信
+            self._apply_session_preamble(connection_type)
+            
+            for batch_mode, batch in self._plan_command_batches(commands):
+                # メモ化済みのshowコマンドは実行せずに結果を再利用する
+                if batch_mode == 'memo':
+                    memo_result = self._memo_result(batch[0])
+                    if memo_result is not None:
+                        result['command_results'].append(memo_result)
+                        continue
+                    batch_mode = 'single'
+                
+                # パイプライン対象のshowコマンドはまとめて送信し、
+                # 並列対象の参照系コマンドは複数チャネルで同時に実行する
+                batch_timeouts = [
+                    self.timeout_model.device_command_timeout(
+                        self.device_config, command, self.timeouts['command']
                     )
-                    try:
-                        command_result = future.result(timeout=self.timeouts['command'])
-                        result['command_results'].append(command_result)
-                        
-                        if command_result['success']:
-                            result['output'] += command_result['output'] + "\n"
-                        else:
-                            result['success'] = False
-                            result['error_output'] += command_result['error_output'] + "\n"
-                        
-                            # コマンド実行結果をログに記録
-                            self.log_manager.log_command_execution(
-                                device_name, 
-                                command, 
-                                command_result
-                            )
-                            
-                    except TimeoutError:
-                        timeout_result = {
-                            'command': command,
-                            'success': False,
-                            'output': '',
-                            'error_output': f"Command timed out after {self.timeouts['command']} seconds",
-                            'error_type': 'timeout',
-                            'execution_time': self.timeouts['command']
-                        }
-                        result['command_results'].append(timeout_result)
-                        result['success'] = False
-                        result['error_output'] += timeout_result['error_output'] + "\n"
-                        result['timeout_occurred'] = True
-                        self.log_manager.log_command_execution(
-                            device_name,
-                            command,
-                            timeout_result
+                    for command in batch
+                ]
+                if batch_mode == 'parallel':
+                    waves = math.ceil(len(batch) / self._max_channels())
+                    batch_timeout = max(batch_timeouts) * waves
+                else:
+                    batch_timeout = sum(batch_timeouts)
+                with self._deadline('command', batch_timeout) as deadline:
+                    if batch_mode == 'pipeline':
+                        batch_results = self._execute_pipelined_commands(batch)
+                    elif batch_mode == 'parallel':
+                        batch_results = self._execute_parallel_commands(batch)
+                    else:
+                        batch_results = [
+                            self._execute_single_command(batch[0], connection_type)
+                        ]
+                
+                if not deadline.fired:
+                    for command_result in batch_results:
+                        self._collect_command_result(
+                            result, command_result, device_name
                         )
+                    continue
+                
+                # デッドライン超過: トランスポートは監視スレッドが閉じている
+                for command in batch:
+                    self.timeout_model.record_timeout(device_name, command)
+                    timeout_result = {
+                        'command': command,
+                        'success': False,
+                        'output': '',
+                        'error_output': f"Command timed out after {deadline.seconds:g} seconds",
+                        'error_type': 'timeout',
+                        'execution_time': deadline.seconds
+                    }
+                    result['command_results'].append(timeout_result)
+                    result['success'] = False
+                    result['error_output'] += timeout_result['error_output'] + "\n"
+                    self.log_manager.log_command_execution(
+                        device_name,
+                        command,
+                        timeout_result
+                    )
+                result['timeout_occurred'] = True
+                session_reusable = False
+                break
                         
         except Exception as e:
             error_msg = f"Command execution error: {e}"
             logger.error(error_msg)
+            session_reusable = False
             result.update({
                 'success': False,
                 'error_output': error_msg + "\n",
@@ -271,10 +611,136 @@ class NetworkDeviceExecutor:
             result['error_output'] += error_msg + "\n"
             
         finally:
-            self.disconnect()
+            # 出力は最後に一度だけ連結する（大きな出力はファイルハンドルのみ保持）
+            command_results = result['command_results']
+            result['output'] = ''.join(
+                r['output'] + "\n" for r in command_results if r['success']
+            )
+            result['output_files'] = [
+                r['output_file'] for r in command_results if r.get('output_file')
+            ]
+            # シナリオのデッドラインで接続が閉じられた場合も再利用しない
+            if self._scenario_deadline and self._scenario_deadline.fired:
+                session_reusable = False
+            # セッションはプールへ返却し、次のコマンドグループで再利用する
+            if session_reusable:
+                self.release()
+            else:
+                self.disconnect()
             
         return result
     
+    @classmethod
+    def get_session_preamble(cls, device_config: Dict[str, Any]) -> List[str]:
+        """
+        デバイスのセッションプリアンブルを取得
+        
+        Args:
+            device_config: デバイス設定辞書
+            
+        Returns:
+            List[str]: プリアンブルコマンド
+        """
+        if 'session_preamble' in device_config:
+            return list(device_config['session_preamble'] or [])
+        return list(cls.SESSION_PREAMBLES.get(device_config.get('device_type'), []))
+    
+    def _apply_session_preamble(self, connection_type: str):
+        """
+        セッションにプリアンブルを適用（セッションごとに一度だけ）
+        
+        適用済みフラグはプールのセッション属性に保持する。exec_commandは
+        コマンドごとにPTYなしのチャネルを開くためページングされず、送信不要。
+        """
+        if not self.session or self.session.attributes.get('preamble_applied'):
+            return
+        
+        if connection_type == 'ssh':
+            # シェルモードではチャネルを開くときに _get_shell_channel が送信する
+            if self._use_shell_session():
+                with self._deadline('command', self.timeouts['command']) as deadline:
+                    self._get_shell_channel()
+                if deadline.fired:
+                    raise TimeoutError("Session preamble timed out")
+            self.session.attributes['preamble_applied'] = True
+            return
+        
+        for command in self.get_session_preamble(self.device_config):
+            with self._deadline('command', self.timeouts['command']) as deadline:
+                command_result = self._execute_single_command(command, connection_type)
+            if deadline.fired:
+                raise TimeoutError(f"Session preamble timed out: {command}")
+            if not command_result['success'] or command_result.get('error_output'):
+                logger.warning(f"Session preamble command failed: {command}")
+        
+        self.session.attributes['preamble_applied'] = True
+    
+    @contextmanager
+    def _deadline(self, kind: str, seconds: float):
+        """
+        接続/コマンドのデッドラインを適用
+        
+        シナリオ実行中はシナリオの残り時間を上限とする。期限切れ時は
+        監視スレッドがトランスポートを閉じ、ブロック中のI/Oを解放する。
+        閉じるのは登録時点の接続（接続デッドラインでは範囲内で確立した接続）だけで、
+        範囲を抜けた後に遅れて発火しても後続の別の接続は閉じない。
+        """
+        if self._scenario_deadline:
+            seconds = min(seconds, self._scenario_deadline.remaining())
+        target = DeadlineTarget(self.connection, self._close_connection)
+        with self.timeout_manager.deadline(kind, seconds, target.abort) as deadline:
+            self._io_deadline = deadline
+            self._io_target = target
+            try:
+                yield deadline
+            finally:
+                self._io_deadline = None
+                self._io_target = None
+                target.release()
+    
+    def _io_timeout(self, default: float) -> float:
+        """ソケット/チャネルに設定するタイムアウト（現在のデッドラインの残り時間）"""
+        if self._io_deadline:
+            return max(0.001, self._io_deadline.remaining())
+        return default
+    
+    def _device_name(self) -> str:
+        """ログ・履歴で使うデバイス名"""
+        return self.device_config.get('hostname', self.device_config.get('host', 'unknown'))
+    
+    def _bind_io_target(self, connection: Any):
+        """確立中の接続を現在の接続デッドラインのクローズ対象にする"""
+        if self._io_target:
+            self._io_target.bind(connection)
+    
+    def _collect_command_result(self, result: Dict[str, Any],
+                                command_result: Dict[str, Any],
+                                device_name: str):
+        """
+        コマンド単位の結果を実行結果へ集約
+        
+        Args:
+            result: execute_commandsの実行結果
+            command_result: 単一コマンドの実行結果
+            device_name: デバイス名
+        """
+        result['command_results'].append(command_result)
+        
+        if not command_result['success']:
+            result['success'] = False
+            result['error_output'] += command_result['error_output'] + "\n"
+        else:
+            self.timeout_model.record_success(device_name, command_result['command'])
+        self._update_command_memo(command_result)
+        self._update_result_cache(command_result)
+        
+        # コマンド実行結果をログに記録（成功時の実行時間は適応タイムアウトの履歴になる）
+        self.log_manager.log_command_execution(
+            device_name, 
+            command_result['command'], 
+            command_result
+        )
+    
     def _execute_single_command(self, command: str, connection_type: str) -> Dict[str, Any]:
         """
         単一のコマンドを実行
@@ -297,7 +763,9 @@ class NetworkDeviceExecutor:
         start_time = time.time()
         
         try:
-            if connection_type == 'ssh':
+            if connection_type == 'ssh' and self._use_shell_session():
+                command_result = self._execute_shell_commands([command])[0]
+            elif connection_type == 'ssh':
                 command_result = self._execute_ssh_command(command)
             elif connection_type == 'telnet':
                 command_result = self._execute_telnet_command(command)
@@ -318,22 +786,26 @@ class NetworkDeviceExecutor:
     def _execute_ssh_command(self, command: str) -> Dict[str, Any]:
         """SSHでコマンドを実行"""
         try:
-            stdin, stdout, stderr = self.connection.exec_command(command)
+            stdin, stdout, stderr = self.connection.exec_command(
+                command, timeout=self._io_timeout(self.timeouts['command'])
+            )
             
-            # 出力を読み取る
-            output = stdout.read().decode('utf-8', errors='ignore')
+            # 出力をチャンク単位で読み取る（閾値を超えたら一時ファイルへ退避）
+            capture = self._new_output_buffer()
+            try:
+                while True:
+                    chunk = stdout.read(self.CAPTURE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    capture.write(chunk)
+            finally:
+                capture.close()
             error_output = stderr.read().decode('utf-8', errors='ignore')
             
-            # プロンプトを待つ
-            wait_string = self.device_config.get('wait_string', '#')
-            if wait_string:
-                # プロンプト待ちの実装（必要に応じて）
-                pass
-            
-            return {
-                'output': output,
-                'error_output': error_output
-            }
+            # exec_commandはチャネルのEOFで完了するためプロンプト待ちは不要
+            command_result = capture.to_result()
+            command_result['error_output'] = error_output
+            return command_result
             
         except Exception as e:
             return {
@@ -341,32 +813,394 @@ class NetworkDeviceExecutor:
                 'error_output': str(e)
             }
     
-    def _execute_telnet_command(self, command: str) -> Dict[str, Any]:
-        """Telnetでコマンドを実行"""
-        try:
-            # コマンド送信
-            import asyncio
+    def _new_output_buffer(self) -> OutputBuffer:
+        """デバイス設定の退避閾値で出力バッファを作成"""
+        host = self.device_config.get('host', 'unknown')
+        return OutputBuffer(
+            spill_threshold=int(self.device_config.get('output_spill_threshold', DEFAULT_SPILL_THRESHOLD)),
+            prefix=f"{host}_"
+        )
+    
+    def _use_shell_session(self) -> bool:
+        """SSHでinvoke_shellセッションを使うか判定"""
+        connection_type = self.device_config.get('connection_type', 'ssh').lower()
+        session_mode = self.device_config.get('session_mode', 'exec').lower()
+        return connection_type == 'ssh' and session_mode == 'shell'
+    
+    @staticmethod
+    def _is_show_command(command: str) -> bool:
+        """パイプライン送信可能なshowコマンドか判定"""
+        return command.strip().lower().startswith('show ')
+    
+    def _max_channels(self) -> int:
+        """デバイスの同時チャネル数の上限"""
+        return max(1, int(self.device_config.get('max_channels', self.DEFAULT_MAX_CHANNELS)))
+    
+    def _use_parallel_channels(self) -> bool:
+        """参照系コマンドを複数チャネルで並列実行するか判定"""
+        connection_type = self.device_config.get('connection_type', 'ssh').lower()
+        return (
+            connection_type == 'ssh'
+            and not self._use_shell_session()
+            and self._max_channels() > 1
+        )
+    
+    def _use_command_memo(self) -> bool:
+        """セッション内でshowコマンドの出力を再利用するか判定"""
+        return bool(self.device_config.get('command_memo', self.DEFAULT_COMMAND_MEMO))
+    
+    def _mark_memo_hits(self, commands: List[str]) -> List[Tuple[str, bool]]:
+        """
+        メモの出力を再利用できるコマンドに印を付ける
+        
+        先行するコマンドの実行でメモに載るものも含めて判定し、
+        参照系以外のコマンド（設定変更など）より後ろは再利用しない。
+        
+        Args:
+            commands: 実行するコマンドリスト
             
-            async def _execute_command_async():
-                # コマンド送信
-                await self.connection.write(command.encode('ascii') + b"\n")
-                
-                # 出力待ち
-                wait_string = self.device_config.get('wait_string', '#')
-                output = await self.connection.read_until(wait_string.encode('ascii'))
-                output = output.decode('utf-8', errors='ignore')
-                
-                # プロンプトを除去
-                if wait_string and output.endswith(wait_string):
-                    output = output[:-len(wait_string)].strip()
-                
-                return output
+        Returns:
+            List[Tuple[str, bool]]: (コマンド, 再利用するか) のリスト
+        """
+        if not self._use_command_memo():
+            return [(command, False) for command in commands]
+        
+        self._expire_stale_memo()
+        memoized = set(self._command_memo)
+        marked = []
+        for command in commands:
+            key = normalize_command(command)
+            if not is_read_only(command):
+                memoized.clear()
+                marked.append((command, False))
+            elif is_memoizable(command) and key in memoized:
+                marked.append((command, True))
+            else:
+                if is_memoizable(command):
+                    memoized.add(key)
+                marked.append((command, False))
+        return marked
+    
+    def _memo_result(self, command: str) -> Optional[Dict[str, Any]]:
+        """
+        メモからコマンドの実行結果を取得
+        
+        Args:
+            command: コマンド
+            
+        Returns:
+            Dict: memo_hit を付けた実行結果のコピー（メモにない場合None）
+        """
+        self._expire_stale_memo()
+        memoized = self._command_memo.get(normalize_command(command))
+        if memoized is None:
+            return None
+        memo_result = dict(memoized)
+        memo_result.update({
+            'command': command,
+            'execution_time': 0.0,
+            'memo_hit': True
+        })
+        logger.debug(f"Reusing memoized output: {self._device_name()} > {command}")
+        return memo_result
+    
+    def _update_command_memo(self, command_result: Dict[str, Any]):
+        """
+        実行結果でメモを更新（参照系以外のコマンドはメモを破棄する）
+        
+        Args:
+            command_result: 単一コマンドの実行結果
+        """
+        command = command_result['command']
+        if not is_read_only(command):
+            self._command_memo.clear()
+        elif command_result['success'] and is_memoizable(command) and self._use_command_memo():
+            if not self._command_memo:
+                self._memo_generation = self.result_cache.device_generation(self.pool_key)
+            self._command_memo[normalize_command(command)] = command_result
+    
+    def _expire_stale_memo(self):
+        """他の実行がデバイスの設定を変更していればメモを破棄"""
+        if self._command_memo and \
+                self.result_cache.device_generation(self.pool_key) != self._memo_generation:
+            self._command_memo.clear()
+    
+    def _update_result_cache(self, command_result: Dict[str, Any]):
+        """
+        実行結果を結果キャッシュへ反映（参照系以外のコマンドはデバイスのキャッシュを破棄する）
+        
+        保存はキャッシュが有効な場合か max_age を指定した実行の場合だけ行う。
+        
+        Args:
+            command_result: 単一コマンドの実行結果
+        """
+        command = command_result['command']
+        if not is_read_only(command):
+            self.result_cache.invalidate_device(self.pool_key)
+        elif self.store_results:
+            self.result_cache.put(self.pool_key, command, command_result)
+    
+    def _plan_command_batches(self, commands: List[str]) -> List[Tuple[str, List[str]]]:
+        """
+        コマンドを送信単位のバッチに分割（メモの出力を再利用するコマンドは 'memo'）
+        
+        Args:
+            commands: 実行するコマンドリスト
             
-            # 同期処理として実行
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            output = loop.run_until_complete(_execute_command_async())
-            loop.close()
+        Returns:
+            List[Tuple[str, List[str]]]: (実行方式, コマンドリスト) のリスト。
+                実行方式は 'memo', 'single', 'pipeline', 'parallel' のいずれか
+        """
+        batches = []
+        segment = []
+        for command, memo_hit in self._mark_memo_hits(commands):
+            if not memo_hit:
+                segment.append(command)
+                continue
+            batches.extend(self._plan_execution_batches(segment))
+            batches.append(('memo', [command]))
+            segment = []
+        batches.extend(self._plan_execution_batches(segment))
+        return batches
+    
+    def _plan_execution_batches(self, commands: List[str]) -> List[Tuple[str, List[str]]]:
+        """
+        コマンドを送信単位のバッチに分割
+        
+        シェルモードで pipeline が有効な場合、連続するshowコマンドを
+        pipeline_depth 件までまとめる（プロンプト行とエコーを区別するため
+        prompt の設定が必要）。execモードで max_channels が2以上の場合、
+        設定モード外の連続する参照系コマンドを並列実行のバッチにまとめる。
+        それ以外は1コマンド1バッチ。
+        
+        Args:
+            commands: 実行するコマンドリスト
+            
+        Returns:
+            List[Tuple[str, List[str]]]: (実行方式, コマンドリスト) のリスト。
+                実行方式は 'single', 'pipeline', 'parallel' のいずれか
+        """
+        if self._use_parallel_channels():
+            batches = []
+            for read_only, run in split_read_only_runs(commands):
+                if read_only and len(run) > 1:
+                    batches.append(('parallel', run))
+                else:
+                    batches.extend(('single', [command]) for command in run)
+            return batches
+        
+        pipeline_enabled = (
+            self._use_shell_session()
+            and self.device_config.get('pipeline', False)
+            and self.device_config.get('prompt')
+        )
+        if not pipeline_enabled:
+            return [('single', [command]) for command in commands]
+        
+        depth = int(self.device_config.get('pipeline_depth', self.DEFAULT_PIPELINE_DEPTH))
+        batches = []
+        current = []
+        for command in commands:
+            if self._is_show_command(command) and len(current) < depth:
+                current.append(command)
+                continue
+            if current:
+                batches.append(current)
+                current = []
+            if self._is_show_command(command):
+                current.append(command)
+            else:
+                batches.append([command])
+        if current:
+            batches.append(current)
+        return [('pipeline' if len(batch) > 1 else 'single', batch) for batch in batches]
+    
+    def _execute_parallel_commands(self, commands: List[str]) -> List[Dict[str, Any]]:
+        """
+        参照系コマンドを同じトランスポート上の複数チャネルで並列実行
+        
+        呼び出し元のスレッドと共有プールの最大 max_channels - 1 個のワーカーが
+        残りのコマンドを順に取り出して実行する。プールが他のデバイスで埋まって
+        いる場合は呼び出し元のスレッドだけで順に実行する。
+        
+        Args:
+            commands: 実行する参照系コマンドリスト
+            
+        Returns:
+            List[Dict]: コマンドごとの実行結果（commands と同じ順序）
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(commands)
+        indexes = iter(range(len(commands)))
+        index_lock = threading.Lock()
+        
+        def _worker():
+            while True:
+                with index_lock:
+                    index = next(indexes, None)
+                if index is None:
+                    return
+                results[index] = self._execute_single_command(commands[index], 'ssh')
+        
+        helpers = min(self._max_channels(), len(commands)) - 1
+        futures = [channel_pool.submit(_worker) for _ in range(helpers)]
+        _worker()
+        for future in futures:
+            # 開始前のワーカーは取り消し、実行中のワーカーは完了を待つ
+            if not future.cancel():
+                future.result()
+        return results
+    
+    def _get_shell_channel(self):
+        """
+        セッションに紐づくシェルチャネルを取得（未作成なら開く）
+        
+        チャネルはプールのセッション属性に保持し、
+        コマンドグループやシナリオをまたいで使い回す。セッションの途中で
+        開き直した場合も、新しいチャネルにはその場でプリアンブルを送信する。
+        """
+        if not self.session:
+            raise RuntimeError("No active session")
+        
+        channel = self.session.attributes.get('shell_channel')
+        if channel is not None and not channel.closed:
+            return channel
+        
+        channel = self.connection.invoke_shell(width=self.SHELL_WIDTH)
+        channel.settimeout(self._io_timeout(self.timeouts['command']))
+        
+        # ログインバナーを読み捨てて最初のプロンプトを待つ
+        matcher = get_prompt_matcher(self.device_config, ('#', '>'))
+        prompt_line = self._read_shell_prompt(channel, matcher)
+        
+        # ユーザーモードの場合は特権モードへ昇格
+        secret = self.device_config.get('secret')
+        if secret and prompt_line.rstrip().endswith('>'):
+            channel.send('enable\n')
+            self._read_shell_until(channel, ('Password:',))
+            channel.send(secret + '\n')
+            prompt_line = self._read_shell_prompt(channel, matcher)
+            if not prompt_line.rstrip().endswith('#'):
+                raise RuntimeError("Failed to enter privileged mode")
+        
+        # prompt 未設定時は最初のプロンプトからホスト名を学習する
+        matcher = self.session.attributes['prompt_matcher'] = matcher.learn(prompt_line)
+        
+        # 新しいチャネルにプリアンブル（ページング無効化など）を送信
+        for command in self.get_session_preamble(self.device_config):
+            channel.send(command + '\n')
+            self._read_shell_prompt(channel, matcher)
+        self.session.attributes['preamble_applied'] = True
+        self.session.attributes['shell_channel'] = channel
+        return channel
+    
+    def _read_shell_prompt(self, channel, matcher: PromptMatcher) -> str:
+        """プロンプトを検出するまでシェル出力を読み取り、プロンプト行を返す"""
+        scanner = matcher.scanner()
+        while not scanner.segments:
+            data = channel.recv(self.SHELL_READ_SIZE)
+            if not data:
+                raise ConnectionError("Shell channel closed by device")
+            scanner.feed(data)
+        return scanner.last_prompt
+    
+    def _read_shell_until(self, channel, terminators: Tuple[str, ...]) -> str:
+        """指定文字列で終わるまでシェル出力を読み取る"""
+        text = ''
+        while not text.rstrip().endswith(terminators):
+            data = channel.recv(self.SHELL_READ_SIZE)
+            if not data:
+                raise ConnectionError("Shell channel closed by device")
+            text += data.decode('utf-8', errors='ignore')
+        return text
+    
+    def _prompt_matcher(self) -> PromptMatcher:
+        """セッションで学習済みのプロンプト判定を取得"""
+        if self.session and 'prompt_matcher' in self.session.attributes:
+            return self.session.attributes['prompt_matcher']
+        return get_prompt_matcher(self.device_config)
+    
+    def _execute_shell_commands(self, commands: List[str]) -> List[Dict[str, Any]]:
+        """
+        シェルチャネルへコマンドを送信し、プロンプト検出で結果を読み取る
+        
+        複数コマンドを渡した場合は読み取り前にまとめて送信する（パイプライン）。
+        
+        Args:
+            commands: 実行するコマンドリスト
+            
+        Returns:
+            List[Dict]: コマンドごとの output / error_output
+        """
+        channel = self._get_shell_channel()
+        channel.settimeout(self._io_timeout(self.timeouts['command'] * len(commands)))
+        channel.send(''.join(command + '\n' for command in commands))
+        
+        start_time = time.time()
+        elapsed = []
+        scanner = self._prompt_matcher().scanner()
+        segments = scanner.segments
+        try:
+            while len(segments) < len(commands):
+                data = channel.recv(self.SHELL_READ_SIZE)
+                if not data:
+                    raise ConnectionError("Shell channel closed by device")
+                if scanner.feed(data):
+                    while len(elapsed) < min(len(segments), len(commands)):
+                        elapsed.append(time.time() - start_time)
+        except Exception:
+            # 読み取り途中のチャネルは同期が崩れるため破棄する
+            self.session.attributes.pop('shell_channel', None)
+            channel.close()
+            raise
+        
+        results = []
+        previous = 0.0
+        for index, command in enumerate(commands):
+            lines = segments[index].split('\n')
+            # 先頭コマンドのエコー行を除去
+            if index == 0 and lines and lines[0].strip() == command.strip():
+                lines = lines[1:]
+            results.append({
+                'command': command,
+                'output': '\n'.join(lines).strip(),
+                'error_output': '',
+                'execution_time': elapsed[index] - previous
+            })
+            previous = elapsed[index]
+        return results
+    
+    def _execute_pipelined_commands(self, commands: List[str]) -> List[Dict[str, Any]]:
+        """
+        showコマンドをパイプライン送信して実行
+        
+        Args:
+            commands: 実行するshowコマンドリスト
+            
+        Returns:
+            List[Dict]: コマンドごとの実行結果
+        """
+        try:
+            results = self._execute_shell_commands(commands)
+            for command_result in results:
+                command_result['success'] = True
+            return results
+        except Exception as e:
+            return [{
+                'command': command,
+                'success': False,
+                'output': '',
+                'error_output': str(e),
+                'execution_time': 0
+            } for command in commands]
+    
+    def _execute_telnet_command(self, command: str) -> Dict[str, Any]:
+        """Telnetでコマンドを実行（共有イベントループ上で実行）"""
+        try:
+            wait_string = self.device_config.get('wait_string', '#')
+            output = get_telnet_event_loop().run(
+                execute_telnet_command_async(self.connection, command, wait_string),
+                timeout=self._io_timeout(self.timeouts['command'])
+            )
             
             return {
                 'output': output,
@@ -380,28 +1214,49 @@ class NetworkDeviceExecutor:
             }
     
     def disconnect(self):
-        """接続を切断"""
+        """接続を切断（プール上のセッションも破棄）"""
+        # セッションが変わるためメモも破棄する
+        self._command_memo.clear()
         try:
-            if self.connection:
-                if isinstance(self.connection, paramiko.SSHClient):
-                    self.connection.close()
-                elif hasattr(self.connection, 'close'):  # telnetlib3の場合
-                    import asyncio
-                    
-                    async def _disconnect_async():
-                        await self.connection.close()
-                    
-                    # 同期処理として実行
-                    loop = asyncio.get_event_loop()
-                    if loop.is_running():
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                    loop.run_until_complete(_disconnect_async())
-                    loop.close()
-                self.connection = None
-                logger.info("Connection closed")
+            if self.session:
+                self.pool.discard(self.session)
+            elif self.connection:
+                self._close_connection(self.connection)
+            else:
+                return
+            self.connection = None
+            self.session = None
+            logger.info("Connection closed")
         except Exception as e:
             logger.error(f"Error while disconnecting: {e}")
+        finally:
+            self._release_governor_ticket()
+    
+    def release(self):
+        """セッションを切断せずに接続プールへ返却"""
+        # 返却後は他の実行がセッションを使うためメモを破棄する
+        self._command_memo.clear()
+        if self.session:
+            self.pool.release(self.session)
+        elif self.connection:
+            self._close_connection(self.connection)
+        self.connection = None
+        self.session = None
+        self._release_governor_ticket()
+    
+    def _release_governor_ticket(self):
+        """ガバナーのセッション枠を返却"""
+        ticket, self._governor_ticket = self._governor_ticket, None
+        self.governor.release(ticket)
+    
+    @staticmethod
+    def _close_connection(connection):
+        """下位の接続オブジェクトを閉じる"""
+        if isinstance(connection, paramiko.SSHClient):
+            connection.close()
+        elif isinstance(connection, TelnetConnection):
+            # writerのクローズは共有ループスレッド上で行う
+            connection.close()
     
     def test_connection(self, timeout=30) -> Dict[str, Any]:
         """
@@ -423,12 +1278,19 @@ class NetworkDeviceExecutor:
         start_time = time.time()
         
         try:
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(self.connect)
-                result = future.result(timeout=timeout)
-                
-                test_result['success'] = result
-                test_result['message'] = 'Connection successful' if result else 'Connection failed'
+            # 接続テストは遮断中のホストにも接続を試みる（成功すればブレーカーを閉じる）
+            # プールのセッションを再利用した場合も実際にコマンドを送って応答を確認し、
+            # 応答がなければ破棄して新しい接続で確認し直す
+            with self._deadline('connect', timeout) as deadline:
+                result = self.connect(bypass_circuit=True) and self._probe_connection()
+                if not result and not deadline.fired:
+                    self.disconnect()
+                    result = self.connect(bypass_circuit=True) and self._probe_connection()
+            if deadline.fired:
+                raise TimeoutError()
+            
+            test_result['success'] = result
+            test_result['message'] = 'Connection successful' if result else 'Connection failed'
                 
         except TimeoutError:
             test_result['message'] = f"Connection timed out after {timeout} seconds"
@@ -439,10 +1301,29 @@ class NetworkDeviceExecutor:
             
         finally:
             test_result['connection_time'] = time.time() - start_time
-            self.disconnect()
+            # 応答を確認できたセッションはプールへ返却し、それ以外は破棄する
+            if test_result['success']:
+                self.release()
+            else:
+                self.disconnect()
             
         return test_result
     
+    def _probe_connection(self) -> bool:
+        """
+        接続中のセッションでプローブコマンドを実行して応答を確認
+        
+        Returns:
+            bool: コマンドが成功した場合True
+        """
+        command = self.device_config.get('probe_command', self.PROBE_COMMAND)
+        connection_type = self.device_config.get('connection_type', 'ssh').lower()
+        probe_result = self._execute_single_command(command, connection_type)
+        if not probe_result['success'] or probe_result.get('error_output'):
+            logger.warning(f"Connection probe failed for {self._device_name()}: {probe_result.get('error_output')}")
+            return False
+        return True
+    
     def execute_command_group(self, group_name: str, command_groups: Dict[str, Any]) -> Dict[str, Any]:
         """
         コマンドグループを実行
@@ -496,24 +1377,31 @@ class NetworkDeviceExecutor:
         scenario_result['total_commands'] = len(commands)
         
         start_time = time.time()
+        scenario_timeout = self.timeout_model.device_scenario_timeout(
+            self.device_config, commands, command_groups, self.timeouts['scenario']
+        )
         
         try:
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(self._execute_scenario_commands, commands, command_groups)
-                results = future.result(timeout=self.timeouts['scenario'])
-                
-                scenario_result['results'] = results
-                scenario_result['success'] = all(r.get('success', False) for r in results)
-                scenario_result['output'] = '\n'.join(r.get('output', '') for r in results)
-                scenario_result['error_output'] = '\n'.join(r.get('error_output', '') for r in results)
-                scenario_result['successful_commands'] = sum(1 for r in results if r.get('success', False))
-                scenario_result['failed_commands'] = sum(1 for r in results if not r.get('success', False))
-                scenario_result['timeout_occurred'] = any(r.get('timeout_occurred', False) for r in results)
+            # シナリオ全体のデッドライン（各コマンドの上限にもなる）
+            # I/Oは残り時間を上限とする接続/コマンドデッドラインが打ち切るため、ここでは接続を閉じない
+            with self.timeout_manager.deadline('scenario', scenario_timeout) as deadline:
+                self._scenario_deadline = deadline
+                results = self._execute_scenario_commands(commands, command_groups)
+            if deadline.fired:
+                raise TimeoutError()
+            
+            scenario_result['results'] = results
+            scenario_result['success'] = all(r.get('success', False) for r in results)
+            scenario_result['output'] = '\n'.join(r.get('output', '') for r in results)
+            scenario_result['error_output'] = '\n'.join(r.get('error_output', '') for r in results)
+            scenario_result['successful_commands'] = sum(1 for r in results if r.get('success', False))
+            scenario_result['failed_commands'] = sum(1 for r in results if not r.get('success', False))
+            scenario_result['timeout_occurred'] = any(r.get('timeout_occurred', False) for r in results)
                 
         except TimeoutError:
             scenario_result.update({
                 'success': False,
-                'error_output': f"Scenario timed out after {self.timeouts['scenario']} seconds",
+                'error_output': f"Scenario timed out after {scenario_timeout:g} seconds",
                 'timeout_occurred': True,
                 'error_type': 'scenario_timeout'
             })
@@ -524,6 +1412,7 @@ class NetworkDeviceExecutor:
                 'error_type': 'exception'
             })
         finally:
+            self._scenario_deadline = None
             scenario_result['total_time'] = time.time() - start_time
             self.log_manager.log_scenario_execution(
                 device_name,
@@ -536,14 +1425,80 @@ class NetworkDeviceExecutor:
     def _execute_scenario_commands(self, commands: List[str], command_groups: Dict[str, Any]) -> List[Dict[str, Any]]:
         """シナリオ内のコマンドを実行（内部メソッド）"""
         results = []
-        for command_item in commands:
+        index = 0
+        while index < len(commands):
+            # シナリオのデッドライン超過後は残りを実行しない
+            if self._scenario_deadline and self._scenario_deadline.expired:
+                break
+            command_item = commands[index]
             if isinstance(command_item, str) and command_item in command_groups:
-                result = self.execute_command_group(command_item, command_groups)
+                results.append(self.execute_command_group(command_item, command_groups))
+                index += 1
+                continue
+            
+            # 並列実行時は連続する参照系の単独コマンドをまとめて実行する
+            items = [command_item]
+            if self._use_parallel_channels():
+                for read_only, run in split_read_only_runs(self._plain_commands(commands[index:], command_groups)):
+                    if read_only:
+                        items = run
+                    break
+            
+            if len(items) > 1:
+                results.extend(self._split_commands_result(self.execute_commands(items), items))
             else:
-                result = self.execute_commands([command_item])
-            results.append(result)
+                results.append(self.execute_commands([command_item]))
+            index += len(items)
         return results
     
+    @staticmethod
+    def _plain_commands(command_items: List[Any], command_groups: Dict[str, Any]) -> List[str]:
+        """コマンドグループ以外の先頭から連続するコマンドを取得"""
+        plain = []
+        for command_item in command_items:
+            if not isinstance(command_item, str) or command_item in command_groups:
+                break
+            plain.append(command_item)
+        return plain
+    
+    @staticmethod
+    def _split_commands_result(result: Dict[str, Any], commands: List[str]) -> List[Dict[str, Any]]:
+        """
+        まとめて実行した結果をコマンドごとの実行結果に分割
+        
+        Args:
+            result: execute_commandsの実行結果
+            commands: 実行したコマンドリスト
+            
+        Returns:
+            List[Dict]: コマンドごとの実行結果（execute_commandsと同形式）
+        """
+        command_results = result.get('command_results', [])
+        split_results = []
+        for index, command in enumerate(commands):
+            if index >= len(command_results):
+                # 接続失敗などで実行されなかったコマンド
+                not_executed = dict(result)
+                not_executed.update({
+                    'success': False,
+                    'output': '',
+                    'command_results': [],
+                    'output_files': []
+                })
+                split_results.append(not_executed)
+                continue
+            command_result = command_results[index]
+            success = command_result['success']
+            split_results.append({
+                'success': success,
+                'output': command_result['output'] + "\n" if success else '',
+                'error_output': '' if success else command_result['error_output'] + "\n",
+                'command_results': [command_result],
+                'timeout_occurred': command_result.get('error_type') == 'timeout',
+                'output_files': [command_result['output_file']] if command_result.get('output_file') else []
+            })
+        return split_results
+    
     def validate_device_config(self) -> Dict[str, Any]:
         """
         デバイス設定の詳細バリデーション
@@ -583,24 +1538,6 @@ class NetworkDeviceExecutor:
         validation_result['message'] = '; '.join(messages) if messages else 'Valid configuration'
         
         return validation_result
-        
-        Returns:
-            bool: 設定が有効な場合True
-        """
-        required_fields = ['host', 'device_type', 'username']
-        for field in required_fields:
-            if field not in self.device_config:
-                logger.error(f"Required field '{field}' is missing")
-                return False
-        
-        # device_typeの検証
-        valid_device_types = ['cisco_ios', 'cisco_asa']
-        device_type = self.device_config.get('device_type')
-        if device_type not in valid_device_types:
-            logger.error(f"Invalid device_type: {device_type}")
-            return False
-        
-        return True
 
 
 def execute_scenario_on_device(device_config: Dict[str, Any], command_groups: Dict[str, List[str]], 
@@ -617,6 +1554,36 @@ def execute_scenario_on_device(device_config: Dict[str, Any], command_groups: Di
         Dict: 実行結果
     """
     executor = NetworkDeviceExecutor(device_config)
+    return _run_scenario_with_executor(executor, command_groups, scenario_config)
+
+
+def execute_scenarios_on_device(device_config: Dict[str, Any], command_groups: Dict[str, List[str]],
+                                scenario_configs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    同じデバイスを対象とする複数のシナリオを宣言順に1セッションで実行
+    
+    ログインは最初のシナリオで1回だけ行い、以降のシナリオは
+    接続プールに返却した同じセッションを再利用する。
+    
+    Args:
+        device_config: デバイス設定
+        command_groups: コマンドグループ設定
+        scenario_configs: シナリオ設定のリスト
+        
+    Returns:
+        List[Dict]: scenario_configsと同じ順序の実行結果
+    """
+    executor = NetworkDeviceExecutor(device_config)
+    return [
+        _run_scenario_with_executor(executor, command_groups, scenario_config)
+        for scenario_config in scenario_configs
+    ]
+
+
+def _run_scenario_with_executor(executor: NetworkDeviceExecutor, command_groups: Dict[str, List[str]],
+                                scenario_config: Dict[str, Any]) -> Dict[str, Any]:
+    """シナリオを実行し、デバイス単位の実行結果にまとめる"""
+    device_config = executor.device_config
     
     # 実行結果
     result = {
@@ -629,38 +1596,43 @@ def execute_scenario_on_device(device_config: Dict[str, Any], command_groups: Di
         'successful_commands': 0,
         'failed_commands': 0,
         'command_results': [],
+        'total_time': 0.0,
         'error_message': ''
     }
     
     try:
-        # 実行するコマンドを収集
-        commands_to_execute = []
-        for command_group_name in scenario_config.get('commands', []):
-            if command_group_name in command_groups:
-                commands_to_execute.extend(command_groups[command_group_name])
-        
-        result['total_commands'] = len(commands_to_execute)
-        
-        if not commands_to_execute:
+        if not scenario_config.get('commands'):
             result['error_message'] = 'No commands to execute'
             return result
         
-        # コマンド実行
-        execution_result = executor.execute_commands(commands_to_execute)
+        # シナリオとして実行（デッドライン・実行時間の記録はexecute_scenarioが行う）
+        # 同じデバイス・同じシナリオ・同じコマンド列の実行中のシナリオがあれば合流して結果を共有する
+        scenario_result, coalesced = get_single_flight().run(
+            'scenario',
+            executor.pool_key,
+            flatten_commands(scenario_config['commands'], command_groups),
+            lambda: executor.execute_scenario(scenario_config, command_groups),
+            name=scenario_config.get('name')
+        )
+        if coalesced:
+            result['coalesced'] = True
         
         # 結果集計
-        result['success'] = execution_result['success']
+        result['success'] = scenario_result['success']
+        result['total_time'] = scenario_result.get('total_time', 0.0)
         result['end_time'] = datetime.now().isoformat()
         
-        for cmd_result in execution_result.get('command_results', []):
-            if cmd_result['success']:
-                result['successful_commands'] += 1
-            else:
-                result['failed_commands'] += 1
-            result['command_results'].append(cmd_result)
+        for execution_result in scenario_result.get('results', []):
+            for cmd_result in execution_result.get('command_results', []):
+                if cmd_result['success']:
+                    result['successful_commands'] += 1
+                else:
+                    result['failed_commands'] += 1
+                result['command_results'].append(cmd_result)
+        result['total_commands'] = len(result['command_results'])
             
-        if not execution_result['success']:
-            result['error_message'] = execution_result.get('error_output', 'Unknown error')
+        if not scenario_result['success']:
+            result['error_message'] = scenario_result.get('error_output') or 'Unknown error'
             
     except Exception as e:
         result['success'] = False
@@ -670,6 +1642,86 @@ def execute_scenario_on_device(device_config: Dict[str, Any], command_groups: Di
     return result
 
 
+def _execute_commands_for_cache(device_config: Dict[str, Any], commands: List[str],
+                                store_results: bool) -> Dict[str, Any]:
+    """キャッシュを参照した実行で残ったコマンドを実行（max_age 指定時は結果を保存する）"""
+    executor = NetworkDeviceExecutor(device_config)
+    executor.store_results = executor.store_results or store_results
+    return executor.execute_commands(commands)
+
+
+def execute_commands_cached(device_config: Dict[str, Any], commands: List[str],
+                            max_age: Optional[float] = None) -> Dict[str, Any]:
+    """
+    結果キャッシュを参照してコマンドを実行
+    
+    max_age を指定した場合、経過時間が max_age 以内（かつTTL以内）の
+    showコマンドの結果はデバイスへ送らずにキャッシュから返す。
+    参照系以外のコマンドを含む場合はキャッシュを参照しない。
+    同じコマンド列の実行中の処理があれば合流し（coalesced: true）、
+    設定変更系を含む実行はデバイスごとに直列化する。
+    
+    Args:
+        device_config: デバイス設定
+        commands: 実行するコマンドリスト
+        max_age: 許容するキャッシュの経過時間（秒、Noneでキャッシュを参照しない）
+        
+    Returns:
+        Dict: 実行結果（execute_commandsと同形式、キャッシュから返した結果は cache_hit: true）
+    """
+    cache = get_result_cache()
+    device_key = ConnectionPool.make_key(device_config)
+    
+    cached = {}
+    if max_age is not None and all(is_read_only(command) for command in commands):
+        for index, command in enumerate(commands):
+            if is_memoizable(command):
+                command_result = cache.get(device_key, command, max_age)
+                if command_result is not None:
+                    cached[index] = command_result
+    
+    misses = [command for index, command in enumerate(commands) if index not in cached]
+    if misses:
+        # 同じデバイス・同じコマンド列の実行中の処理があれば合流する
+        shared_result, coalesced = get_single_flight().run(
+            'commands',
+            device_key,
+            misses,
+            lambda: _execute_commands_for_cache(device_config, misses, max_age is not None)
+        )
+        result = dict(shared_result)
+        if coalesced:
+            result['coalesced'] = True
+        if 'command_results' not in result:
+            # 接続に失敗した場合
+            return result
+    else:
+        result = {
+            'success': True,
+            'output': '',
+            'error_output': '',
+            'command_results': [],
+            'timeout_occurred': False
+        }
+    if not cached:
+        return result
+    
+    # キャッシュの結果と実行した結果を元の順序に並べる
+    executed = iter(result['command_results'])
+    command_results = []
+    for index in range(len(commands)):
+        command_result = cached[index] if index in cached else next(executed, None)
+        if command_result is None:
+            break
+        command_results.append(command_result)
+    
+    result['command_results'] = command_results
+    result['output'] = ''.join(r['output'] + "\n" for r in command_results if r['success'])
+    result['output_files'] = [r['output_file'] for r in command_results if r.get('output_file')]
+    result['cache_hits'] = len(cached)
+    return result
+
+
 # 便利な関数
 def test_device_connection(device_config: Dict[str, Any]) -> Dict[str, Any]:
     """デバイス接続をテスト"""
@@ -0,0 +1,250 @@
+"""
+コマンド出力キャプチャモジュール
+大きなコマンド出力をチャンク単位で受け取り、閾値を超えたら一時ファイルへ退避する。
+退避した出力は結果にハンドル（output_file）として残り、結果を保存・表示する側で
+resolve_outputs により本文へ戻す。退避ファイルは保持期間を過ぎたら削除する
+"""
+import os
+import tempfile
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# 既定の退避閾値（バイト）と退避先ディレクトリ
+DEFAULT_SPILL_THRESHOLD = int(os.getenv('OUTPUT_SPILL_THRESHOLD', str(1024 * 1024)))
+DEFAULT_CAPTURE_DIR = os.getenv(
+    'OUTPUT_CAPTURE_DIR',
+    os.path.join(tempfile.gettempdir(), 'cisco-config-fetcher')
+)
+OUTPUT_CAPTURE_RETENTION = float(os.getenv('OUTPUT_CAPTURE_RETENTION', '86400'))  # 退避ファイルの保持期間（秒）
+OUTPUT_CAPTURE_SWEEP_INTERVAL = 300  # 保持期間切れの退避ファイルを探す最短間隔（秒）
+
+# ディレクトリごとの前回の掃除時刻
+_last_sweep: Dict[str, float] = {}
+_sweep_lock = threading.Lock()
+
+
+class OutputBuffer:
+    """メモリ上限付きの出力バッファクラス"""
+
+    def __init__(self, spill_threshold: int = DEFAULT_SPILL_THRESHOLD,
+                 capture_dir: str = DEFAULT_CAPTURE_DIR,
+                 prefix: str = 'output_'):
+        """
+        出力バッファを初期化
+
+        Args:
+            spill_threshold: メモリに保持する最大バイト数。超えたらファイルへ退避
+            capture_dir: 退避ファイルの保存先ディレクトリ
+            prefix: 退避ファイル名の接頭辞
+        """
+        self.spill_threshold = spill_threshold
+        self.capture_dir = capture_dir
+        self.prefix = prefix
+        self.size = 0
+        self.path: Optional[str] = None
+        self._chunks: List[bytes] = []
+        self._file = None
+
+    @property
+    def spilled(self) -> bool:
+        """ファイルへ退避済みかどうか"""
+        return self.path is not None
+
+    def write(self, data: Union[bytes, str]):
+        """
+        チャンクを追記
+
+        Args:
+            data: 受信したチャンク
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if not data:
+            return
+
+        self.size += len(data)
+        if self._file is None and self.size > self.spill_threshold:
+            self._spill()
+
+        if self._file is not None:
+            self._file.write(data)
+        else:
+            self._chunks.append(data)
+
+    def _spill(self):
+        """メモリ上のチャンクを一時ファイルへ移す"""
+        os.makedirs(self.capture_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(
+            prefix=self.prefix, suffix='.txt', dir=self.capture_dir
+        )
+        self._file = os.fdopen(fd, 'wb')
+        for chunk in self._chunks:
+            self._file.write(chunk)
+        self._chunks = []
+        logger.info(f"Command output exceeded {self.spill_threshold} bytes, spilling to {self.path}")
+        sweep_capture_dir(self.capture_dir)
+
+    def close(self):
+        """退避ファイルを閉じる（書き込み完了時に呼ぶ）"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def getvalue(self) -> str:
+        """バッファ全体を文字列で取得（退避済みの場合はファイルから読む）"""
+        if self.spilled:
+            self.close()
+            with open(self.path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read()
+        return b''.join(self._chunks).decode('utf-8', errors='ignore')
+
+    def to_handle(self) -> Dict[str, Any]:
+        """退避ファイルのハンドル（パスとサイズ）を取得"""
+        return {'path': self.path, 'size': self.size}
+
+    def to_result(self) -> Dict[str, Any]:
+        """
+        コマンド結果用の出力フィールドを作成
+
+        退避済みの場合は本文の代わりに output_file ハンドルを返す。
+
+        Returns:
+            Dict: output（と output_file）
+        """
+        self.close()
+        if not self.spilled:
+            return {'output': self.getvalue()}
+        handle = self.to_handle()
+        return {
+            'output': placeholder(handle),
+            'output_file': handle
+        }
+
+
+def placeholder(handle: Dict[str, Any]) -> str:
+    """
+    退避した出力の代わりに output へ入れる文字列
+
+    Args:
+        handle: 退避ファイルのハンドル（パスとサイズ）
+
+    Returns:
+        str: 退避先を示す文字列
+    """
+    return f"[output saved to {handle['path']} ({handle['size']} bytes)]"
+
+
+def read_output(command_result: Dict[str, Any]) -> str:
+    """
+    コマンド結果から出力本文を取得（退避ファイルにも対応）
+
+    Args:
+        command_result: コマンド実行結果
+
+    Returns:
+        str: 出力本文
+    """
+    handle = command_result.get('output_file')
+    if not handle:
+        return command_result.get('output', '')
+    return _read_handle(handle, command_result.get('output', ''))
+
+
+def _read_handle(handle: Dict[str, Any], default: str) -> str:
+    """退避ファイルを読む（削除済みの場合は default を返す）"""
+    try:
+        with open(handle['path'], 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read()
+    except OSError as e:
+        logger.warning(f"Failed to read spilled output {handle['path']}: {e}")
+        return default
+
+
+def resolve_outputs(result: Any) -> Any:
+    """
+    実行結果に含まれる退避ファイルのハンドルを本文に置き換える
+
+    コマンド結果の output_file と、まとめた結果の output_files に対応する
+    output 内の退避先の表示を退避ファイルの内容で置き換える。
+    結果をファイルへ保存する前や、APIで返す・画面に表示する前に呼ぶ。
+
+    Args:
+        result: 実行結果（辞書・リストを再帰的にたどる。その場で書き換える）
+
+    Returns:
+        Any: 置き換えた実行結果（引数と同じオブジェクト）
+    """
+    contents: Dict[str, str] = {}
+
+    def content(handle: Dict[str, Any]) -> str:
+        # 同じ退避ファイルは1回だけ読む
+        if handle['path'] not in contents:
+            contents[handle['path']] = _read_handle(handle, placeholder(handle))
+        return contents[handle['path']]
+
+    def resolve(value: Any):
+        if isinstance(value, list):
+            for item in value:
+                resolve(item)
+            return
+        if not isinstance(value, dict):
+            return
+        for item in value.values():
+            resolve(item)
+        handle = value.pop('output_file', None)
+        if handle:
+            value['output'] = content(handle)
+        handles = value.get('output_files')
+        if handles and isinstance(value.get('output'), str):
+            output = value['output']
+            for file_handle in handles:
+                output = output.replace(placeholder(file_handle), content(file_handle))
+            value['output'] = output
+            value['output_files'] = []
+
+    resolve(result)
+    return result
+
+
+def sweep_capture_dir(capture_dir: str = DEFAULT_CAPTURE_DIR,
+                      retention: float = OUTPUT_CAPTURE_RETENTION,
+                      force: bool = False) -> int:
+    """
+    保持期間を過ぎた退避ファイルを削除
+
+    Args:
+        capture_dir: 退避ファイルの保存先ディレクトリ
+        retention: 保持期間（秒）
+        force: Trueの場合、前回の掃除からの間隔によらず実行する
+
+    Returns:
+        int: 削除したファイル数
+    """
+    now = time.time()
+    with _sweep_lock:
+        if not force and now - _last_sweep.get(capture_dir, 0.0) < OUTPUT_CAPTURE_SWEEP_INTERVAL:
+            return 0
+        _last_sweep[capture_dir] = now
+
+    removed = 0
+    try:
+        names = os.listdir(capture_dir)
+    except OSError:
+        return 0
+    for name in names:
+        if not name.endswith('.txt'):
+            continue
+        path = os.path.join(capture_dir, name)
+        try:
+            if now - os.path.getmtime(path) > retention:
+                os.remove(path)
+                removed += 1
+        except OSError as e:
+            logger.warning(f"Failed to remove spilled output {path}: {e}")
+    if removed:
+        logger.info(f"Removed {removed} spilled output files older than {retention:g} seconds")
+    return removed
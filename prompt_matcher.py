@@ -0,0 +1,216 @@
+"""
+プロンプト検出モジュール
+デバイスごとのプロンプト正規表現を一度だけコンパイルし、
+受信データを増分走査してコマンド出力をプロンプト行で区切る
+"""
+import codecs
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# モードサフィックス（(config)、(config-if) など）
+MODE_PATTERN = r'(?:\([^)\r\n]*\))?'
+
+# プロンプト判定に使う行頭・行末の最大文字数
+DEFAULT_TAIL_WINDOW = 256
+
+# プロンプトの既定終端文字
+DEFAULT_TERMINATORS = ('#', '>')
+
+
+class PromptMatcher:
+    """
+    デバイスプロンプトの判定クラス
+
+    ホスト名が分かっている場合は「ホスト名 + モード + (#|>)」で始まる行を
+    プロンプトとみなす（後ろにコマンドのエコーが続いてもよい）。
+    ホスト名が不明な場合は「1語 + モード + 終端文字」だけの行をプロンプトとみなす。
+    """
+
+    def __init__(self, hostname: Optional[str] = None,
+                 terminators: Tuple[str, ...] = DEFAULT_TERMINATORS,
+                 tail_window: int = DEFAULT_TAIL_WINDOW):
+        """
+        プロンプト判定を初期化
+
+        Args:
+            hostname: デバイスのホスト名（不明な場合None）
+            terminators: プロンプトの終端文字
+            tail_window: 判定に使う最大文字数
+        """
+        self.hostname = hostname
+        self.terminators = terminators
+        self.tail_window = tail_window
+
+        suffix = '|'.join(re.escape(t) for t in terminators)
+        if hostname:
+            self.pattern = re.compile(rf'{re.escape(hostname)}{MODE_PATTERN}(?:{suffix})')
+        else:
+            self.pattern = re.compile(rf'([^\s()]+?){MODE_PATTERN}(?:{suffix})[ \t]*$')
+
+    def is_prompt(self, line: str, length: Optional[int] = None) -> bool:
+        """
+        行がプロンプトか判定
+
+        Args:
+            line: 判定する行（長い行は先頭 tail_window 文字でよい）
+            length: 行全体の長さ（line が切り詰められている場合に指定）
+
+        Returns:
+            bool: プロンプトの場合True
+        """
+        if self.hostname:
+            return self.pattern.match(line.lstrip()[:self.tail_window]) is not None
+
+        # ホスト名不明時は短い行のみを対象にする
+        if (length if length is not None else len(line)) > self.tail_window:
+            return False
+        return self.pattern.match(line.strip()) is not None
+
+    def learn(self, prompt_line: str) -> 'PromptMatcher':
+        """
+        受信したプロンプト行からホスト名を学習した判定を返す
+
+        Args:
+            prompt_line: プロンプトと判定された行
+
+        Returns:
+            PromptMatcher: ホスト名付きの判定（学習できない場合は自身）
+        """
+        if self.hostname:
+            return self
+        match = self.pattern.match(prompt_line.strip())
+        if not match:
+            return self
+        terminators = tuple(dict.fromkeys(DEFAULT_TERMINATORS + self.terminators))
+        return _compile(match.group(1), terminators)
+
+    def scanner(self) -> 'PromptScanner':
+        """この判定を使う増分走査を作成"""
+        return PromptScanner(self)
+
+
+class PromptScanner:
+    """
+    受信データの増分走査クラス
+
+    新しく受信した部分だけを走査し、改行待ちの行は先頭 tail_window 文字
+    だけを判定に使う。出力全体を毎回走査し直さないため大きな出力でも線形。
+    """
+
+    def __init__(self, matcher: PromptMatcher):
+        """
+        走査を初期化
+
+        Args:
+            matcher: プロンプト判定
+        """
+        self.matcher = matcher
+        # プロンプトで区切られた完了済みのコマンド出力
+        self.segments: List[str] = []
+        # 直近に検出したプロンプト行
+        self.last_prompt = ''
+        self._lines: List[str] = []
+        self._partial: List[str] = []
+        self._partial_head = ''
+        self._partial_length = 0
+        self._partial_matched = False
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+
+    def feed(self, data: Union[bytes, str]) -> int:
+        """
+        受信データを走査
+
+        Args:
+            data: 受信したチャンク
+
+        Returns:
+            int: 新たに完了したセグメント数
+        """
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        data = data.replace('\r', '')
+        before = len(self.segments)
+
+        start = 0
+        while True:
+            end = data.find('\n', start)
+            if end < 0:
+                break
+            self._append_partial(data[start:end])
+            self._end_line()
+            start = end + 1
+
+        if start < len(data):
+            self._append_partial(data[start:])
+            # 改行を待たずに末尾のプロンプトを検出する
+            if not self._partial_matched and self.matcher.is_prompt(
+                    self._partial_head, self._partial_length):
+                self._partial_matched = True
+                self._boundary(self._partial_head)
+
+        return len(self.segments) - before
+
+    def _append_partial(self, piece: str):
+        """改行待ちの行へ断片を追加"""
+        self._partial.append(piece)
+        self._partial_length += len(piece)
+        window = self.matcher.tail_window
+        if len(self._partial_head) < window:
+            self._partial_head += piece[:window - len(self._partial_head)]
+
+    def _end_line(self):
+        """行の終端を処理"""
+        line = ''.join(self._partial)
+        if self._partial_matched:
+            # 改行前にプロンプトとして処理済み（エコー部分も含めて捨てる）
+            pass
+        elif self.matcher.is_prompt(line):
+            self._boundary(line)
+        else:
+            self._lines.append(line)
+        self._partial = []
+        self._partial_head = ''
+        self._partial_length = 0
+        self._partial_matched = False
+
+    def _boundary(self, prompt_line: str):
+        """プロンプト行でセグメントを区切る"""
+        self.segments.append('\n'.join(self._lines))
+        self._lines = []
+        self.last_prompt = prompt_line
+
+
+@lru_cache(maxsize=1024)
+def _compile(hostname: Optional[str], terminators: Tuple[str, ...]) -> PromptMatcher:
+    """プロンプト判定を作成（同じ条件の正規表現は一度だけコンパイル）"""
+    return PromptMatcher(hostname, terminators)
+
+
+def get_prompt_matcher(device_config: Dict[str, Any],
+                       terminators: Optional[Tuple[str, ...]] = None) -> PromptMatcher:
+    """
+    デバイス設定からプロンプト判定を取得
+
+    prompt（例: router1#）が設定されていればホスト名で判定し、
+    未設定なら wait_string を終端文字として判定する。
+
+    Args:
+        device_config: デバイス設定辞書
+        terminators: 終端文字（省略時は設定から決定）
+
+    Returns:
+        PromptMatcher
+    """
+    wait_string = device_config.get('wait_string', '#')
+    hostname = None
+    prompt = device_config.get('prompt')
+    if prompt:
+        hostname = re.sub(r'\([^)]*\)$', '', prompt.strip().rstrip('#>$ ')) or None
+
+    if terminators is None:
+        if hostname:
+            terminators = tuple(dict.fromkeys(DEFAULT_TERMINATORS + ((wait_string,) if wait_string else ())))
+        else:
+            terminators = (wait_string,) if wait_string else DEFAULT_TERMINATORS
+    return _compile(hostname, terminators)
@@ -0,0 +1,197 @@
+"""
+到達性事前チェックモジュール
+実行前に対象デバイスのTCPポート（SSH:22 / Telnet:23）を非同期で一斉に確認する
+"""
+import asyncio
+import errno
+import os
+import socket
+import time
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 到達性キャッシュモジュールのインポート
+from health_cache import HostHealthCache, get_host_health_cache
+
+logger = logging.getLogger(__name__)
+
+# ファイルディスクリプタ上限から差し引く、プローブ以外（ログ・接続プール等）用の余裕
+FD_HEADROOM = 256
+# ファイルディスクリプタ上限が取得できない場合の同時ソケット数
+FALLBACK_PROBE_CONCURRENCY = 256
+# ホスト側の問題とみなすエラー番号（EMFILE等のローカルなエラーは含めない）
+HOST_FAILURE_ERRNOS = {
+    errno.ECONNREFUSED, errno.ECONNRESET, errno.ETIMEDOUT,
+    errno.EHOSTUNREACH, errno.ENETUNREACH, errno.EHOSTDOWN
+}
+
+
+def _default_probe_concurrency() -> int:
+    """
+    ファイルディスクリプタ上限（RLIMIT_NOFILE）から同時に開くソケット数の既定値を算出
+
+    Returns:
+        int: 同時に開くソケット数
+    """
+    if resource is None:
+        return FALLBACK_PROBE_CONCURRENCY
+    try:
+        soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ValueError, OSError):
+        return FALLBACK_PROBE_CONCURRENCY
+    if soft_limit == resource.RLIM_INFINITY:
+        return FALLBACK_PROBE_CONCURRENCY * 4
+    return max(1, min(soft_limit // 2, soft_limit - FD_HEADROOM))
+
+
+# 既定値（環境変数で変更可能）
+DEFAULT_PROBE_TIMEOUT = float(os.getenv('PROBE_TIMEOUT', '2'))               # 1ホストあたりの接続待ち（秒）
+DEFAULT_PROBE_CONCURRENCY = int(os.getenv('PROBE_CONCURRENCY', '0')) or _default_probe_concurrency()  # 同時に開くソケット数
+PRECHECK_ENABLED = os.getenv('REACHABILITY_PRECHECK', '1').lower() not in ('0', 'false', 'no')
+
+# 到達不能デバイスの結果に記録するメッセージ
+UNREACHABLE_MESSAGE = 'Device unreachable'
+
+
+def is_host_failure(error: BaseException) -> bool:
+    """
+    接続エラーがホスト側の問題（タイムアウト・接続拒否・経路なし）か判定
+
+    名前解決の失敗もホスト側の問題として扱う。ソケットを開けない（EMFILE等）
+    ようなローカルのエラーはホストの障害として記録しない。
+
+    Args:
+        error: 発生した例外
+
+    Returns:
+        bool: ホスト側の問題の場合True
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionRefusedError, ConnectionResetError, socket.gaierror)):
+        return True
+    return isinstance(error, OSError) and error.errno in HOST_FAILURE_ERRNOS
+
+
+def get_probe_port(device_config: Dict[str, Any]) -> int:
+    """
+    確認するポートを取得（port 未設定時は connection_type の既定ポート）
+
+    Args:
+        device_config: デバイス設定辞書
+
+    Returns:
+        int: ポート番号
+    """
+    return HostHealthCache.make_key(device_config)[1]
+
+
+async def probe_device(device_config: Dict[str, Any],
+                       timeout: float = DEFAULT_PROBE_TIMEOUT) -> Dict[str, Any]:
+    """
+    1台のデバイスのTCPポートへ接続できるか確認
+
+    Args:
+        device_config: デバイス設定辞書
+        timeout: 接続待ちの上限（秒）
+
+    Returns:
+        Dict: {'reachable', 'host', 'port', 'latency', 'error', 'host_failure'}
+    """
+    host = device_config.get('host')
+    port = get_probe_port(device_config)
+    result = {
+        'reachable': False,
+        'host': host,
+        'port': port,
+        'latency': None,
+        'error': '',
+        'host_failure': False
+    }
+
+    start_time = time.monotonic()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=timeout)
+        result['reachable'] = True
+        result['latency'] = time.monotonic() - start_time
+        writer.close()
+    except asyncio.TimeoutError as e:
+        result['error'] = f"Connection to {host}:{port} timed out after {timeout:g} seconds"
+        result['host_failure'] = is_host_failure(e)
+    except Exception as e:
+        result['error'] = f"Connection to {host}:{port} failed: {e}"
+        result['host_failure'] = is_host_failure(e)
+    return result
+
+
+async def probe_devices_async(device_configs: Dict[str, Dict[str, Any]],
+                              timeout: float = DEFAULT_PROBE_TIMEOUT,
+                              concurrency: int = DEFAULT_PROBE_CONCURRENCY) -> Dict[str, Dict[str, Any]]:
+    """
+    複数デバイスの到達性を同時に確認
+
+    到達不能なホストは到達性キャッシュにも記録し、
+    後続の接続をサーキットブレーカーで即座に失敗させる。
+    ソケットを開けない等のローカルなエラーはホストの障害として記録しない。
+
+    Args:
+        device_configs: デバイス名をキーとするデバイス設定
+        timeout: 1ホストあたりの接続待ち（秒）
+        concurrency: 同時に開くソケット数の上限
+
+    Returns:
+        Dict: デバイス名をキーとする確認結果
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    health_cache = get_host_health_cache()
+
+    async def _probe(device_name: str, device_config: Dict[str, Any]):
+        async with semaphore:
+            result = await probe_device(device_config, timeout)
+        if result['host_failure']:
+            health_cache.record_failure(HostHealthCache.make_key(device_config), result['error'])
+        return device_name, result
+
+    pairs = await asyncio.gather(
+        *(_probe(name, config) for name, config in device_configs.items())
+    )
+    results = dict(pairs)
+    unreachable = sum(1 for r in results.values() if not r['reachable'])
+    local_errors = sum(1 for r in results.values() if not r['reachable'] and not r['host_failure'])
+    logger.info(f"Reachability probe finished: {len(results) - unreachable}/{len(results)} reachable")
+    if local_errors:
+        logger.warning(f"Reachability probe could not check {local_errors} devices due to local errors")
+    return results
+
+
+def probe_devices(device_configs: Dict[str, Dict[str, Any]],
+                  timeout: Optional[float] = None,
+                  concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """probe_devices_asyncを同期コンテキストから実行する便利関数"""
+    return asyncio.run(probe_devices_async(
+        device_configs,
+        timeout or DEFAULT_PROBE_TIMEOUT,
+        concurrency or DEFAULT_PROBE_CONCURRENCY
+    ))
+
+
+def probe_device_names(device_names: Iterable[str], devices: Dict[str, Dict[str, Any]],
+                       timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    デバイス名のリストから設定が存在するものだけを重複なく確認
+
+    Args:
+        device_names: 確認するデバイス名
+        devices: デバイス設定
+        timeout: 1ホストあたりの接続待ち（秒）
+
+    Returns:
+        Dict: デバイス名をキーとする確認結果
+    """
+    targets = {name: devices[name] for name in dict.fromkeys(device_names) if name in devices}
+    if not targets:
+        return {}
+    return probe_devices(targets, timeout)
@@ -0,0 +1,454 @@
+"""
+showコマンド結果キャッシュモジュール
+(デバイス, コマンド) ごとに参照系コマンドの実行結果を保持し、
+ダッシュボードやスクリプトからの短時間の繰り返し取得をデバイスへ送らずに返す。
+プロセス内のLRUに加えてSQLiteの共有キャッシュに保存し、CLIなど別プロセスからも参照できる。
+共有キャッシュへの書き込みはバックグラウンドの書き込みスレッドで行い、実行スレッドを待たせない
+"""
+import atexit
+import os
+import json
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# コマンド分類モジュールのインポート
+from command_classifier import is_memoizable, normalize_command
+# バックグラウンド書き込みモジュールのインポート
+from log_writer import LogWriter
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_ttls(value: str) -> Dict[str, float]:
+    """'show clock=0,show running-config=300' 形式のTTL設定を辞書に変換"""
+    ttls = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        command, ttl = item.rsplit('=', 1)
+        ttls[normalize_command(command)] = float(ttl)
+    return ttls
+
+
+# 既定値（環境変数で変更可能）
+DEFAULT_RESULT_TTL = float(os.getenv('RESULT_CACHE_TTL', '30'))                          # 既定のTTL（秒）
+DEFAULT_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))      # 保持する出力の合計サイズ
+DEFAULT_COMMAND_TTLS = _parse_ttls(os.getenv('RESULT_CACHE_TTLS', ''))                   # コマンド（前方一致）別のTTL
+DEFAULT_CACHE_DB = os.getenv('RESULT_CACHE_DB', os.path.join('logs', 'result_cache.db'))  # 共有キャッシュ（空文字で無効）
+DEFAULT_SHARED_MAX_BYTES = int(os.getenv('RESULT_CACHE_DB_MAX_BYTES', str(256 * 1024 * 1024)))  # 共有キャッシュの合計サイズ
+# 実行したshowコマンドの結果を常に保存するか（無効の場合は max_age を指定した実行の結果だけを保存する）
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE', '0').lower() not in ('0', 'false', 'no')
+
+# 1エントリあたりの管理領域の見積もり（バイト）
+ENTRY_OVERHEAD = 256
+
+
+class SharedResultStore:
+    """プロセス間で共有するSQLite（WALモード）の実行結果キャッシュ"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            device_key TEXT NOT NULL,
+            command TEXT NOT NULL,
+            stored_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            size INTEGER NOT NULL,
+            result TEXT NOT NULL,
+            PRIMARY KEY (device_key, command)
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_expires ON results (expires_at);
+        CREATE INDEX IF NOT EXISTS idx_results_stored ON results (stored_at);
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = DEFAULT_SHARED_MAX_BYTES):
+        """
+        共有キャッシュを初期化（データベースは最初の利用時に開く）
+
+        Args:
+            db_path: データベースファイルのパス
+            max_bytes: 保持する結果の合計サイズの上限（超えたら古く保存したものから削除）
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @staticmethod
+    def encode_key(device_key: Tuple) -> str:
+        """デバイスのキーを保存用の文字列に変換"""
+        return json.dumps(list(device_key))
+
+    def _connect(self) -> sqlite3.Connection:
+        """データベースを開く（ロック内で呼ぶ）"""
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # 接続はスレッド間で共有し、ロックで直列化する
+            conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(results)')]
+            if columns and 'size' not in columns:
+                # 以前の形式のキャッシュは作り直す
+                conn.execute('DROP TABLE results')
+            conn.executescript(self.SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, device_key: Tuple, command: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """
+        期限内の実行結果を取得
+
+        Args:
+            device_key: デバイスのキー
+            command: 正規化したコマンド
+
+        Returns:
+            Tuple: (保存時刻（time.time）, 実行結果)（ない場合None）
+        """
+        with self.lock:
+            row = self._connect().execute(
+                'SELECT stored_at, result FROM results WHERE device_key = ? AND command = ? AND expires_at > ?',
+                (self.encode_key(device_key), command, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def put(self, device_key: Tuple, command: str, command_result: Dict[str, Any], ttl: float):
+        """
+        実行結果を保存
+
+        Args:
+            device_key: デバイスのキー
+            command: 正規化したコマンド
+            command_result: 単一コマンドの実行結果
+            ttl: TTL（秒）
+        """
+        self.apply([{'op': 'put', 'device_key': device_key, 'command': command,
+                     'result': command_result, 'ttl': ttl}])
+
+    def apply(self, operations: List[Dict[str, Any]]):
+        """
+        保存・削除をまとめて1トランザクションで反映し、期限切れと上限超過のエントリを削除
+
+        Args:
+            operations: 'op' が 'put'（device_key, command, result, ttl）、
+                'delete_device'（device_key）、'clear' のいずれかの操作のリスト（順に反映する）
+        """
+        now = time.time()
+        with self.lock:
+            conn = self._connect()
+            with conn:
+                for operation in operations:
+                    if operation['op'] == 'put':
+                        result = json.dumps(operation['result'], ensure_ascii=False)
+                        conn.execute(
+                            'INSERT OR REPLACE INTO results '
+                            '(device_key, command, stored_at, expires_at, size, result) '
+                            'VALUES (?, ?, ?, ?, ?, ?)',
+                            (self.encode_key(operation['device_key']), operation['command'],
+                             now, now + operation['ttl'], len(result), result)
+                        )
+                    elif operation['op'] == 'delete_device':
+                        conn.execute('DELETE FROM results WHERE device_key = ?',
+                                     (self.encode_key(operation['device_key']),))
+                    elif operation['op'] == 'clear':
+                        conn.execute('DELETE FROM results')
+                conn.execute('DELETE FROM results WHERE expires_at <= ?', (now,))
+                self._enforce_max_bytes(conn)
+
+    def _enforce_max_bytes(self, conn: sqlite3.Connection):
+        """合計サイズが上限を超えていれば古く保存したものから削除（ロック内で呼ぶ）"""
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for rowid, size in conn.execute('SELECT rowid, size FROM results ORDER BY stored_at'):
+            if total <= self.max_bytes:
+                break
+            evicted.append((rowid,))
+            total -= size
+        conn.executemany('DELETE FROM results WHERE rowid = ?', evicted)
+
+    def close(self):
+        """データベースを閉じる"""
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ResultCache:
+    """TTLと合計サイズによるLRU追い出しを備えた実行結果キャッシュ"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 default_ttl: float = DEFAULT_RESULT_TTL,
+                 command_ttls: Optional[Dict[str, float]] = None,
+                 db_path: Optional[str] = DEFAULT_CACHE_DB,
+                 shared_max_bytes: int = DEFAULT_SHARED_MAX_BYTES,
+                 enabled: bool = RESULT_CACHE_ENABLED):
+        """
+        結果キャッシュを初期化
+
+        Args:
+            max_bytes: 保持する出力の合計サイズの上限（0でキャッシュしない）
+            default_ttl: 既定のTTL（秒、0でキャッシュしない）
+            command_ttls: コマンド（正規化後の前方一致）別のTTL
+            db_path: 共有キャッシュのデータベースファイル（None・空文字でプロセス内のみ）
+            shared_max_bytes: 共有キャッシュに保持する結果の合計サイズの上限
+            enabled: 実行したshowコマンドの結果を常に保存するか
+        """
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.command_ttls = dict(DEFAULT_COMMAND_TTLS if command_ttls is None else command_ttls)
+        self.enabled = enabled
+        self.shared = SharedResultStore(db_path, shared_max_bytes) if db_path else None
+        # 共有キャッシュの書き込みスレッド（最初の書き込み時に起動）
+        self._writer: Optional[LogWriter] = None
+        # (デバイスキー, 正規化したコマンド) -> (保存時刻, サイズ, 実行結果)
+        self._entries: 'OrderedDict[Tuple, Tuple[float, int, Dict[str, Any]]]' = OrderedDict()
+        self._total_bytes = 0
+        # デバイスキー -> 破棄した回数（セッション内のメモが他の実行での設定変更を検知するのに使う）
+        self._generations: Dict[Tuple, int] = {}
+        self._clears = 0
+        self.lock = threading.Lock()
+
+        # 統計カウンター
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'invalidations': 0,
+            'shared_hits': 0,
+            'shared_errors': 0
+        }
+
+    def ttl_for(self, command: str) -> float:
+        """
+        コマンドのTTLを取得（最も長く一致する前方一致の設定を優先）
+
+        Args:
+            command: コマンド
+
+        Returns:
+            float: TTL（秒）
+        """
+        normalized = normalize_command(command)
+        matched = None
+        for prefix in self.command_ttls:
+            if normalized.startswith(prefix) and (matched is None or len(prefix) > len(matched)):
+                matched = prefix
+        return self.default_ttl if matched is None else self.command_ttls[matched]
+
+    def get(self, device_key: Tuple, command: str,
+            max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        キャッシュから実行結果を取得（プロセス内になければ共有キャッシュを参照）
+
+        Args:
+            device_key: デバイスのキー（ConnectionPool.make_key）
+            command: コマンド
+            max_age: 許容する経過時間（秒、TTLより短い場合に優先）
+
+        Returns:
+            Dict: cache_hit と cache_age を付けた実行結果のコピー（ない場合None）
+        """
+        normalized = normalize_command(command)
+        key = (device_key, normalized)
+        ttl = self.ttl_for(command)
+        limit = ttl if max_age is None else min(ttl, max_age)
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, size, command_result = entry
+                age = time.monotonic() - stored_at
+                if age > ttl:
+                    # 期限切れのエントリは破棄する
+                    del self._entries[key]
+                    self._total_bytes -= size
+                if age <= limit:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return self._as_hit(command, command_result, age)
+
+        # 他のプロセスが保存した結果を参照する
+        shared_entry = self._shared_call('get', device_key, normalized)
+        if shared_entry is not None:
+            stored_at, command_result = shared_entry
+            age = max(0.0, time.time() - stored_at)
+            if age <= limit:
+                self._store_local(key, command, command_result, time.monotonic() - age)
+                with self.lock:
+                    self.stats['hits'] += 1
+                    self.stats['shared_hits'] += 1
+                return self._as_hit(command, command_result, age)
+
+        with self.lock:
+            self.stats['misses'] += 1
+        return None
+
+    @staticmethod
+    def _as_hit(command: str, command_result: Dict[str, Any], age: float) -> Dict[str, Any]:
+        """cache_hit と cache_age を付けた実行結果のコピーを作成"""
+        cached = dict(command_result)
+        cached.update({
+            'command': command,
+            'execution_time': 0.0,
+            'cache_hit': True,
+            'cache_age': age
+        })
+        return cached
+
+    def _shared_call(self, method: str, *args):
+        """共有キャッシュを呼び出す（失敗してもプロセス内のキャッシュだけで動作を続ける）"""
+        if self.shared is None:
+            return None
+        try:
+            return getattr(self.shared, method)(*args)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            with self.lock:
+                self.stats['shared_errors'] += 1
+            logger.warning(f"Shared result cache {method} failed: {e}")
+            return None
+
+    def _store_local(self, key: Tuple, command: str, command_result: Dict[str, Any], stored_at: float):
+        """プロセス内のLRUに保存"""
+        size = len(command_result.get('output', '')) + len(command) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._total_bytes -= previous[1]
+            self._entries[key] = (stored_at, size, command_result)
+            self._total_bytes += size
+
+            # 合計サイズが上限を超えたら最も古く使われたものから追い出す
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self.stats['evictions'] += 1
+
+    def put(self, device_key: Tuple, command: str, command_result: Dict[str, Any]):
+        """
+        成功したshowコマンドの実行結果を保存
+
+        Args:
+            device_key: デバイスのキー（ConnectionPool.make_key）
+            command: コマンド
+            command_result: 単一コマンドの実行結果
+        """
+        if not command_result.get('success') or not is_memoizable(command):
+            return
+        if command_result.get('output_file'):
+            # 一時ファイルへ退避した大きな出力はキャッシュしない
+            return
+        if self.max_bytes <= 0 or self.ttl_for(command) <= 0:
+            return
+
+        normalized = normalize_command(command)
+        self._store_local((device_key, normalized), command, command_result, time.monotonic())
+        with self.lock:
+            self.stats['stores'] += 1
+        self._submit_shared({'op': 'put', 'device_key': device_key, 'command': normalized,
+                             'result': command_result, 'ttl': self.ttl_for(command)})
+
+    def _submit_shared(self, operation: Dict[str, Any]):
+        """共有キャッシュへの書き込みを書き込みスレッドに渡す"""
+        if self.shared is None:
+            return
+        with self.lock:
+            if self._writer is None:
+                # キューが満杯の場合は待たずに呼び出し元で書き出す
+                self._writer = LogWriter(self._write_shared, put_timeout=0)
+            writer = self._writer
+        writer.submit(operation)
+
+    def _write_shared(self, operations: List[Dict[str, Any]]):
+        """書き込みスレッドで共有キャッシュへまとめて反映"""
+        self._shared_call('apply', operations)
+
+    def invalidate_device(self, device_key: Tuple):
+        """
+        デバイスのエントリをすべて破棄（設定変更系コマンドの実行後に呼ぶ）
+
+        Args:
+            device_key: デバイスのキー（ConnectionPool.make_key）
+        """
+        with self.lock:
+            keys = [key for key in self._entries if key[0] == device_key]
+            for key in keys:
+                self._total_bytes -= self._entries.pop(key)[1]
+            self._generations[device_key] = self._generations.get(device_key, 0) + 1
+        self._submit_shared({'op': 'delete_device', 'device_key': device_key})
+        if keys:
+            with self.lock:
+                self.stats['invalidations'] += 1
+            logger.debug(f"Invalidated {len(keys)} cached results for {device_key[0]}")
+
+    def clear(self):
+        """全エントリを破棄"""
+        with self.lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self._clears += 1
+        self._submit_shared({'op': 'clear'})
+
+    def device_generation(self, device_key: Tuple) -> int:
+        """
+        デバイスの結果が破棄された回数を取得（値が変わったら以前の出力は古い）
+
+        Args:
+            device_key: デバイスのキー（ConnectionPool.make_key）
+
+        Returns:
+            int: 破棄の世代
+        """
+        with self.lock:
+            return self._generations.get(device_key, 0) + self._clears
+
+    def flush(self):
+        """共有キャッシュへの書き込み待ちがすべて反映されるまで待つ"""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self):
+        """書き込み待ちを反映して共有キャッシュを閉じる"""
+        with self.lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+        if self.shared is not None:
+            self.shared.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュ統計を取得"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats.update({
+                'entries': len(self._entries),
+                'total_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'default_ttl': self.default_ttl,
+                'enabled': self.enabled,
+                'shared_db': self.shared.db_path if self.shared else None
+            })
+        return stats
+
+
+# グローバルインスタンス
+result_cache = ResultCache()
+# 終了時に共有キャッシュへの書き込み待ちを反映する
+atexit.register(result_cache.close)
+
+def get_result_cache() -> ResultCache:
+    """結果キャッシュインスタンスを取得"""
+    return result_cache
@@ -0,0 +1,356 @@
+"""
+シナリオ実行のディスパッチモジュール
+シナリオ（リスト）をデバイス単位の作業に展開し、全体とシナリオごとの同時実行数を
+守りながら、予測実行時間の長い順（LPT）に共有ワーカープールへ投入する。
+ドライラン用に同じ規則で投入した場合のメイクスパンも算出する
+"""
+import heapq
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# ネットワーク実行モジュールのインポート
+from network_executor import execute_scenarios_on_device
+
+# 到達性事前チェックモジュールのインポート
+from reachability import UNREACHABLE_MESSAGE
+
+# 実行時間予測モジュールのインポート
+from duration_predictor import DurationPredictor, flatten_commands
+
+logger = logging.getLogger(__name__)
+
+# デバイス並列実行の設定
+DEFAULT_SCENARIO_CONCURRENCY = int(os.getenv('SCENARIO_CONCURRENCY', '10'))  # シナリオごとの同時実行デバイス数
+DEVICE_WORKER_POOL_SIZE = int(os.getenv('DEVICE_WORKER_POOL_SIZE', '50'))    # 全シナリオ共有のワーカー数
+DEFAULT_LIST_CONCURRENCY = int(os.getenv('SCENARIO_LIST_CONCURRENCY', str(DEVICE_WORKER_POOL_SIZE)))  # シナリオリスト全体の同時実行デバイス数
+
+# 全シナリオで共有するデバイス実行用ワーカープール
+device_worker_pool = ThreadPoolExecutor(
+    max_workers=DEVICE_WORKER_POOL_SIZE,
+    thread_name_prefix='device-worker'
+)
+
+
+def get_scenario_concurrency(scenario: Dict[str, Any]) -> int:
+    """シナリオの同時実行デバイス数を取得（scenarios.yamlのconcurrencyで上書き可能）"""
+    try:
+        concurrency = int(scenario.get('concurrency', DEFAULT_SCENARIO_CONCURRENCY))
+    except (TypeError, ValueError):
+        concurrency = DEFAULT_SCENARIO_CONCURRENCY
+    return max(1, min(concurrency, DEVICE_WORKER_POOL_SIZE))
+
+
+def get_list_concurrency(scenario_list: Dict[str, Any]) -> int:
+    """シナリオリスト全体の同時実行デバイス数を取得（シナリオリストのconcurrencyで上書き可能）"""
+    try:
+        concurrency = int(scenario_list.get('concurrency', DEFAULT_LIST_CONCURRENCY))
+    except (TypeError, ValueError):
+        concurrency = DEFAULT_LIST_CONCURRENCY
+    return max(1, min(concurrency, DEVICE_WORKER_POOL_SIZE))
+
+
+def build_work_items(scenario_names: List[str],
+                     scenarios: Dict[str, Any]) -> Tuple[List[Tuple[List[Dict[str, Any]], str]], List[Tuple]]:
+    """
+    シナリオリストをデバイス単位の作業に展開
+
+    同じデバイスを対象とするシナリオは宣言順に1つの作業単位（1セッション）にまとめ、
+    各シナリオのデバイス結果が作業単位のどこにあるかを記録する。
+
+    Args:
+        scenario_names: シナリオ名のリスト
+        scenarios: シナリオ設定
+
+    Returns:
+        Tuple: (作業単位 [(シナリオ設定（name にシナリオ名）のリスト, デバイス名)],
+                シナリオごとの配置 [(シナリオ名, シナリオ設定（ない場合None）, [(作業単位, 位置)])])
+    """
+    work_items = []
+    item_by_device = {}
+    planned = []
+    for scenario_name in scenario_names:
+        if scenario_name not in scenarios:
+            planned.append((scenario_name, None, []))
+            continue
+        scenario = dict(scenarios[scenario_name], name=scenario_name)
+        placements = []
+        for device_name in scenario.get('devices', []):
+            if device_name not in item_by_device:
+                item_by_device[device_name] = len(work_items)
+                work_items.append(([], device_name))
+            item_index = item_by_device[device_name]
+            placements.append((item_index, len(work_items[item_index][0])))
+            work_items[item_index][0].append(scenario)
+        planned.append((scenario_name, scenario, placements))
+    return work_items, planned
+
+
+def device_error_result(device_name: str, error_message: str,
+                        device_host: str = 'unknown') -> Dict[str, Any]:
+    """デバイス単位のエラー結果を作成"""
+    return {
+        'device_name': device_name,
+        'device_host': device_host,
+        'success': False,
+        'start_time': datetime.now().isoformat(),
+        'end_time': datetime.now().isoformat(),
+        'total_commands': 0,
+        'successful_commands': 0,
+        'failed_commands': 0,
+        'error_message': error_message
+    }
+
+
+def dispatch_work_items(work_items: List[Tuple[List[Dict[str, Any]], str]], devices: Dict[str, Any],
+                        command_groups: Dict[str, Any],
+                        reachability: Optional[Dict[str, Dict[str, Any]]] = None,
+                        limit: int = DEVICE_WORKER_POOL_SIZE,
+                        finished_at: Optional[Dict[int, float]] = None) -> List[List[Dict[str, Any]]]:
+    """
+    (シナリオ群, デバイス) の作業単位を共有ワーカープールで並列実行
+
+    1つの作業単位は同じデバイスを対象とするシナリオを宣言順に1セッションで実行する。
+    全体の同時実行数はlimit、シナリオごとの同時実行数はconcurrencyで制限し、
+    上限に達したシナリオの作業は後回しにして他のシナリオの作業を先に投入する。
+    到達性チェックで到達不能だったデバイスはワーカーを使わずに失敗とする。
+    投入順は履歴から予測した実行時間の長い順（LPT）とし、
+    各デバイス結果に予測時間（predicted_time）と実績時間（actual_time）を記録する。
+
+    Args:
+        work_items: (シナリオ設定（name にシナリオ名）のリスト, デバイス名) のリスト
+        devices: デバイス設定
+        command_groups: コマンドグループ設定
+        reachability: 到達性チェックの結果（省略時はチェックしない）
+        limit: 全体の同時実行数
+        finished_at: 指定した場合、作業単位のインデックスごとの完了時刻を格納する
+
+    Returns:
+        work_itemsと同じ順序の、シナリオごとのデバイス結果リスト
+    """
+    results = [None] * len(work_items)
+
+    # 履歴から実行時間を予測し、長いものから投入する
+    predictor = DurationPredictor()
+    scenario_commands = {}
+    predictions = {}
+    for index, (scenarios, device_name) in enumerate(work_items):
+        if device_name not in devices:
+            continue
+        item_predictions = []
+        for scenario in scenarios:
+            scenario_name = scenario.get('name', 'unknown_scenario')
+            if scenario_name not in scenario_commands:
+                scenario_commands[scenario_name] = flatten_commands(scenario.get('commands', []), command_groups)
+            item_predictions.append(predictor.predict(
+                devices[device_name], scenario_name, scenario_commands[scenario_name]
+            )[0])
+        predictions[index] = item_predictions
+    totals = {index: sum(item_predictions) for index, item_predictions in predictions.items()}
+
+    pending = []
+    for index in predictor.order_longest_first(list(range(len(work_items))), totals):
+        scenarios, device_name = work_items[index]
+        if device_name not in devices:
+            # デバイスが存在しない場合
+            results[index] = [
+                device_error_result(device_name, f'Device {device_name} not found')
+                for _ in scenarios
+            ]
+            continue
+
+        probe = (reachability or {}).get(device_name)
+        if probe and probe.get('host_failure'):
+            # 到達不能なデバイスは実行しない（ローカルなエラーで確認できなかった場合は実行する）
+            results[index] = [
+                device_error_result(
+                    device_name, UNREACHABLE_MESSAGE, devices[device_name].get('host', 'unknown')
+                )
+                for _ in scenarios
+            ]
+            continue
+        pending.append(index)
+
+    limit = max(1, limit)
+    condition = threading.Condition()
+    active = {'total': 0}
+    active_scenarios: Dict[str, int] = {}
+
+    def _release(index, scenario_names):
+        if finished_at is not None:
+            finished_at[index] = time.time()
+        with condition:
+            active['total'] -= 1
+            for scenario_name in scenario_names:
+                active_scenarios[scenario_name] -= 1
+            condition.notify_all()
+
+    def _next_index():
+        # 全体・シナリオの上限に空きがある作業のうち予測時間が最も長いもの
+        if active['total'] >= limit:
+            return None
+        for index in pending:
+            if all(
+                active_scenarios.get(scenario.get('name', 'unknown_scenario'), 0)
+                < get_scenario_concurrency(scenario)
+                for scenario in work_items[index][0]
+            ):
+                return index
+        return None
+
+    future_to_index = {}
+    while pending:
+        # 上限に達している場合は空きを待つ
+        with condition:
+            index = _next_index()
+            while index is None:
+                condition.wait()
+                index = _next_index()
+            pending.remove(index)
+            scenarios, device_name = work_items[index]
+            scenario_names = [scenario.get('name', 'unknown_scenario') for scenario in scenarios]
+            active['total'] += 1
+            for scenario_name in scenario_names:
+                active_scenarios[scenario_name] = active_scenarios.get(scenario_name, 0) + 1
+
+        future = device_worker_pool.submit(
+            execute_scenarios_on_device,
+            devices[device_name],
+            command_groups,
+            scenarios
+        )
+        future.add_done_callback(lambda f, i=index, names=scenario_names: _release(i, names))
+        future_to_index[future] = index
+
+    # 完了したものから集計
+    for future in as_completed(future_to_index):
+        index = future_to_index[future]
+        scenarios, device_name = work_items[index]
+        try:
+            device_results = future.result()
+        except Exception as e:
+            device_results = [device_error_result(device_name, str(e)) for _ in scenarios]
+
+        # 予測時間と実績時間を並べて記録
+        for device_result, predicted in zip(device_results, predictions.get(index, [])):
+            device_result['predicted_time'] = predicted
+            device_result['actual_time'] = device_result.get('total_time')
+        results[index] = device_results
+
+    return results
+
+
+def simulate_dispatch(durations: List[float], item_scenarios: List[List[str]], limit: int,
+                      caps: Optional[Dict[str, int]] = None) -> float:
+    """
+    ディスパッチャーと同じ規則で作業単位を投入した場合の総所要時間を計算
+
+    全体の同時実行数とシナリオごとの同時実行数の両方に空きがある作業のうち、
+    与えた順序で先頭のものから投入する。
+
+    Args:
+        durations: 作業単位の所要時間（投入順）
+        item_scenarios: 作業単位に含まれるシナリオ名
+        limit: 全体の同時実行数
+        caps: シナリオごとの同時実行数（指定のないシナリオは全体の上限のみ）
+
+    Returns:
+        float: メイクスパン（秒）
+    """
+    caps = caps or {}
+    limit = max(1, limit)
+    pending = list(range(len(durations)))
+    running: List[Tuple[float, int]] = []
+    active: Dict[str, int] = {}
+    now = 0.0
+
+    def _startable(index):
+        return all(active.get(name, 0) < caps.get(name, limit) for name in item_scenarios[index])
+
+    while pending or running:
+        while len(running) < limit:
+            index = next((i for i in pending if _startable(i)), None)
+            if index is None:
+                break
+            pending.remove(index)
+            for name in item_scenarios[index]:
+                active[name] = active.get(name, 0) + 1
+            heapq.heappush(running, (now + durations[index], index))
+        if not running:
+            break
+        now, index = heapq.heappop(running)
+        for name in item_scenarios[index]:
+            active[name] -= 1
+    return now
+
+
+def plan_scenario_list(scenario_names: List[str], scenarios: Dict[str, Any],
+                       devices: Dict[str, Any], command_groups: Dict[str, Any],
+                       concurrency: int,
+                       scenario_concurrency: Callable[[Dict[str, Any]], int] = get_scenario_concurrency) -> Dict[str, Any]:
+    """
+    シナリオリストの実行計画を作成（ドライラン、デバイスには接続しない）
+
+    ディスパッチャーと同じく複数のシナリオに含まれるデバイスは1つの作業単位にまとめ、
+    全体とシナリオごとの同時実行数を守って投入した場合のメイクスパンを求める。
+
+    Args:
+        scenario_names: シナリオ名のリスト
+        scenarios: シナリオ設定
+        devices: デバイス設定
+        command_groups: コマンドグループ設定
+        concurrency: 全体の同時実行数
+        scenario_concurrency: シナリオ設定からシナリオごとの同時実行数を求める関数
+
+    Returns:
+        Dict: 作業単位ごとの予測時間と、LPT順・設定順のメイクスパン
+    """
+    predictor = DurationPredictor()
+    work_items, _ = build_work_items(scenario_names, scenarios)
+    scenario_commands = {}
+    caps = {}
+    jobs = []
+    for item_scenarios, device_name in work_items:
+        if device_name not in devices:
+            continue
+        predictions = []
+        sources = []
+        for scenario in item_scenarios:
+            scenario_name = scenario['name']
+            if scenario_name not in scenario_commands:
+                scenario_commands[scenario_name] = flatten_commands(scenario.get('commands', []), command_groups)
+                caps[scenario_name] = scenario_concurrency(scenario)
+            predicted, source = predictor.predict(
+                devices[device_name], scenario_name, scenario_commands[scenario_name]
+            )
+            predictions.append(predicted)
+            sources.append(source)
+        jobs.append({
+            'scenario_names': [scenario['name'] for scenario in item_scenarios],
+            'device_name': device_name,
+            'predicted_time': sum(predictions),
+            'source': ','.join(dict.fromkeys(sources))
+        })
+
+    def _makespan(ordered_jobs):
+        return simulate_dispatch(
+            [job['predicted_time'] for job in ordered_jobs],
+            [job['scenario_names'] for job in ordered_jobs],
+            concurrency, caps
+        )
+
+    unordered_makespan = _makespan(jobs)
+    totals = {index: job['predicted_time'] for index, job in enumerate(jobs)}
+    jobs = [jobs[index] for index in predictor.order_longest_first(list(totals), totals)]
+    return {
+        'concurrency': concurrency,
+        'scenario_concurrency': caps,
+        'jobs': jobs,
+        'total_work': sum(totals.values()),
+        'predicted_makespan': _makespan(jobs),
+        'unordered_makespan': unordered_makespan
+    }
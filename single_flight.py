@@ -0,0 +1,151 @@
+"""
+同一実行の合流（シングルフライト）モジュール
+同じデバイスへの同じコマンド列の実行が同時に要求された場合、後続の要求は
+実行中の処理に合流して同じ結果を受け取る。設定変更系コマンドを含む実行は
+合流させず、デバイスごとに1件ずつ直列に実行する
+"""
+import hashlib
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# コマンド分類モジュールのインポート
+from command_classifier import is_read_only, normalize_command
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """実行中の処理と、その結果を待つ合流者"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """同一キーの同時実行を1回にまとめるクラス"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._flights: Dict[Tuple, _Flight] = {}
+        self._device_locks: Dict[Tuple, threading.Lock] = {}
+
+        # 統計カウンター
+        self.stats = {
+            'executions': 0,
+            'coalesced': 0,
+            'serialized': 0
+        }
+
+    @staticmethod
+    def make_key(kind: str, device_key: Tuple, commands: Iterable[str],
+                 name: Optional[str] = None) -> Tuple:
+        """
+        合流のキーを作成
+
+        Args:
+            kind: 実行の種類（結果の形式が異なるものを区別する。'scenario', 'commands' など）
+            device_key: デバイスのキー（ConnectionPool.make_key）
+            commands: 実行するコマンド
+            name: 実行の名前（シナリオ名など、結果に含まれるものを区別する）
+
+        Returns:
+            Tuple: (kind, device_key, name, 正規化したコマンド列のハッシュ)
+        """
+        digest = hashlib.sha256(
+            '\n'.join(normalize_command(command) for command in commands).encode('utf-8')
+        ).hexdigest()
+        return (kind, device_key, name, digest)
+
+    def do(self, key: Tuple, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        同じキーの実行中の処理があれば合流し、なければ実行する
+
+        Args:
+            key: make_keyで作成したキー
+            func: 実行する処理
+
+        Returns:
+            Tuple[Any, bool]: (結果, 合流した場合True)
+        """
+        with self.lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.stats['executions'] += 1
+            else:
+                flight.followers += 1
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            logger.info(f"Joined in-flight {key[0]} execution for {key[1][0]}")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = func()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    @contextmanager
+    def serialized(self, device_key: Tuple):
+        """
+        デバイスごとに1件ずつ実行するためのロック
+
+        Args:
+            device_key: デバイスのキー（ConnectionPool.make_key）
+        """
+        with self.lock:
+            device_lock = self._device_locks.setdefault(device_key, threading.Lock())
+            self.stats['serialized'] += 1
+        with device_lock:
+            yield
+
+    def run(self, kind: str, device_key: Tuple, commands: Iterable[str],
+            func: Callable[[], Any], name: Optional[str] = None) -> Tuple[Any, bool]:
+        """
+        参照系のみの実行は合流させ、設定変更系を含む実行はデバイス単位で直列化して実行
+
+        Args:
+            kind: 実行の種類
+            device_key: デバイスのキー（ConnectionPool.make_key）
+            commands: 実行するコマンド
+            func: 実行する処理
+            name: 実行の名前（シナリオ名など）
+
+        Returns:
+            Tuple[Any, bool]: (結果, 合流した場合True)
+        """
+        commands = list(commands)
+        if all(is_read_only(command) for command in commands):
+            return self.do(self.make_key(kind, device_key, commands, name), func)
+        with self.serialized(device_key):
+            return func(), False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """合流の統計を取得"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._flights)
+        return stats
+
+
+# グローバルインスタンス
+single_flight = SingleFlight()
+
+def get_single_flight() -> SingleFlight:
+    """シングルフライトインスタンスを取得"""
+    return single_flight
@@ -0,0 +1,48 @@
+"""
+テスト共通設定
+リポジトリ直下のモジュールをインポートできるようにし、作業ディレクトリを一時ディレクトリに移す
+"""
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+def pytest_configure(config):
+    """グローバルなログ管理インスタンス等が作るlogs/をリポジトリに残さないよう一時ディレクトリで実行"""
+    os.chdir(tempfile.mkdtemp(prefix='network-executor-tests-'))
+
+
+@pytest.fixture
+def fake_ssh(monkeypatch):
+    """SSH接続を疑似デバイスに置き換える（clients に作成したクライアント、options にその引数）"""
+    from fake_devices import FakeSSHClient
+    from network_executor import NetworkDeviceExecutor
+
+    clients = []
+    options = {}
+
+    def connect_ssh(self):
+        client = FakeSSHClient(**options)
+        clients.append(client)
+        self._bind_io_target(client)
+        self.connection = client
+        return True
+
+    monkeypatch.setattr(NetworkDeviceExecutor, '_connect_ssh', connect_ssh)
+    return SimpleNamespace(clients=clients, options=options)
+
+
+@pytest.fixture
+def telnet_device():
+    """ローカルで待ち受ける疑似Telnetデバイス"""
+    from fake_devices import FakeTelnetDevice
+
+    device = FakeTelnetDevice()
+    yield device
+    device.close()
@@ -0,0 +1,175 @@
+"""
+テスト用の疑似デバイス（paramiko.SSHClient の代わりの接続とローカルのTelnetデバイス）
+"""
+import asyncio
+import io
+import threading
+import time
+
+from async_loop import BackgroundEventLoop
+
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+
+class FakeShellChannel:
+    """invoke_shell のチャネル。送信したコマンドにエコー・出力・プロンプトで応答する"""
+
+    def __init__(self, hostname: str, banner: str, mode: str, secret: str = None):
+        self.hostname = hostname
+        self.mode = mode
+        self.secret = secret
+        self.sent = []
+        self.writes = []
+        self.closed = False
+        self._buffer = f"{banner}\r\n{self._prompt()}".encode()
+        self._awaiting_secret = False
+
+    def _prompt(self) -> str:
+        return f"{self.hostname}{self.mode}"
+
+    def settimeout(self, timeout):
+        pass
+
+    def send(self, data: str):
+        self.writes.append(data)
+        for line in data.split('\n')[:-1]:
+            self.sent.append(line)
+            if self._awaiting_secret:
+                self._awaiting_secret = False
+                if line == self.secret:
+                    self.mode = '#'
+                self._buffer += f"\r\n{self._prompt()}".encode()
+            elif line == 'enable':
+                self._awaiting_secret = True
+                self._buffer += b"enable\r\nPassword: "
+            else:
+                self._buffer += f"{line}\r\noutput of {line}\r\n{self._prompt()}".encode()
+
+    def recv(self, size: int) -> bytes:
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def close(self):
+        self.closed = True
+
+
+class FakeChannelFile(io.BytesIO):
+    """exec_command の stdout / stderr"""
+
+
+class FakeSSHClient:
+    """paramiko.SSHClient の代わり。exec_command の同時実行数を記録する"""
+
+    def __init__(self, hostname: str = 'r1', banner: str = 'Welcome', mode: str = '#',
+                 secret: str = None, exec_delay: float = 0.0):
+        self.hostname = hostname
+        self.banner = banner
+        self.mode = mode
+        self.secret = secret
+        self.exec_delay = exec_delay
+        self.transport = FakeTransport()
+        self.channels = []
+        self.executed = []
+        self.active_execs = 0
+        self.max_active_execs = 0
+        self.lock = threading.Lock()
+
+    def get_transport(self):
+        return self.transport
+
+    def invoke_shell(self, width: int = 80):
+        channel = FakeShellChannel(self.hostname, self.banner, self.mode, self.secret)
+        self.channels.append(channel)
+        return channel
+
+    def exec_command(self, command: str, timeout: float = None):
+        with self.lock:
+            self.executed.append(command)
+            self.active_execs += 1
+            self.max_active_execs = max(self.max_active_execs, self.active_execs)
+        time.sleep(self.exec_delay)
+        with self.lock:
+            self.active_execs -= 1
+        return None, FakeChannelFile(f"output of {command}\n".encode()), FakeChannelFile(b'')
+
+    def close(self):
+        self.transport.active = False
+
+
+IAC = 255
+
+
+def strip_telnet_negotiation(data: bytes) -> bytes:
+    """クライアントが送るTelnetのネゴシエーションを取り除く"""
+    output = bytearray()
+    index = 0
+    while index < len(data):
+        if data[index] != IAC or index + 1 >= len(data):
+            output.append(data[index])
+            index += 1
+        elif data[index + 1] in (251, 252, 253, 254):
+            index += 3
+        elif data[index + 1] == 250:
+            end = data.find(bytes([IAC, 240]), index)
+            index = len(data) if end < 0 else end + 2
+        else:
+            index += 2
+    return bytes(output)
+
+
+class FakeTelnetDevice:
+    """ログインしてコマンドに応答するだけのTelnetデバイス"""
+
+    def __init__(self):
+        self.loop = BackgroundEventLoop('fake-telnet-device')
+        self.logins = 0
+        self.received = []
+        self.server = self.loop.run(asyncio.start_server(self._handle, '127.0.0.1', 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        buffer = b''
+
+        async def read_line():
+            nonlocal buffer
+            while b'\r' not in buffer and b'\n' not in buffer:
+                data = await reader.read(1024)
+                if not data:
+                    return None
+                buffer += strip_telnet_negotiation(data)
+            line, _, buffer = buffer.replace(b'\r\n', b'\n').replace(b'\r', b'\n').partition(b'\n')
+            return line.decode().strip()
+
+        writer.write(b'\r\nUser login: ')
+        await read_line()
+        writer.write(b'Password: ')
+        await read_line()
+        self.logins += 1
+        writer.write(b'\r\nr1#')
+        while True:
+            line = await read_line()
+            if line is None:
+                break
+            if line:
+                self.received.append(line)
+                writer.write(line.encode() + b'\r\noutput of ' + line.encode() + b'\r\nr1#')
+
+    def device_config(self) -> dict:
+        return {
+            'host': '127.0.0.1',
+            'port': self.port,
+            'username': 'admin',
+            'password': 'secret',
+            'connection_type': 'telnet',
+            'device_type': 'cisco_ios'
+        }
+
+    def close(self):
+        self.server.close()
+        self.loop.stop()
@@ -0,0 +1,54 @@
+"""
+適応タイムアウトのテスト
+"""
+from adaptive_timeouts import AdaptiveTimeoutModel
+
+DEVICE = {'hostname': 'r1'}
+
+
+def make_model(samples, **kwargs):
+    model = AdaptiveTimeoutModel(multiplier=3, command_floor=1, scenario_floor=1,
+                                 min_samples=5, fallback_after=2, enabled=True, **kwargs)
+    model.get_samples = lambda device_name, command: samples.get(command, [])
+    return model
+
+
+def test_command_timeout_uses_p99_multiple():
+    model = make_model({'show version': [1.0] * 10})
+
+    assert model.device_command_timeout(DEVICE, 'show version', 30) == 3.0
+
+
+def test_explicit_device_timeout_wins_over_history():
+    model = make_model({'show version': [1.0] * 10})
+    device = {'hostname': 'r1', 'timeouts': {'command': 45}}
+
+    assert model.device_command_timeout(device, 'show version', 45) == 45
+    assert model.device_scenario_timeout(device, ['show version'], {}, 300) == 3.0
+
+
+def test_adaptive_timeouts_can_be_disabled_per_device():
+    model = make_model({'show version': [1.0] * 10})
+    device = {'hostname': 'r1', 'adaptive_timeouts': False}
+
+    assert model.device_command_timeout(device, 'show version', 30) == 30
+
+
+def test_repeated_timeouts_fall_back_to_default_until_success():
+    model = make_model({'show tech': [1.0] * 10})
+
+    model.record_timeout('r1', 'show tech')
+    assert model.device_command_timeout(DEVICE, 'show tech', 30) == 3.0
+    model.record_timeout('r1', 'show tech')
+    assert model.device_command_timeout(DEVICE, 'show tech', 30) == 30
+    assert model.device_scenario_timeout(DEVICE, ['show tech'], {}, 300) == 300
+    model.record_success('r1', 'show tech')
+    assert model.device_command_timeout(DEVICE, 'show tech', 30) == 3.0
+
+
+def test_scenario_timeout_expands_command_groups():
+    model = make_model({'show version': [1.0] * 10, 'show clock': [2.0] * 10})
+    command_groups = {'basic': {'commands': ['show version', 'show clock']}}
+
+    assert model.device_scenario_timeout(DEVICE, ['basic'], command_groups, 300) == 9.0
+    assert model.device_scenario_timeout(DEVICE, ['basic', 'show bgp'], command_groups, 300) == 300
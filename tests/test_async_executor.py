@@ -0,0 +1,42 @@
+"""
+非同期実行エンジン（Telnetのバッチ実行）のテスト
+"""
+from async_executor import run_scenario_batch
+from connection_governor import get_connection_governor
+
+SCENARIO = {'name': 'check', 'commands': ['show version', 'show clock']}
+
+
+def test_batch_runs_scenario_over_telnet(telnet_device):
+    results = run_scenario_batch({'r1': telnet_device.device_config()}, SCENARIO, {})
+
+    result = results['r1']
+    assert result['success']
+    assert [r['output'] for r in result['results']] == [
+        'output of show version\n', 'output of show clock\n'
+    ]
+    assert telnet_device.received == ['terminal length 0', 'terminal width 511', 'show version', 'show clock']
+
+
+def test_second_batch_reuses_pooled_session_through_governor(telnet_device):
+    governor = get_connection_governor()
+    acquired_before = governor.get_stats()['acquired']
+
+    run_scenario_batch({'r1': telnet_device.device_config()}, SCENARIO, {})
+    results = run_scenario_batch({'r1': telnet_device.device_config()}, SCENARIO, {})
+
+    assert results['r1']['success']
+    assert telnet_device.logins == 1
+    assert telnet_device.received.count('terminal length 0') == 1
+    stats = governor.get_stats()
+    assert stats['acquired'] - acquired_before == 2
+    assert stats['active_sessions'] == 0
+
+
+def test_unreachable_device_fails_without_holding_a_governor_slot(telnet_device):
+    config = dict(telnet_device.device_config(), port=1)
+
+    results = run_scenario_batch({'r1': config}, SCENARIO, {})
+
+    assert not results['r1']['success']
+    assert get_connection_governor().get_stats()['active_sessions'] == 0
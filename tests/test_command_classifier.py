@@ -0,0 +1,63 @@
+"""
+コマンド分類のテスト
+"""
+import pytest
+
+from command_classifier import (
+    classify_command, is_memoizable, is_read_only, normalize_command, split_read_only_runs
+)
+
+
+@pytest.mark.parametrize('command, expected', [
+    ('show version', 'show'),
+    ('sh ip int brief', 'show'),
+    ('  SHO run', 'show'),
+    ('dir flash:', 'show'),
+    ('conf t', 'configure'),
+    ('configure terminal', 'configure'),
+    ('ping 192.0.2.1', 'ping'),
+    ('trace 192.0.2.1', 'traceroute'),
+    ('reload', 'other'),
+    ('', 'other'),
+])
+def test_classify_command(command, expected):
+    command_type = classify_command(command)
+
+    assert command_type == expected
+
+
+def test_read_only_and_memoizable_commands():
+    assert is_read_only('show clock')
+    assert is_read_only('ping 192.0.2.1')
+    assert not is_read_only('write memory')
+    assert is_memoizable('sh version')
+    assert not is_memoizable('ping 192.0.2.1')
+
+
+@pytest.mark.parametrize('command', [
+    'show clock\nconfigure terminal\nno ip routing\nend',
+    'show clock\rreload',
+    'show version\x1a',
+])
+def test_commands_with_control_characters_are_not_read_only(command):
+    assert not is_read_only(command)
+    assert not is_memoizable(command)
+    assert split_read_only_runs([command]) == [(False, [command])]
+
+
+def test_normalize_command_expands_show_and_collapses_spaces():
+    normalized = normalize_command('  sh   ip  route VRF-A ')
+
+    assert normalized == 'show ip route VRF-A'
+
+
+def test_config_block_is_kept_sequential():
+    commands = ['show ver', 'show ip', 'conf t', 'hostname r1', 'do show run', 'end', 'show clock']
+
+    runs = split_read_only_runs(commands)
+
+    assert runs == [
+        (True, ['show ver', 'show ip']),
+        (False, ['conf t', 'hostname r1', 'do show run', 'end']),
+        (True, ['show clock']),
+    ]
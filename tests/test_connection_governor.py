@@ -0,0 +1,79 @@
+"""
+接続ガバナー（同時セッション数・ログインレート）のテスト
+"""
+import threading
+import time
+
+from connection_governor import ConnectionGovernor
+
+
+def test_login_burst_is_allowed_then_rate_limited():
+    governor = ConnectionGovernor(fleet_limit=100, login_rate=20, login_burst=3)
+    device = {'host': '192.0.2.1'}
+
+    burst_start = time.monotonic()
+    tickets = [governor.acquire(device) for _ in range(3)]
+    burst_time = time.monotonic() - burst_start
+    limited = governor.acquire(device)
+
+    assert burst_time < 0.05
+    # バーストを使い切った後は1/20秒ごとにトークンが補充される
+    assert limited.wait_time >= 0.03
+    assert governor.get_stats()['logins'] == 4
+    for ticket in tickets + [limited]:
+        governor.release(ticket)
+
+
+def test_reused_session_does_not_consume_login_token():
+    governor = ConnectionGovernor(login_rate=1, login_burst=1)
+    device = {'host': '192.0.2.1'}
+    governor.release(governor.acquire(device))
+
+    ticket = governor.acquire(device, new_login=False, timeout=0.1)
+
+    assert ticket is not None
+    assert ticket.wait_time < 0.05
+
+
+def test_acquire_times_out_when_tokens_are_exhausted():
+    governor = ConnectionGovernor(login_rate=0.5, login_burst=1)
+    device = {'host': '192.0.2.1'}
+    governor.acquire(device)
+
+    ticket = governor.acquire(device, timeout=0.05)
+
+    assert ticket is None
+    assert governor.get_stats()['timeouts'] == 1
+
+
+def test_site_limit_waits_for_release():
+    governor = ConnectionGovernor(site_limit=1, login_rate=0)
+    device = {'host': '192.0.2.1', 'site': 'tokyo'}
+    first = governor.acquire(device)
+    acquired = []
+
+    def second_acquire():
+        acquired.append(governor.acquire(dict(device, host='192.0.2.2'), timeout=2))
+
+    thread = threading.Thread(target=second_acquire)
+    thread.start()
+    time.sleep(0.05)
+    waiting_before_release = not acquired
+    governor.release(first)
+    thread.join(timeout=2)
+
+    assert waiting_before_release
+    assert acquired and acquired[0] is not None
+    assert acquired[0].wait_time >= 0.04
+
+
+def test_group_limit_is_per_group():
+    governor = ConnectionGovernor(group_limit=1, login_rate=0)
+
+    core = governor.acquire({'host': '192.0.2.1', 'group': 'core'})
+    edge = governor.acquire({'host': '192.0.2.2', 'group': 'edge'}, timeout=0.05)
+    second_core = governor.acquire({'host': '192.0.2.3', 'group': 'core'}, timeout=0.05)
+
+    assert core is not None
+    assert edge is not None
+    assert second_core is None
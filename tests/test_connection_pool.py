@@ -0,0 +1,134 @@
+"""
+接続プールのテスト
+"""
+import time
+
+from connection_pool import ConnectionPool
+
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+
+class FakeClient:
+    """paramiko.SSHClient の代わりの接続"""
+
+    def __init__(self):
+        self.transport = FakeTransport()
+        self.closed = False
+
+    def get_transport(self):
+        return self.transport
+
+
+def close_client(client):
+    client.closed = True
+
+
+DEVICE = {'host': '192.0.2.1', 'username': 'admin', 'password': 'secret', 'connection_type': 'ssh'}
+
+
+def test_released_session_is_reused():
+    pool = ConnectionPool(reap_interval=0)
+    key = pool.make_key(DEVICE)
+    client = FakeClient()
+    session = pool.register(key, client, close_client)
+
+    pool.release(session)
+    reused = pool.acquire(key)
+
+    assert reused is session
+    assert reused.in_use
+    assert pool.get_stats()['hits'] == 1
+
+
+def test_session_in_use_is_not_handed_out_twice():
+    pool = ConnectionPool(reap_interval=0)
+    key = pool.make_key(DEVICE)
+    pool.register(key, FakeClient(), close_client)
+
+    session = pool.acquire(key)
+
+    assert session is None
+    assert pool.get_stats()['misses'] == 1
+
+
+def test_dead_session_is_discarded_on_acquire():
+    pool = ConnectionPool(reap_interval=0)
+    key = pool.make_key(DEVICE)
+    client = FakeClient()
+    pool.release(pool.register(key, client, close_client))
+    client.transport.active = False
+
+    session = pool.acquire(key)
+
+    assert session is None
+    assert client.closed
+    assert pool.get_stats()['total_sessions'] == 0
+
+
+def test_idle_sessions_are_evicted_after_timeout():
+    pool = ConnectionPool(idle_timeout=0.01, reap_interval=0)
+    key = pool.make_key(DEVICE)
+    client = FakeClient()
+    pool.release(pool.register(key, client, close_client))
+    time.sleep(0.05)
+
+    evicted = pool.evict_idle()
+
+    assert evicted == 1
+    assert client.closed
+    assert pool.acquire(key) is None
+
+
+def test_reaper_thread_closes_idle_sessions():
+    pool = ConnectionPool(idle_timeout=0.01, reap_interval=0.02)
+    key = pool.make_key(DEVICE)
+    client = FakeClient()
+    pool.release(pool.register(key, client, close_client))
+
+    deadline = time.time() + 2
+    while not client.closed and time.time() < deadline:
+        time.sleep(0.01)
+    pool.close_all()
+
+    assert client.closed
+
+
+def test_oldest_idle_session_is_evicted_when_full():
+    pool = ConnectionPool(max_sessions=1, reap_interval=0)
+    first_client = FakeClient()
+    pool.release(pool.register(pool.make_key(DEVICE), first_client, close_client))
+
+    other_key = pool.make_key(dict(DEVICE, host='192.0.2.2'))
+    pool.register(other_key, FakeClient(), close_client)
+
+    assert first_client.closed
+    assert pool.get_stats()['total_sessions'] == 1
+
+
+def test_overflow_session_is_closed_on_release():
+    pool = ConnectionPool(max_sessions=1, reap_interval=0)
+    pool.register(pool.make_key(DEVICE), FakeClient(), close_client)
+    overflow_client = FakeClient()
+    overflow = pool.register(pool.make_key(dict(DEVICE, host='192.0.2.2')), overflow_client, close_client)
+
+    pool.release(overflow)
+
+    assert not overflow.pooled
+    assert overflow_client.closed
+
+
+def test_key_changes_with_credentials():
+    changed = dict(DEVICE, password='rotated')
+
+    key = ConnectionPool.make_key(DEVICE)
+    changed_key = ConnectionPool.make_key(changed)
+
+    assert key != changed_key
+    assert key[:4] == changed_key[:4]
+    assert 'secret' not in key
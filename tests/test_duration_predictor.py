@@ -0,0 +1,21 @@
+"""
+実行時間予測・LPT順・メイクスパン計算のテスト
+"""
+from duration_predictor import DurationPredictor, simulate_makespan
+
+
+def test_makespan_assigns_jobs_to_first_free_worker():
+    makespan = simulate_makespan([4, 3, 2, 1], 2)
+
+    assert makespan == 5
+
+
+def test_longest_first_order_shortens_makespan():
+    predictor = DurationPredictor(default_duration=1)
+    predictions = {'a': 1, 'b': 1, 'c': 1, 'd': 1, 'long': 4}
+
+    ordered = predictor.order_longest_first(list(predictions), predictions)
+
+    assert ordered[0] == 'long'
+    assert simulate_makespan([predictions[job] for job in ordered], 2) == 4
+    assert simulate_makespan([predictions[job] for job in predictions], 2) == 6
@@ -0,0 +1,92 @@
+"""
+到達性キャッシュ（ホスト単位のサーキットブレーカー）のテスト
+"""
+import time
+
+import paramiko
+
+from health_cache import DEFAULT_FAILURE_THRESHOLD, HostHealthCache, is_transport_error
+
+KEY = ('192.0.2.1', 22)
+
+
+def open_circuit(cache: HostHealthCache):
+    for _ in range(cache.failure_threshold):
+        cache.record_failure(KEY, 'timed out')
+
+
+def test_default_threshold_tolerates_transient_failures():
+    cache = HostHealthCache()
+
+    for _ in range(DEFAULT_FAILURE_THRESHOLD - 1):
+        cache.record_failure(KEY, 'timed out')
+
+    assert DEFAULT_FAILURE_THRESHOLD >= 3
+    assert cache.check(KEY) is None
+
+
+def test_circuit_opens_after_threshold_failures():
+    cache = HostHealthCache(base_backoff=30, failure_threshold=3)
+
+    open_circuit(cache)
+    retry_in = cache.check(KEY)
+
+    assert retry_in is not None and 29 < retry_in <= 30
+    assert cache.get_stats()['fast_failures'] == 1
+
+
+def test_half_open_allows_a_single_probe():
+    cache = HostHealthCache(base_backoff=0.02, failure_threshold=2)
+    open_circuit(cache)
+    time.sleep(0.05)
+
+    probe = cache.check(KEY)
+    concurrent = cache.check(KEY)
+
+    assert probe is None
+    assert concurrent is not None
+    assert cache.get_stats()['hosts']['192.0.2.1:22']['state'] == 'half_open'
+
+
+def test_successful_probe_closes_circuit():
+    cache = HostHealthCache(base_backoff=0.02, failure_threshold=2)
+    open_circuit(cache)
+    time.sleep(0.05)
+    cache.check(KEY)
+
+    cache.record_success(KEY)
+
+    assert cache.check(KEY) is None
+    assert cache.get_stats()['recoveries'] == 1
+
+
+def test_failed_probe_doubles_backoff():
+    cache = HostHealthCache(base_backoff=0.02, max_backoff=10, failure_threshold=2)
+    open_circuit(cache)
+    time.sleep(0.05)
+    cache.check(KEY)
+
+    cache.record_failure(KEY, 'timed out')
+    retry_in = cache.check(KEY)
+
+    assert retry_in is not None and 0.02 < retry_in <= 0.04
+
+
+def test_cancelled_probe_lets_next_caller_probe():
+    cache = HostHealthCache(base_backoff=0.02, failure_threshold=2)
+    open_circuit(cache)
+    time.sleep(0.05)
+    cache.check(KEY)
+
+    cache.cancel_probe(KEY)
+    next_probe = cache.check(KEY)
+
+    assert next_probe is None
+    assert cache.get_stats()['probes'] == 2
+
+
+def test_only_transport_errors_count_as_unreachable():
+    assert is_transport_error(ConnectionRefusedError())
+    assert is_transport_error(TimeoutError())
+    assert not is_transport_error(paramiko.AuthenticationException('bad password'))
+    assert not is_transport_error(None)
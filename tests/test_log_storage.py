@@ -0,0 +1,171 @@
+"""
+ログストレージ（JSONL / SQLite）のテスト
+"""
+import os
+from datetime import datetime
+
+import pytest
+
+from log_storage import JsonlLogStorage, SqliteLogStorage, migrate_jsonl_to_sqlite, read_lines_reversed
+
+
+def command_entry(device_name: str, command: str, timestamp: str, success: bool = True) -> dict:
+    return {
+        'session_id': f"{device_name}_{timestamp}",
+        'timestamp': timestamp,
+        'device_name': device_name,
+        'command': command,
+        'success': success,
+        'execution_time': 1.0,
+        'output': 'ok'
+    }
+
+
+def scenario_entry(device_name: str, scenario_name: str, timestamp: str) -> dict:
+    return {
+        'session_id': f"scenario_{device_name}_{scenario_name}_{timestamp}",
+        'timestamp': timestamp,
+        'device_name': device_name,
+        'scenario_name': scenario_name,
+        'success': True,
+        'total_time': 5.0
+    }
+
+
+ENTRIES = [
+    command_entry('r1', 'show version', '2026-01-01T10:00:00'),
+    command_entry('r2', 'show version', '2026-01-01T11:00:00'),
+    command_entry('r1', 'show clock', '2026-01-02T09:00:00'),
+    scenario_entry('r1', 'daily', '2026-01-02T09:30:00'),
+    command_entry('r1', 'show version', '2026-01-03T08:00:00', success=False),
+    command_entry('r2', 'show clock', '2026-01-03T12:00:00'),
+]
+
+
+@pytest.fixture(params=['jsonl', 'sqlite'])
+def storage(request, tmp_path):
+    if request.param == 'jsonl':
+        log_storage = JsonlLogStorage(tmp_path)
+    else:
+        log_storage = SqliteLogStorage(tmp_path / 'logs.db')
+    log_storage.append_many(ENTRIES)
+    log_storage.flush()
+    yield log_storage
+    log_storage.close()
+
+
+def timestamps(entries):
+    return [entry['timestamp'] for entry in entries]
+
+
+def test_query_filters_by_device_and_command(storage):
+    entries = storage.query(device_name='r1', command='show version')
+
+    assert timestamps(entries) == ['2026-01-03T08:00:00', '2026-01-01T10:00:00']
+
+
+def test_query_filters_by_scenario(storage):
+    entries = storage.query(scenario_name='daily')
+
+    assert [entry['scenario_name'] for entry in entries] == ['daily']
+
+
+def test_query_filters_by_date_range(storage):
+    entries = storage.query(start_date='2026-01-02', end_date='2026-01-02')
+
+    assert timestamps(entries) == ['2026-01-02T09:30:00', '2026-01-02T09:00:00']
+
+
+def test_query_limit_returns_newest_entries(storage):
+    entries = storage.query(limit=3)
+
+    assert timestamps(entries) == [
+        '2026-01-03T12:00:00', '2026-01-03T08:00:00', '2026-01-02T09:30:00'
+    ]
+
+
+def test_query_limit_applies_after_filters(storage):
+    entries = storage.query(device_name='r2', limit=1)
+
+    assert timestamps(entries) == ['2026-01-03T12:00:00']
+
+
+def test_jsonl_query_limit_skips_older_day_files(tmp_path, monkeypatch):
+    storage = JsonlLogStorage(tmp_path)
+    storage.append_many(ENTRIES)
+    storage.flush()
+    read_files = []
+    original = read_lines_reversed
+
+    def recording_read(path, *args, **kwargs):
+        read_files.append(path.name)
+        return original(path, *args, **kwargs)
+
+    monkeypatch.setattr('log_storage.read_lines_reversed', recording_read)
+
+    entries = storage.query(device_name='r1', limit=1)
+
+    assert timestamps(entries) == ['2026-01-03T08:00:00']
+    assert read_files == ['r1_20260103.log']
+    storage.close()
+
+
+def test_read_lines_reversed_handles_lines_across_blocks(tmp_path):
+    path = tmp_path / 'sample.log'
+    path.write_bytes(b'first line\n\nsecond line\nthird\n')
+
+    lines = list(read_lines_reversed(path, block_size=4))
+
+    assert lines == [b'third', b'second line', b'first line']
+
+
+def test_sqlite_delete_before_removes_old_entries(tmp_path):
+    storage = SqliteLogStorage(tmp_path / 'logs.db')
+    storage.append_many(ENTRIES)
+
+    storage.delete_before(datetime(2026, 1, 2))
+
+    assert min(timestamps(storage.query(limit=None))) == '2026-01-02T09:00:00'
+    storage.close()
+
+
+def test_jsonl_delete_before_removes_old_files(tmp_path):
+    storage = JsonlLogStorage(tmp_path)
+    storage.append_many(ENTRIES)
+    storage.flush()
+    old_file = tmp_path / 'r2_20260101.log'
+    old_time = datetime(2026, 1, 1).timestamp()
+    os.utime(old_file, (old_time, old_time))
+
+    storage.delete_before(datetime(2026, 1, 2))
+
+    assert not old_file.exists()
+    assert storage.query(device_name='r2', start_date='2026-01-01', end_date='2026-01-01') == []
+    storage.close()
+
+
+def test_sqlite_summary_counts_sessions(tmp_path):
+    storage = SqliteLogStorage(tmp_path / 'logs.db')
+    storage.append_many(ENTRIES)
+
+    summary = storage.summary()
+    storage.close()
+
+    assert summary['total_sessions'] == len(ENTRIES)
+    assert summary['failed_sessions'] == 1
+    assert summary['device_count'] == 2
+
+
+def test_migration_skips_entries_already_imported(tmp_path):
+    jsonl = JsonlLogStorage(tmp_path)
+    jsonl.append_many(ENTRIES)
+    jsonl.close()
+
+    first = migrate_jsonl_to_sqlite(tmp_path, tmp_path / 'logs.db')
+    second = migrate_jsonl_to_sqlite(tmp_path, tmp_path / 'logs.db')
+
+    assert first == len(ENTRIES)
+    assert second == 0
+    storage = SqliteLogStorage(tmp_path / 'logs.db')
+    assert len(storage.existing_keys()) == len(ENTRIES)
+    storage.close()
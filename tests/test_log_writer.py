@@ -0,0 +1,156 @@
+"""
+バックグラウンドログ書き込みのテスト
+"""
+import threading
+import time
+
+from log_writer import LogWriter
+
+
+def test_flush_waits_until_entries_are_written():
+    written = []
+    writer = LogWriter(written.extend, batch_size=100, flush_interval=0.05)
+    for index in range(5):
+        writer.submit({'index': index})
+
+    writer.flush()
+
+    assert [entry['index'] for entry in written] == [0, 1, 2, 3, 4]
+    writer.close()
+
+
+def test_entries_are_written_in_batches():
+    batches = []
+    writer = LogWriter(batches.append, batch_size=3, flush_interval=10)
+
+    for index in range(6):
+        writer.submit({'index': index})
+    writer.flush()
+
+    assert [len(batch) for batch in batches] == [3, 3]
+    writer.close()
+
+
+def test_close_drains_queue_and_stops_thread():
+    written = []
+    writer = LogWriter(written.extend, batch_size=100, flush_interval=10)
+    for index in range(10):
+        writer.submit({'index': index})
+
+    writer.close()
+
+    stats = writer.get_stats()
+    assert len(written) == 10
+    assert stats['written'] == 10
+    assert not stats['running']
+
+
+def test_submit_after_close_is_written_inline():
+    written = []
+    writer = LogWriter(written.extend)
+    writer.close()
+
+    writer.submit({'index': 0})
+
+    assert written == [{'index': 0}]
+    assert writer.get_stats()['inline_writes'] == 1
+
+
+def test_full_queue_falls_back_to_inline_write_after_timeout():
+    started = threading.Event()
+    release = threading.Event()
+    written = []
+
+    def slow_write(batch):
+        # 書き込みスレッドだけを止め、呼び出し元での書き出しは通す
+        if threading.current_thread().name == 'log-writer':
+            started.set()
+            release.wait(5)
+        written.extend(batch)
+
+    writer = LogWriter(slow_write, max_queue=1, batch_size=1, put_timeout=0.05)
+    writer.submit({'index': 0})
+    started.wait(5)  # 書き込みスレッドが取り出して止まるまで待つ
+    writer.submit({'index': 1})  # キューを埋める
+
+    writer.submit({'index': 2})
+
+    stats = writer.get_stats()
+    assert written == [{'index': 2}]
+    assert stats['backpressure_waits'] >= 1
+    assert stats['inline_writes'] == 1
+    release.set()
+    writer.close()
+    assert sorted(entry['index'] for entry in written) == [0, 1, 2]
+
+
+def test_write_error_is_counted_and_writer_keeps_running():
+    written = []
+
+    def flaky_write(batch):
+        if batch[0]['index'] == 0:
+            raise OSError('disk full')
+        written.extend(batch)
+
+    writer = LogWriter(flaky_write, batch_size=1)
+
+    writer.submit({'index': 0})
+    writer.submit({'index': 1})
+    writer.flush()
+
+    stats = writer.get_stats()
+    assert stats['errors'] == 1
+    assert written == [{'index': 1}]
+    assert stats['running']
+    writer.close()
+
+
+def blocked_writer(put_timeout):
+    started = threading.Event()
+    release = threading.Event()
+    written = []
+
+    def slow_write(batch):
+        if threading.current_thread().name == 'log-writer':
+            started.set()
+            release.wait(5)
+        written.extend(batch)
+
+    writer = LogWriter(slow_write, max_queue=1, batch_size=1, put_timeout=put_timeout)
+    writer.submit({'index': 0})
+    started.wait(5)
+    writer.submit({'index': 1})
+    return writer, release, written
+
+
+def test_waiting_submitters_do_not_serialize_each_other():
+    writer, release, written = blocked_writer(put_timeout=0.5)
+    submitters = [
+        threading.Thread(target=writer.submit, args=({'index': index},)) for index in (2, 3)
+    ]
+
+    started_at = time.monotonic()
+    for submitter in submitters:
+        submitter.start()
+    for submitter in submitters:
+        submitter.join()
+    elapsed = time.monotonic() - started_at
+
+    assert elapsed < 0.9
+    assert writer.get_stats()['inline_writes'] == 2
+    release.set()
+    writer.close()
+
+
+def test_close_keeps_entries_of_submitters_waiting_for_space():
+    writer, release, written = blocked_writer(put_timeout=5)
+    submitter = threading.Thread(target=writer.submit, args=({'index': 2},))
+    submitter.start()
+    while writer.get_stats()['backpressure_waits'] == 0:
+        time.sleep(0.01)
+
+    release.set()
+    writer.close()
+    submitter.join()
+
+    assert sorted(entry['index'] for entry in written) == [0, 1, 2]
@@ -0,0 +1,100 @@
+"""
+ログ管理（ジャーナル・スナップショット・インデックス）のテスト
+"""
+import json
+
+from logger_manager import LogManager
+
+
+def command_result(execution_time: float = 1.0, success: bool = True) -> dict:
+    return {'success': success, 'execution_time': execution_time, 'output': 'ok'}
+
+
+def test_journal_is_replayed_after_restart(tmp_path):
+    manager = LogManager(str(tmp_path), async_write=False)
+    manager.log_command_execution('r1', 'show version', command_result(1.5))
+    manager.log_command_execution('r2', 'show clock', command_result(0.5))
+    manager.close()
+
+    reloaded = LogManager(str(tmp_path), async_write=False)
+
+    assert reloaded.get_command_stats('r1', 'show version')['count'] == 1
+    assert [entry['execution_time'] for entry in reloaded.get_command_history('r2', 'show clock')] == [0.5]
+    reloaded.close()
+
+
+def test_torn_journal_line_is_skipped_on_replay(tmp_path):
+    manager = LogManager(str(tmp_path), async_write=False)
+    manager.log_command_execution('r1', 'show version', command_result())
+    manager.close()
+    journal_file = tmp_path / 'log_index.journal'
+    torn_record = json.dumps({'seq': 999, 'type': 'command', 'entry': {'device_name': 'r9'}})
+    with open(journal_file, 'a', encoding='utf-8') as f:
+        # クラッシュで途中まで書かれた行
+        f.write(torn_record[:len(torn_record) // 2])
+
+    reloaded = LogManager(str(tmp_path), async_write=False)
+    reloaded.log_command_execution('r2', 'show clock', command_result())
+    reloaded.close()
+    restarted = LogManager(str(tmp_path), async_write=False)
+
+    assert restarted.get_command_stats('r1', 'show version')['count'] == 1
+    assert restarted.get_command_stats('r2', 'show clock')['count'] == 1
+    assert restarted.get_command_stats('r9', 'show version') is None
+    restarted.close()
+
+
+def test_records_already_in_snapshot_are_not_replayed_twice(tmp_path):
+    manager = LogManager(str(tmp_path), async_write=False)
+    manager.log_command_execution('r1', 'show version', command_result())
+    journal_lines = (tmp_path / 'log_index.journal').read_text(encoding='utf-8')
+    with manager.lock:
+        manager.save_log_index()
+    manager.close()
+    # スナップショット後にジャーナルの削除前の内容が残っていた場合
+    (tmp_path / 'log_index.journal').write_text(journal_lines, encoding='utf-8')
+
+    reloaded = LogManager(str(tmp_path), async_write=False)
+
+    assert reloaded.get_command_stats('r1', 'show version')['count'] == 1
+    reloaded.close()
+
+
+def test_scenario_history_is_restored_from_snapshot(tmp_path):
+    manager = LogManager(str(tmp_path), async_write=False)
+    manager.log_scenario_execution('r1', 'daily', {'success': True, 'total_time': 12.0, 'results': []})
+    with manager.lock:
+        manager.save_log_index()
+    manager.close()
+
+    reloaded = LogManager(str(tmp_path), async_write=False)
+
+    assert reloaded.get_scenario_history('r1', 'daily') == [12.0]
+    reloaded.close()
+
+
+def test_summary_counts_sessions_beyond_index_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr('logger_manager.LOG_INDEX_MAX_SESSIONS', 2)
+    manager = LogManager(str(tmp_path), async_write=False)
+    for index in range(5):
+        manager.log_command_execution(f"r{index}", 'show version', command_result(success=index != 0))
+    manager.close()
+
+    reloaded = LogManager(str(tmp_path), async_write=False)
+    summary = reloaded.get_log_summary()
+
+    assert len(reloaded.log_index['sessions']) == 2
+    assert summary['total_sessions'] == 5
+    assert summary['successful_sessions'] == 4
+    assert summary['failed_sessions'] == 1
+    reloaded.close()
+
+
+def test_clear_logs_resets_session_counts(tmp_path):
+    manager = LogManager(str(tmp_path), async_write=False)
+    manager.log_command_execution('r1', 'show version', command_result())
+
+    manager.clear_logs()
+
+    assert manager.get_log_summary()['total_sessions'] == 0
+    manager.close()
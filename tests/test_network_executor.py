@@ -0,0 +1,152 @@
+"""
+ネットワーク実行（NetworkDeviceExecutor）のテスト
+"""
+import time
+
+import paramiko
+import pytest
+
+from health_cache import HostHealthCache
+from network_executor import NetworkDeviceExecutor
+
+
+def make_executor(host: str) -> NetworkDeviceExecutor:
+    executor = NetworkDeviceExecutor({
+        'host': host,
+        'hostname': host,
+        'username': 'admin',
+        'password': 'secret',
+        'connection_type': 'ssh'
+    })
+    executor.health_cache = HostHealthCache(failure_threshold=1)
+    return executor
+
+
+@pytest.fixture
+def failing_ssh_connect(monkeypatch):
+    def install(error):
+        def connect(self, **kwargs):
+            raise error
+        monkeypatch.setattr(paramiko.SSHClient, 'connect', connect)
+    return install
+
+
+def test_authentication_failure_does_not_open_circuit(failing_ssh_connect):
+    failing_ssh_connect(paramiko.AuthenticationException('Authentication failed.'))
+    executor = make_executor('192.0.2.10')
+
+    assert not executor.connect()
+    assert executor.connect_error_type == 'authentication'
+    assert executor.health_cache.check(executor.health_key) is None
+
+
+def test_refused_connection_opens_circuit(failing_ssh_connect):
+    failing_ssh_connect(ConnectionRefusedError('Connection refused'))
+    executor = make_executor('192.0.2.11')
+
+    assert not executor.connect()
+    assert executor.connect_error_type == 'connection'
+    assert executor.health_cache.check(executor.health_key) is not None
+
+
+def wait_until_fired(deadline):
+    while not deadline.fired:
+        time.sleep(0.01)
+    time.sleep(0.05)
+
+
+def test_command_deadline_closes_connection_captured_at_schedule_time():
+    executor = make_executor('192.0.2.20')
+    closed = []
+    executor._close_connection = closed.append
+    executor.connection = 'old'
+
+    with executor._deadline('command', 0.05) as deadline:
+        executor.connection = 'new'
+        wait_until_fired(deadline)
+
+    assert closed == ['old']
+
+
+def test_deadline_firing_after_scope_does_not_close_next_connection():
+    executor = make_executor('192.0.2.21')
+    closed = []
+    executor._close_connection = closed.append
+    executor.connection = 'old'
+
+    with executor._deadline('command', 10) as deadline:
+        pass
+    executor.connection = 'new'
+
+    assert not deadline.on_expire()
+    assert closed == []
+
+
+def test_connect_deadline_closes_connection_opened_inside_scope():
+    executor = make_executor('192.0.2.22')
+    closed = []
+    executor._close_connection = closed.append
+
+    with executor._deadline('connect', 0.05) as deadline:
+        executor._bind_io_target('pending')
+        wait_until_fired(deadline)
+
+    assert closed == ['pending']
+
+
+def make_memo_executor(host: str, sent: list) -> NetworkDeviceExecutor:
+    executor = make_executor(host)
+    executor.device_config['command_memo'] = True
+
+    def execute_single(command, connection_type):
+        sent.append(command)
+        return {'command': command, 'success': True, 'output': f"output of {command}",
+                'error_output': '', 'execution_time': 0.1}
+
+    executor._execute_single_command = execute_single
+    executor.connection = 'fake'
+    return executor
+
+
+def test_repeated_show_command_is_served_from_memo():
+    sent = []
+    executor = make_memo_executor('192.0.2.30', sent)
+
+    result = executor.execute_commands(['show version', 'show  version'])
+
+    assert sent == ['show version']
+    assert [r.get('memo_hit', False) for r in result['command_results']] == [False, True]
+    assert result['command_results'][1]['output'] == 'output of show version'
+
+
+def test_memo_is_not_reused_after_session_release():
+    sent = []
+    executor = make_memo_executor('192.0.2.31', sent)
+    executor.execute_commands(['show version'])
+
+    executor.connection = 'fake'
+    result = executor.execute_commands(['show version'])
+
+    assert sent == ['show version', 'show version']
+    assert not result['command_results'][0].get('memo_hit')
+
+
+def test_config_change_by_another_executor_expires_memo():
+    sent = []
+    executor = make_memo_executor('192.0.2.32', sent)
+    executor._update_command_memo({'command': 'show version', 'success': True, 'output': 'old'})
+    other = make_executor('192.0.2.32')
+
+    other._update_result_cache({'command': 'configure terminal', 'success': True, 'output': ''})
+
+    assert executor._memo_result('show version') is None
+
+
+def test_memo_is_disabled_by_default():
+    sent = []
+    executor = make_memo_executor('192.0.2.33', sent)
+    del executor.device_config['command_memo']
+
+    executor.execute_commands(['show version', 'show version'])
+
+    assert sent == ['show version', 'show version']
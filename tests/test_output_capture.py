@@ -0,0 +1,74 @@
+"""
+コマンド出力の退避と復元のテスト
+"""
+import os
+import time
+
+from output_capture import OutputBuffer, read_output, resolve_outputs, sweep_capture_dir
+
+
+def spilled_result(capture_dir, text: str) -> dict:
+    buffer = OutputBuffer(spill_threshold=8, capture_dir=str(capture_dir))
+    for start in range(0, len(text), 4):
+        buffer.write(text[start:start + 4].encode('utf-8'))
+    result = buffer.to_result()
+    result.update({'command': 'show tech', 'success': True})
+    return result
+
+
+def test_small_output_stays_in_memory(tmp_path):
+    buffer = OutputBuffer(spill_threshold=1024, capture_dir=str(tmp_path))
+    buffer.write(b'short output')
+
+    result = buffer.to_result()
+
+    assert result == {'output': 'short output'}
+    assert os.listdir(tmp_path) == []
+
+
+def test_output_over_threshold_is_spilled_to_a_file(tmp_path):
+    result = spilled_result(tmp_path, 'line 1\nline 2\nline 3\n')
+
+    assert result['output'].startswith('[output saved to ')
+    assert result['output_file']['size'] == len('line 1\nline 2\nline 3\n')
+    assert read_output(result) == 'line 1\nline 2\nline 3\n'
+
+
+def test_resolve_outputs_restores_command_and_aggregated_output(tmp_path):
+    command_result = spilled_result(tmp_path, 'interface Gi0/1\n')
+    result = {
+        'success': True,
+        'output': 'header\n' + command_result['output'] + '\n',
+        'output_files': [command_result['output_file']],
+        'command_results': [command_result],
+    }
+
+    resolve_outputs(result)
+
+    assert result['output'] == 'header\ninterface Gi0/1\n\n'
+    assert result['output_files'] == []
+    assert result['command_results'][0]['output'] == 'interface Gi0/1\n'
+    assert 'output_file' not in result['command_results'][0]
+
+
+def test_resolve_outputs_keeps_placeholder_when_file_is_gone(tmp_path):
+    command_result = spilled_result(tmp_path, 'x' * 32)
+    os.remove(command_result['output_file']['path'])
+    expected = command_result['output']
+
+    resolve_outputs(command_result)
+
+    assert command_result['output'] == expected
+
+
+def test_sweep_removes_only_expired_spill_files(tmp_path):
+    old = spilled_result(tmp_path, 'o' * 32)['output_file']['path']
+    new = spilled_result(tmp_path, 'n' * 32)['output_file']['path']
+    expired = time.time() - 7200
+    os.utime(old, (expired, expired))
+
+    removed = sweep_capture_dir(str(tmp_path), retention=3600, force=True)
+
+    assert removed == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
@@ -0,0 +1,73 @@
+"""
+参照系コマンドの複数チャネル並列実行のテスト
+"""
+import time
+
+from network_executor import NetworkDeviceExecutor
+
+
+def exec_device(host: str, **options) -> dict:
+    return dict({
+        'host': host,
+        'username': 'admin',
+        'password': 'secret',
+        'connection_type': 'ssh'
+    }, **options)
+
+
+def outputs(result):
+    return [r['output'] for r in result['command_results']]
+
+
+def test_read_only_commands_run_on_parallel_channels(fake_ssh):
+    fake_ssh.options['exec_delay'] = 0.2
+    executor = NetworkDeviceExecutor(exec_device('192.0.2.60', max_channels=3))
+    commands = ['show version', 'show clock', 'show interfaces']
+
+    started_at = time.monotonic()
+    result = executor.execute_commands(commands)
+    elapsed = time.monotonic() - started_at
+
+    assert outputs(result) == [f"output of {command}\n" for command in commands]
+    assert 2 <= fake_ssh.clients[0].max_active_execs <= 3
+    assert elapsed < 0.5
+
+
+def test_parallel_channels_respect_max_channels(fake_ssh):
+    fake_ssh.options['exec_delay'] = 0.05
+    executor = NetworkDeviceExecutor(exec_device('192.0.2.61', max_channels=2))
+    commands = [f"show interface Gi0/{index}" for index in range(6)]
+
+    result = executor.execute_commands(commands)
+
+    assert outputs(result) == [f"output of {command}\n" for command in commands]
+    assert fake_ssh.clients[0].max_active_execs <= 2
+
+
+def test_config_block_is_kept_serial_between_parallel_runs():
+    executor = NetworkDeviceExecutor(exec_device('192.0.2.62', max_channels=4))
+    commands = [
+        'show version', 'show clock',
+        'configure terminal', 'interface Gi0/1', 'do show interface Gi0/1', 'end',
+        'show running-config', 'show startup-config'
+    ]
+
+    batches = executor._plan_command_batches(commands)
+
+    assert batches == [
+        ('parallel', ['show version', 'show clock']),
+        ('single', ['configure terminal']),
+        ('single', ['interface Gi0/1']),
+        ('single', ['do show interface Gi0/1']),
+        ('single', ['end']),
+        ('parallel', ['show running-config', 'show startup-config']),
+    ]
+
+
+def test_single_channel_device_runs_commands_one_at_a_time(fake_ssh):
+    fake_ssh.options['exec_delay'] = 0.02
+    executor = NetworkDeviceExecutor(exec_device('192.0.2.63', max_channels=1))
+
+    executor.execute_commands(['show version', 'show clock'])
+
+    assert fake_ssh.clients[0].max_active_execs == 1
@@ -0,0 +1,76 @@
+"""
+プロンプト検出（増分走査）のテスト
+"""
+from prompt_matcher import PromptMatcher, get_prompt_matcher
+
+
+def test_prompt_split_across_chunks_is_detected():
+    scanner = PromptMatcher('router1').scanner()
+
+    completed = [
+        scanner.feed(b'Cisco IOS Software\r\n'),
+        scanner.feed(b'Version 15.2\r\nrou'),
+        scanner.feed(b'ter1'),
+        scanner.feed(b'#'),
+    ]
+
+    assert completed == [0, 0, 0, 1]
+    assert scanner.segments == ['Cisco IOS Software\nVersion 15.2']
+    assert scanner.last_prompt == 'router1#'
+
+
+def test_line_split_across_chunks_is_not_a_prompt():
+    scanner = PromptMatcher('router1').scanner()
+
+    scanner.feed('interface Gi0/1 desc uplink to ')
+    scanner.feed('core\nrouter1(config-if)#')
+
+    assert scanner.segments == ['interface Gi0/1 desc uplink to core']
+    assert scanner.last_prompt == 'router1(config-if)#'
+
+
+def test_multibyte_character_split_across_chunks_is_decoded():
+    scanner = PromptMatcher('router1').scanner()
+    data = 'description 東京\nrouter1#'.encode('utf-8')
+    split = data.index('京'.encode('utf-8')) + 1
+
+    scanner.feed(data[:split])
+    scanner.feed(data[split:])
+
+    assert scanner.segments == ['description 東京']
+
+
+def test_prompt_with_command_echo_separates_outputs():
+    scanner = PromptMatcher('router1').scanner()
+
+    scanner.feed('router1#show clock\n*10:00:00 JST\nrouter1#show ver\nIOS\nrouter1#')
+
+    assert scanner.segments == ['', '*10:00:00 JST', 'IOS']
+
+
+def test_unknown_hostname_matches_only_short_prompt_lines():
+    matcher = PromptMatcher()
+
+    assert matcher.is_prompt('switch01>')
+    assert matcher.is_prompt('switch01(config)#')
+    assert not matcher.is_prompt('Total 3 entries # of ports')
+    assert not matcher.is_prompt('x' * 300 + '#')
+
+
+def test_learned_hostname_is_used_for_later_prompts():
+    matcher = PromptMatcher()
+
+    learned = matcher.learn('edge-7#')
+
+    assert learned.hostname == 'edge-7'
+    assert learned.is_prompt('edge-7(config)# interface gi0/1')
+    assert not learned.is_prompt('core-1#')
+
+
+def test_matcher_is_compiled_once_per_prompt():
+    device = {'prompt': 'router9#'}
+
+    first = get_prompt_matcher(device)
+    second = get_prompt_matcher(dict(device))
+
+    assert first is second
@@ -0,0 +1,62 @@
+"""
+到達性事前チェックのテスト
+"""
+import asyncio
+import errno
+import socket
+
+import reachability
+from health_cache import HostHealthCache
+
+
+def test_host_side_errors_are_host_failures():
+    assert reachability.is_host_failure(asyncio.TimeoutError())
+    assert reachability.is_host_failure(ConnectionRefusedError())
+    assert reachability.is_host_failure(OSError(errno.EHOSTUNREACH, 'No route to host'))
+    assert reachability.is_host_failure(socket.gaierror(socket.EAI_NONAME, 'Name or service not known'))
+
+
+def test_local_errors_are_not_host_failures():
+    assert not reachability.is_host_failure(OSError(errno.EMFILE, 'Too many open files'))
+    assert not reachability.is_host_failure(OSError(errno.ENOBUFS, 'No buffer space available'))
+
+
+def test_default_concurrency_leaves_file_descriptor_headroom():
+    concurrency = reachability._default_probe_concurrency()
+
+    assert concurrency >= 1
+    if reachability.resource is not None:
+        soft_limit, _ = reachability.resource.getrlimit(reachability.resource.RLIMIT_NOFILE)
+        if soft_limit != reachability.resource.RLIM_INFINITY:
+            assert concurrency <= soft_limit // 2
+
+
+def test_refused_port_is_recorded_as_host_failure(monkeypatch):
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+    listener.close()
+    cache = HostHealthCache(failure_threshold=1)
+    monkeypatch.setattr(reachability, 'get_host_health_cache', lambda: cache)
+
+    results = reachability.probe_devices({'r1': {'host': '127.0.0.1', 'port': port}}, timeout=1)
+
+    assert not results['r1']['reachable']
+    assert results['r1']['host_failure']
+    assert cache.check(('127.0.0.1', port)) is not None
+
+
+def test_local_error_does_not_open_circuit(monkeypatch):
+    cache = HostHealthCache(failure_threshold=1)
+    monkeypatch.setattr(reachability, 'get_host_health_cache', lambda: cache)
+
+    async def too_many_files(host, port):
+        raise OSError(errno.EMFILE, 'Too many open files')
+
+    monkeypatch.setattr(reachability.asyncio, 'open_connection', too_many_files)
+
+    results = reachability.probe_devices({'r1': {'host': '192.0.2.1'}}, timeout=1)
+
+    assert not results['r1']['reachable']
+    assert not results['r1']['host_failure']
+    assert cache.check(('192.0.2.1', 22)) is None
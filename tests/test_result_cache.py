@@ -0,0 +1,134 @@
+"""
+showコマンド結果キャッシュのテスト
+"""
+import threading
+import time
+
+from result_cache import ENTRY_OVERHEAD, ResultCache, SharedResultStore
+
+DEVICE_KEY = ('192.0.2.1', 22, 'admin', 'ssh', 'digest')
+
+
+def show_result(command: str, output: str = 'output') -> dict:
+    return {'command': command, 'success': True, 'output': output, 'execution_time': 1.0}
+
+
+def test_cached_result_is_returned_within_ttl():
+    cache = ResultCache(default_ttl=30, db_path=None)
+    cache.put(DEVICE_KEY, 'show version', show_result('show version', 'IOS 15.2'))
+
+    cached = cache.get(DEVICE_KEY, 'sh  version')
+
+    assert cached['output'] == 'IOS 15.2'
+    assert cached['cache_hit']
+    assert cached['command'] == 'sh  version'
+    assert cached['execution_time'] == 0.0
+
+
+def test_entry_expires_after_ttl():
+    cache = ResultCache(default_ttl=0.02, db_path=None)
+    cache.put(DEVICE_KEY, 'show clock', show_result('show clock'))
+    time.sleep(0.05)
+
+    cached = cache.get(DEVICE_KEY, 'show clock')
+
+    assert cached is None
+    assert cache.get_stats()['entries'] == 0
+
+
+def test_max_age_shorter_than_ttl_misses():
+    cache = ResultCache(default_ttl=30, db_path=None)
+    cache.put(DEVICE_KEY, 'show version', show_result('show version'))
+    time.sleep(0.03)
+
+    cached = cache.get(DEVICE_KEY, 'show version', max_age=0.01)
+
+    assert cached is None
+    assert cache.get(DEVICE_KEY, 'show version', max_age=10) is not None
+
+
+def test_per_command_ttl_overrides_default():
+    cache = ResultCache(default_ttl=30, command_ttls={'show clock': 0}, db_path=None)
+
+    cache.put(DEVICE_KEY, 'show clock', show_result('show clock'))
+
+    assert cache.get(DEVICE_KEY, 'show clock') is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    entry_size = len('output') + len('show a') + ENTRY_OVERHEAD
+    cache = ResultCache(max_bytes=entry_size * 2, db_path=None)
+    cache.put(DEVICE_KEY, 'show a', show_result('show a'))
+    cache.put(DEVICE_KEY, 'show b', show_result('show b'))
+    cache.get(DEVICE_KEY, 'show a')
+
+    cache.put(DEVICE_KEY, 'show c', show_result('show c'))
+
+    assert cache.get(DEVICE_KEY, 'show a') is not None
+    assert cache.get(DEVICE_KEY, 'show b') is None
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_failed_and_config_commands_are_not_cached():
+    cache = ResultCache(db_path=None)
+
+    cache.put(DEVICE_KEY, 'show version', dict(show_result('show version'), success=False))
+    cache.put(DEVICE_KEY, 'write memory', show_result('write memory'))
+
+    assert cache.get_stats()['stores'] == 0
+
+
+def test_shared_store_serves_another_cache_instance(tmp_path):
+    db_path = str(tmp_path / 'result_cache.db')
+    writer = ResultCache(db_path=db_path)
+    reader = ResultCache(db_path=db_path)
+    writer.put(DEVICE_KEY, 'show version', show_result('show version', 'IOS 15.2'))
+    writer.flush()
+
+    cached = reader.get(DEVICE_KEY, 'show version', max_age=10)
+
+    assert cached['output'] == 'IOS 15.2'
+    assert reader.get_stats()['shared_hits'] == 1
+
+
+def test_invalidation_reaches_shared_store(tmp_path):
+    db_path = str(tmp_path / 'result_cache.db')
+    writer = ResultCache(db_path=db_path)
+    reader = ResultCache(db_path=db_path)
+    writer.put(DEVICE_KEY, 'show version', show_result('show version'))
+
+    writer.invalidate_device(DEVICE_KEY)
+    writer.flush()
+
+    assert reader.get(DEVICE_KEY, 'show version') is None
+
+
+def test_shared_store_evicts_oldest_results_over_byte_budget(tmp_path):
+    store = SharedResultStore(str(tmp_path / 'result_cache.db'), max_bytes=400)
+    for command in ('show a', 'show b', 'show c'):
+        store.put(DEVICE_KEY, command, show_result(command, 'x' * 100), ttl=30)
+        time.sleep(0.01)
+
+    remaining = [command for command in ('show a', 'show b', 'show c')
+                 if store.get(DEVICE_KEY, command) is not None]
+
+    assert remaining == ['show b', 'show c']
+    store.close()
+
+
+def test_shared_writes_happen_on_the_writer_thread(tmp_path, monkeypatch):
+    cache = ResultCache(db_path=str(tmp_path / 'result_cache.db'))
+    writer_threads = []
+    original_apply = SharedResultStore.apply
+
+    def recording_apply(store, operations):
+        writer_threads.append(threading.current_thread().name)
+        original_apply(store, operations)
+
+    monkeypatch.setattr(SharedResultStore, 'apply', recording_apply)
+
+    cache.put(DEVICE_KEY, 'show version', show_result('show version'))
+    cache.flush()
+
+    assert writer_threads == ['log-writer']
+    cache.close()
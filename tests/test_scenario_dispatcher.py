@@ -0,0 +1,218 @@
+"""
+シナリオ実行のディスパッチ（作業単位への展開・同時実行数・LPT投入）のテスト
+"""
+import threading
+import time
+
+import pytest
+
+import scenario_dispatcher
+from duration_predictor import DurationPredictor
+from scenario_dispatcher import (
+    build_work_items, dispatch_work_items, get_scenario_concurrency, plan_scenario_list,
+    simulate_dispatch
+)
+
+DEVICES = {name: {'host': name} for name in ('r1', 'r2', 'r3', 'r4')}
+
+
+@pytest.fixture
+def predicted(monkeypatch):
+    durations = {}
+    monkeypatch.setattr(
+        DurationPredictor, 'predict',
+        lambda self, device_config, scenario_name, commands=None: (
+            durations.get((device_config['host'], scenario_name), 1.0), 'scenario'
+        )
+    )
+    return durations
+
+
+class FakeDevices:
+    """execute_scenarios_on_device の代わりに実行順と同時実行数を記録する"""
+
+    def __init__(self, run_time: float = 0.05):
+        self.run_time = run_time
+        self.failing = set()
+        self.threads = set()
+        self.started = []
+        self.calls = []
+        self.active = {}
+        self.max_active = {}
+        self.lock = threading.Lock()
+
+    def _track(self, names, delta):
+        for name in names:
+            self.active[name] = self.active.get(name, 0) + delta
+            self.max_active[name] = max(self.max_active.get(name, 0), self.active[name])
+
+    def __call__(self, device_config, command_groups, scenario_configs):
+        names = ['total'] + [scenario['name'] for scenario in scenario_configs]
+        with self.lock:
+            self.started.append(device_config['host'])
+            self.threads.add(threading.current_thread().name)
+            self.calls.append((device_config['host'], [scenario['name'] for scenario in scenario_configs]))
+            self._track(names, 1)
+        time.sleep(self.run_time)
+        with self.lock:
+            self._track(names, -1)
+        if device_config['host'] in self.failing:
+            raise RuntimeError('worker crashed')
+        return [
+            {'device_name': device_config['host'], 'scenario': scenario['name'],
+             'success': True, 'total_time': self.run_time}
+            for scenario in scenario_configs
+        ]
+
+
+@pytest.fixture
+def fake_devices(monkeypatch):
+    fake = FakeDevices()
+    monkeypatch.setattr(scenario_dispatcher, 'execute_scenarios_on_device', fake)
+    return fake
+
+
+def scenario(name, devices, **options):
+    return dict(options, name=name, devices=devices, commands=['show version'])
+
+
+def test_dispatch_starts_longest_predicted_items_first(predicted, fake_devices):
+    predicted.update({('r1', 'check'): 1.0, ('r2', 'check'): 3.0, ('r3', 'check'): 2.0})
+    check = scenario('check', ['r1', 'r2', 'r3'])
+    work_items = [([check], device_name) for device_name in check['devices']]
+
+    results = dispatch_work_items(work_items, DEVICES, {}, limit=1)
+
+    assert fake_devices.started == ['r2', 'r3', 'r1']
+    assert [item[0]['device_name'] for item in results] == ['r1', 'r2', 'r3']
+    assert [item[0]['predicted_time'] for item in results] == [1.0, 3.0, 2.0]
+    assert all(item[0]['actual_time'] == fake_devices.run_time for item in results)
+
+
+def test_dispatch_respects_global_limit(predicted, fake_devices):
+    check = scenario('check', ['r1', 'r2', 'r3', 'r4'])
+
+    dispatch_work_items([([check], name) for name in check['devices']], DEVICES, {}, limit=2)
+
+    assert fake_devices.max_active['total'] == 2
+
+
+def test_dispatch_defers_capped_scenario_and_runs_others(predicted, fake_devices):
+    predicted.update({('r1', 'backup'): 5.0, ('r2', 'backup'): 5.0})
+    backup = scenario('backup', ['r1', 'r2'], concurrency=1)
+    check = scenario('check', ['r3', 'r4'])
+    work_items = [([backup], 'r1'), ([backup], 'r2'), ([check], 'r3'), ([check], 'r4')]
+
+    dispatch_work_items(work_items, DEVICES, {}, limit=10)
+
+    assert fake_devices.max_active['backup'] == 1
+    assert fake_devices.max_active['total'] == 3
+    # 2台目の backup は1台目の完了を待ち、その間に check を先に投入する
+    assert fake_devices.started[-1] == 'r2'
+
+
+def test_dispatch_applies_default_scenario_concurrency(predicted, fake_devices, monkeypatch):
+    monkeypatch.setattr(scenario_dispatcher, 'DEFAULT_SCENARIO_CONCURRENCY', 2)
+    check = scenario('check', ['r1', 'r2', 'r3', 'r4'])
+
+    dispatch_work_items([([check], name) for name in check['devices']], DEVICES, {}, limit=10)
+
+    assert fake_devices.max_active['check'] == 2
+    assert all(name.startswith('device-worker') for name in fake_devices.threads)
+
+
+def test_dispatch_reports_device_error_and_keeps_other_results(predicted, fake_devices):
+    fake_devices.failing.add('r2')
+    check = scenario('check', ['r1', 'r2', 'r3'])
+
+    results = dispatch_work_items([([check], name) for name in check['devices']], DEVICES, {}, limit=10)
+
+    assert [item[0]['success'] for item in results] == [True, False, True]
+    assert results[1][0]['device_name'] == 'r2'
+    assert results[1][0]['error_message'] == 'worker crashed'
+
+
+def test_dispatch_runs_merged_scenarios_in_one_item(predicted, fake_devices):
+    scenarios = {
+        'check': {'devices': ['r1', 'r2'], 'commands': ['show version']},
+        'backup': {'devices': ['r2'], 'commands': ['show run'], 'concurrency': 1},
+    }
+    work_items, planned = build_work_items(['check', 'backup'], scenarios)
+
+    results = dispatch_work_items(work_items, DEVICES, {}, limit=10)
+
+    assert sorted(fake_devices.calls) == [('r1', ['check']), ('r2', ['check', 'backup'])]
+    backup_results = [results[index][position] for index, position in planned[1][2]]
+    assert [(r['device_name'], r['scenario']) for r in backup_results] == [('r2', 'backup')]
+
+
+def test_dispatch_skips_missing_and_unreachable_devices(predicted, fake_devices):
+    check = scenario('check', ['r1', 'r2', 'missing'])
+    reachability = {'r1': {'host_failure': True}, 'r2': {'host_failure': False}}
+
+    results = dispatch_work_items(
+        [([check], name) for name in check['devices']], DEVICES, {}, reachability, limit=10
+    )
+
+    assert fake_devices.started == ['r2']
+    assert not results[0][0]['success'] and results[0][0]['device_host'] == 'r1'
+    assert results[1][0]['success']
+    assert results[2][0]['error_message'] == 'Device missing not found'
+
+
+def test_simulated_dispatch_respects_per_scenario_cap():
+    durations = [5, 5, 1]
+    item_scenarios = [['backup'], ['backup'], ['check']]
+
+    capped = simulate_dispatch(durations, item_scenarios, limit=10, caps={'backup': 1})
+    uncapped = simulate_dispatch(durations, item_scenarios, limit=10)
+
+    assert capped == 10
+    assert uncapped == 5
+
+
+def test_work_items_merge_scenarios_per_device():
+    scenarios = {
+        'check': {'devices': ['r1', 'r2'], 'commands': ['show ver']},
+        'backup': {'devices': ['r2'], 'commands': ['show run']},
+    }
+
+    work_items, planned = build_work_items(['check', 'backup', 'missing'], scenarios)
+
+    assert [(device, [s['name'] for s in items]) for items, device in work_items] == [
+        ('r1', ['check']),
+        ('r2', ['check', 'backup']),
+    ]
+    assert planned[1][2] == [(1, 1)]
+    assert planned[2] == ('missing', None, [])
+
+
+def test_plan_uses_merged_items_and_scenario_caps(predicted):
+    predicted.update({
+        ('r1', 'check'): 2.0, ('r2', 'check'): 2.0, ('r2', 'backup'): 6.0, ('r3', 'backup'): 6.0
+    })
+    scenarios = {
+        'check': {'devices': ['r1', 'r2'], 'commands': ['show ver']},
+        'backup': {'devices': ['r2', 'r3'], 'commands': ['show run'], 'concurrency': 1},
+    }
+
+    plan = plan_scenario_list(['check', 'backup'], scenarios, DEVICES, {}, concurrency=10)
+
+    assert [(job['device_name'], job['predicted_time']) for job in plan['jobs']] == [
+        ('r2', 8.0), ('r3', 6.0), ('r1', 2.0)
+    ]
+    assert plan['scenario_concurrency']['backup'] == 1
+    # backup は1台ずつしか実行できないため r3 は r2 の完了を待つ
+    assert plan['predicted_makespan'] == 14.0
+    assert plan['total_work'] == 16.0
+
+
+def test_scenario_concurrency_is_clamped_to_worker_pool():
+    concurrency = get_scenario_concurrency(
+        {'concurrency': scenario_dispatcher.DEVICE_WORKER_POOL_SIZE + 100}
+    )
+    invalid = get_scenario_concurrency({'concurrency': 'many'})
+
+    assert concurrency == scenario_dispatcher.DEVICE_WORKER_POOL_SIZE
+    assert invalid == min(scenario_dispatcher.DEFAULT_SCENARIO_CONCURRENCY,
+                          scenario_dispatcher.DEVICE_WORKER_POOL_SIZE)
@@ -0,0 +1,58 @@
+"""
+セッションプリアンブル（ページング無効化など）送信のテスト
+"""
+from network_executor import NetworkDeviceExecutor
+
+
+def ssh_device(host: str, **options) -> dict:
+    return dict({
+        'host': host,
+        'username': 'admin',
+        'password': 'secret',
+        'connection_type': 'ssh',
+        'device_type': 'cisco_ios'
+    }, **options)
+
+
+def test_telnet_preamble_is_sent_once_per_pooled_session(telnet_device):
+    config = telnet_device.device_config()
+
+    NetworkDeviceExecutor(config).execute_commands(['show version'])
+    NetworkDeviceExecutor(config).execute_commands(['show clock'])
+
+    assert telnet_device.logins == 1
+    assert telnet_device.received == [
+        'terminal length 0', 'terminal width 511', 'show version', 'show clock'
+    ]
+
+
+def test_device_session_preamble_overrides_device_type_default(telnet_device):
+    config = dict(telnet_device.device_config(), session_preamble=['screen-length 0 temporary'])
+
+    NetworkDeviceExecutor(config).execute_commands(['show version'])
+
+    assert telnet_device.received == ['screen-length 0 temporary', 'show version']
+
+
+def test_shell_preamble_is_sent_on_every_new_channel(fake_ssh):
+    config = ssh_device('192.0.2.50', device_type='cisco_asa', session_mode='shell')
+    NetworkDeviceExecutor(config).execute_commands(['show version'])
+    first = fake_ssh.clients[0].channels[0]
+    first.recv = lambda size: b''
+
+    NetworkDeviceExecutor(config).execute_commands(['show clock'])
+    NetworkDeviceExecutor(config).execute_commands(['show clock'])
+
+    first, second = fake_ssh.clients[0].channels
+    assert first.sent == ['terminal pager 0', 'show version', 'show clock']
+    assert second.sent == ['terminal pager 0', 'show clock']
+
+
+def test_exec_mode_sends_no_preamble(fake_ssh):
+    executor = NetworkDeviceExecutor(ssh_device('192.0.2.51'))
+
+    result = executor.execute_commands(['show version'])
+
+    assert result['success']
+    assert fake_ssh.clients[0].executed == ['show version']
+    assert fake_ssh.clients[0].channels == []
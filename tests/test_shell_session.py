@@ -0,0 +1,82 @@
+"""
+SSHシェルセッション（invoke_shell とプロンプト検出による読み取り）のテスト
+"""
+from network_executor import NetworkDeviceExecutor
+
+
+def shell_device(host: str, **options) -> dict:
+    return dict({
+        'host': host,
+        'hostname': host,
+        'username': 'admin',
+        'password': 'secret',
+        'connection_type': 'ssh',
+        'session_mode': 'shell'
+    }, **options)
+
+
+def outputs(result):
+    return [r['output'] for r in result['command_results']]
+
+
+def test_shell_commands_are_read_up_to_the_prompt(fake_ssh):
+    fake_ssh.options['banner'] = 'Unauthorized access is prohibited\r\nLast login: today'
+    executor = NetworkDeviceExecutor(shell_device('192.0.2.40'))
+
+    result = executor.execute_commands(['show version', 'show clock'])
+
+    assert result['success']
+    assert outputs(result) == ['output of show version', 'output of show clock']
+    channel, = fake_ssh.clients[0].channels
+    assert channel.sent == ['show version', 'show clock']
+    assert fake_ssh.clients[0].executed == []
+
+
+def test_shell_channel_is_reused_across_command_groups(fake_ssh):
+    config = shell_device('192.0.2.41')
+
+    NetworkDeviceExecutor(config).execute_commands(['show version'])
+    result = NetworkDeviceExecutor(config).execute_commands(['show clock'])
+
+    assert outputs(result) == ['output of show clock']
+    assert len(fake_ssh.clients) == 1
+    assert len(fake_ssh.clients[0].channels) == 1
+
+
+def test_shell_enters_privileged_mode_from_user_prompt(fake_ssh):
+    fake_ssh.options.update(mode='>', secret='enable-secret')
+    executor = NetworkDeviceExecutor(shell_device('192.0.2.42', secret='enable-secret'))
+
+    result = executor.execute_commands(['show running-config'])
+
+    assert outputs(result) == ['output of show running-config']
+    assert fake_ssh.clients[0].channels[0].sent[:2] == ['enable', 'enable-secret']
+
+
+def test_pipelined_show_commands_are_sent_in_one_write(fake_ssh):
+    executor = NetworkDeviceExecutor(shell_device('192.0.2.43', pipeline=True, prompt='r1#'))
+
+    result = executor.execute_commands(['show version', 'show clock', 'clear counters'])
+
+    assert outputs(result) == [
+        'output of show version', 'output of show clock', 'output of clear counters'
+    ]
+    assert fake_ssh.clients[0].channels[0].writes == [
+        'show version\nshow clock\n', 'clear counters\n'
+    ]
+
+
+def test_channel_closed_mid_read_is_discarded_and_reopened(fake_ssh):
+    config = shell_device('192.0.2.44')
+    NetworkDeviceExecutor(config).execute_commands(['show version'])
+    broken = fake_ssh.clients[0].channels[0]
+    broken.recv = lambda size: b''
+
+    failed = NetworkDeviceExecutor(config).execute_commands(['show clock'])
+    retried = NetworkDeviceExecutor(config).execute_commands(['show clock'])
+
+    assert not failed['success']
+    assert 'Shell channel closed' in failed['command_results'][0]['error_output']
+    assert broken.closed
+    assert outputs(retried) == ['output of show clock']
+    assert len(fake_ssh.clients[0].channels) == 2
@@ -0,0 +1,124 @@
+"""
+同一実行の合流（シングルフライト）のテスト
+"""
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+DEVICE_KEY = ('192.0.2.1', 22, 'admin', 'ssh', 'digest')
+
+
+def run_concurrently(flight: SingleFlight, calls):
+    """(kind, commands, func, name) を同時に実行し、結果を呼び出し順に返す"""
+    results = [None] * len(calls)
+    errors = [None] * len(calls)
+
+    def worker(index, kind, commands, func, name):
+        try:
+            results[index] = flight.run(kind, DEVICE_KEY, commands, func, name=name)
+        except Exception as e:
+            errors[index] = e
+
+    threads = [
+        threading.Thread(target=worker, args=(index,) + call)
+        for index, call in enumerate(calls)
+    ]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join(timeout=5)
+    return results, errors
+
+
+def test_identical_read_only_executions_are_coalesced():
+    flight = SingleFlight()
+    executions = []
+
+    def execute():
+        executions.append(1)
+        time.sleep(0.1)
+        return {'output': 'IOS'}
+
+    results, _ = run_concurrently(flight, [
+        ('scenario', ['show version'], execute, 'check'),
+        ('scenario', ['sh  version'], execute, 'check'),
+    ])
+
+    assert len(executions) == 1
+    assert results[0] == ({'output': 'IOS'}, False)
+    assert results[1] == ({'output': 'IOS'}, True)
+    assert flight.get_stats()['coalesced'] == 1
+
+
+def test_different_scenarios_with_same_commands_are_not_coalesced():
+    flight = SingleFlight()
+    executions = []
+
+    def execute():
+        executions.append(1)
+        time.sleep(0.05)
+        return len(executions)
+
+    results, _ = run_concurrently(flight, [
+        ('scenario', ['show version'], execute, 'daily'),
+        ('scenario', ['show version'], execute, 'weekly'),
+    ])
+
+    assert len(executions) == 2
+    assert not results[0][1] and not results[1][1]
+
+
+def test_leader_error_is_raised_to_followers():
+    flight = SingleFlight()
+
+    def execute():
+        time.sleep(0.1)
+        raise RuntimeError('connection lost')
+
+    _, errors = run_concurrently(flight, [
+        ('commands', ['show version'], execute, None),
+        ('commands', ['show version'], execute, None),
+    ])
+
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert flight.get_stats()['in_flight'] == 0
+
+
+def test_config_executions_are_serialized_not_coalesced():
+    flight = SingleFlight()
+    active = []
+    overlaps = []
+
+    def execute():
+        active.append(1)
+        overlaps.append(len(active))
+        time.sleep(0.05)
+        active.pop()
+        return 'ok'
+
+    results, _ = run_concurrently(flight, [
+        ('commands', ['conf t', 'hostname r1', 'end'], execute, None),
+        ('commands', ['conf t', 'hostname r1', 'end'], execute, None),
+    ])
+
+    assert overlaps == [1, 1]
+    assert results == [('ok', False), ('ok', False)]
+    assert flight.get_stats()['serialized'] == 2
+
+
+@pytest.mark.parametrize('other', [
+    ('scenario', ['show version'], 'other'),
+    ('scenario', ['show ip route'], 'check'),
+    ('commands', ['show version'], 'check'),
+])
+def test_key_distinguishes_kind_name_and_commands(other):
+    kind, commands, name = other
+
+    key = SingleFlight.make_key('scenario', DEVICE_KEY, ['show version'], 'check')
+    other_key = SingleFlight.make_key(kind, DEVICE_KEY, commands, name)
+
+    assert key != other_key
@@ -0,0 +1,56 @@
+"""
+同期実行エンジンのTelnetセッション（共有イベントループ）のテスト
+"""
+import asyncio
+import threading
+
+import network_executor
+from async_loop import get_telnet_event_loop
+from network_executor import NetworkDeviceExecutor
+
+
+def outputs(result):
+    return [r['output'] for r in result['command_results']]
+
+
+def test_telnet_connection_is_owned_by_the_shared_event_loop(telnet_device):
+    executor = NetworkDeviceExecutor(telnet_device.device_config())
+
+    result = executor.execute_commands(['show version'])
+
+    assert outputs(result) == ['output of show version']
+    session = executor.pool.acquire(executor.pool.make_key(telnet_device.device_config()))
+    assert session.connection.loop is get_telnet_event_loop().loop
+    executor.pool.release(session)
+
+
+def test_concurrent_telnet_executors_share_one_event_loop(telnet_device, monkeypatch):
+    get_telnet_event_loop().start()
+    command_loops = set()
+    original_command = network_executor.execute_telnet_command_async
+
+    async def recording_command(connection, command, wait_string):
+        command_loops.add((asyncio.get_running_loop(), threading.current_thread().name))
+        return await original_command(connection, command, wait_string)
+
+    def no_new_loops():
+        raise AssertionError('telnet path must not create event loops')
+
+    monkeypatch.setattr(network_executor, 'execute_telnet_command_async', recording_command)
+    monkeypatch.setattr(asyncio, 'new_event_loop', no_new_loops)
+    results = {}
+
+    def run(index):
+        # ユーザー名を変えて別々のセッションとして接続する
+        config = dict(telnet_device.device_config(), username=f"admin{index}")
+        results[index] = NetworkDeviceExecutor(config).execute_commands(['show clock'])
+
+    workers = [threading.Thread(target=run, args=(index,)) for index in range(6)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert all(outputs(results[index]) == ['output of show clock'] for index in range(6))
+    assert telnet_device.logins == 6
+    assert command_loops == {(get_telnet_event_loop().loop, 'telnet-event-loop')}
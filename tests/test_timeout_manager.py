@@ -0,0 +1,94 @@
+"""
+タイムアウト管理（デッドライン監視スレッド）のテスト
+"""
+import threading
+import time
+
+from timeout_manager import TimeoutManager
+
+
+def test_expired_deadline_fires_callback():
+    manager = TimeoutManager()
+    closed = threading.Event()
+
+    def on_expire():
+        closed.set()
+        return True
+
+    deadline = manager.schedule('command', 0.05, on_expire)
+    fired = closed.wait(timeout=2)
+    # 統計はコールバックが戻った後に更新される
+    wait_until = time.monotonic() + 2
+    while manager.get_stats()['reclaimed_sessions'] == 0 and time.monotonic() < wait_until:
+        time.sleep(0.01)
+
+    assert fired
+    assert deadline.fired
+    assert deadline.expired
+    stats = manager.get_stats()
+    assert stats['command_timeouts'] == 1
+    assert stats['reclaimed_sessions'] == 1
+
+
+def test_cancelled_deadline_does_not_fire():
+    manager = TimeoutManager()
+    called = threading.Event()
+
+    with manager.deadline('connect', 0.05, lambda: called.set() or True) as deadline:
+        pass
+    time.sleep(0.15)
+
+    assert not called.is_set()
+    assert not deadline.fired
+    assert manager.get_stats()['connect_timeouts'] == 0
+
+
+def test_deadlines_fire_in_expiry_order():
+    manager = TimeoutManager()
+    order = []
+    done = threading.Event()
+
+    def record(name):
+        def on_expire():
+            order.append(name)
+            if len(order) == 2:
+                done.set()
+            return False
+        return on_expire
+
+    manager.schedule('scenario', 0.2, record('late'))
+    manager.schedule('command', 0.05, record('early'))
+    done.wait(timeout=2)
+
+    assert order == ['early', 'late']
+
+
+def test_deadline_unblocks_waiting_thread():
+    manager = TimeoutManager()
+    transport_closed = threading.Event()
+
+    def close_transport():
+        transport_closed.set()
+        return True
+
+    start = time.monotonic()
+    with manager.deadline('command', 0.05, close_transport) as deadline:
+        # 読み込みでブロックしている処理の代わり（トランスポートが閉じられると戻る）
+        transport_closed.wait(timeout=5)
+    elapsed = time.monotonic() - start
+
+    assert deadline.fired
+    assert elapsed < 1
+
+
+def test_failing_callback_does_not_stop_watchdog():
+    manager = TimeoutManager()
+    second = threading.Event()
+
+    def broken():
+        raise RuntimeError('close failed')
+
+    manager.schedule('command', 0.01, broken)
+    manager.schedule('command', 0.05, lambda: second.set() or True)
+
+    assert second.wait(timeout=2)
@@ -0,0 +1,188 @@
+"""
+タイムアウト管理モジュール
+接続・コマンド・シナリオのデッドラインを単一の監視スレッドで管理し、
+期限切れ時は下位トランスポートを閉じてブロック中のスレッドを解放する
+"""
+import heapq
+import itertools
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """1件のデッドライン"""
+
+    def __init__(self, kind: str, seconds: float,
+                 on_expire: Optional[Callable[[], bool]] = None):
+        """
+        デッドラインを初期化
+
+        Args:
+            kind: 種別 ('connect', 'command', 'scenario')
+            seconds: 期限までの秒数
+            on_expire: 期限切れ時のコールバック。接続を閉じた場合Trueを返す
+        """
+        self.kind = kind
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + max(0.0, seconds)
+        self.on_expire = on_expire
+        self.cancelled = False
+        self.fired = False
+
+    def remaining(self) -> float:
+        """残り時間（秒）"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """期限切れかどうか"""
+        return self.fired or self.remaining() <= 0.0
+
+
+class TimeoutManager:
+    """デッドライン監視クラス"""
+
+    # キャンセル済みエントリがこの件数を超え、かつ過半数になったらヒープを再構築
+    COMPACT_THRESHOLD = 1024
+
+    def __init__(self):
+        """タイムアウト管理を初期化（監視スレッドは初回利用時に起動）"""
+        self._heap: List = []
+        self._counter = itertools.count()
+        self._cancelled = 0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+        # 統計カウンター
+        self.stats = {
+            'connect_timeouts': 0,
+            'command_timeouts': 0,
+            'scenario_timeouts': 0,
+            'reclaimed_sessions': 0
+        }
+
+    def schedule(self, kind: str, seconds: float,
+                 on_expire: Optional[Callable[[], bool]] = None) -> Deadline:
+        """
+        デッドラインを登録
+
+        Args:
+            kind: 種別 ('connect', 'command', 'scenario')
+            seconds: 期限までの秒数
+            on_expire: 期限切れ時のコールバック
+
+        Returns:
+            Deadline
+        """
+        deadline = Deadline(kind, seconds, on_expire)
+        with self._condition:
+            self._ensure_thread()
+            heapq.heappush(
+                self._heap,
+                (deadline.expires_at, next(self._counter), deadline)
+            )
+            self._condition.notify()
+        return deadline
+
+    def cancel(self, deadline: Deadline):
+        """
+        デッドラインを解除（期限前に処理が完了した場合）
+
+        Args:
+            deadline: 解除するデッドライン
+        """
+        with self._condition:
+            if deadline.cancelled or deadline.fired:
+                return
+            deadline.cancelled = True
+            self._cancelled += 1
+            if (self._cancelled > self.COMPACT_THRESHOLD
+                    and self._cancelled * 2 > len(self._heap)):
+                self._heap = [e for e in self._heap if not e[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+
+    @contextmanager
+    def deadline(self, kind: str, seconds: float,
+                 on_expire: Optional[Callable[[], bool]] = None) -> Iterator[Deadline]:
+        """
+        with文の範囲にデッドラインを適用
+
+        Args:
+            kind: 種別 ('connect', 'command', 'scenario')
+            seconds: 期限までの秒数
+            on_expire: 期限切れ時のコールバック
+
+        Yields:
+            Deadline（処理後に fired を確認してタイムアウトを判定する）
+        """
+        handle = self.schedule(kind, seconds, on_expire)
+        try:
+            yield handle
+        finally:
+            self.cancel(handle)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """タイムアウト統計を取得"""
+        with self._condition:
+            stats = dict(self.stats)
+            stats['active_deadlines'] = len(self._heap) - self._cancelled
+        return stats
+
+    def _ensure_thread(self):
+        """監視スレッドを起動（ロック取得済み前提）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run, name='timeout-watchdog', daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        """監視スレッド本体"""
+        while True:
+            with self._condition:
+                while True:
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                        self._cancelled -= 1
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._condition.wait(timeout=wait)
+
+                _, _, deadline = heapq.heappop(self._heap)
+                deadline.fired = True
+                self.stats[f'{deadline.kind}_timeouts'] = \
+                    self.stats.get(f'{deadline.kind}_timeouts', 0) + 1
+
+            # コールバック（トランスポートのクローズ）はロック外で実行
+            self._fire(deadline)
+
+    def _fire(self, deadline: Deadline):
+        """期限切れのデッドラインを処理"""
+        logger.warning(f"{deadline.kind} deadline expired after {deadline.seconds:g} seconds")
+        if not deadline.on_expire:
+            return
+        try:
+            if deadline.on_expire():
+                with self._condition:
+                    self.stats['reclaimed_sessions'] += 1
+        except Exception as e:
+            logger.error(f"Error while reclaiming timed out session: {e}")
+
+
+# グローバルインスタンス
+timeout_manager = TimeoutManager()
+
+def get_timeout_manager() -> TimeoutManager:
+    """タイムアウト管理インスタンスを取得"""
+    return timeout_manager